@@ -0,0 +1,237 @@
+"""
+Buffered Logging Backend
+
+log() used to open the output file, append one line, close it and flush
+stdout on every call. With many sessions in one process that does not
+scale, so records now go onto a queue. A single background writer thread
+drains the queue in batches. Each batch costs one write to the console,
+one to the human-readable log and one to a JSON Lines file.
+
+Every JSON record carries run id, session, step, level and elapsed ms since
+the run started. These fields come from context variables, so each asyncio
+task or thread tags its own records without passing anything around.
+Records are formatted whole by the single writer, so lines from concurrent
+sessions never interleave.
+"""
+
+import atexit
+import contextvars
+import json
+import queue
+import re
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Optional
+
+BATCH_SIZE = 256  # Max records per write
+FLUSH_INTERVAL = 0.2  # Seconds the writer waits before writing a partial batch
+
+_STEP_PATTERN = re.compile(r"^\s*Step (\d+):")
+
+_fields: contextvars.ContextVar = contextvars.ContextVar("agent_log_fields", default={})
+
+
+def new_run_id() -> str:
+    """Return a short unique run id."""
+    return uuid.uuid4().hex[:12]
+
+
+def bind(**fields):
+    """Attach fields (run_id, session, step, ...) to later records in this context.
+
+    Binding run_id also resets the elapsed-time origin for the run.
+    """
+    current = dict(_fields.get())
+    if "run_id" in fields:
+        current["_start"] = time.monotonic()
+    current.update(fields)
+    return _fields.set(current)
+
+
+def current_fields() -> dict:
+    """Return the fields bound in this context (run_id, session, step, ...)."""
+    return {k: v for k, v in _fields.get().items() if not k.startswith("_")}
+
+
+def unbind(token):
+    """Restore the fields that were active before the matching bind()."""
+    _fields.reset(token)
+
+
+@contextmanager
+def bound(**fields):
+    """Context manager form of bind()/unbind()."""
+    token = bind(**fields)
+    try:
+        yield
+    finally:
+        unbind(token)
+
+
+class LogSink:
+    """Queue plus background writer for the text log, JSONL log and console."""
+
+    def __init__(self, text_path: str, jsonl_path: Optional[str], console: bool = True):
+        self.text_path = text_path
+        self.jsonl_path = jsonl_path
+        self.console = console
+        self._queue: queue.Queue = queue.Queue()
+        self._text = open(text_path, "a", encoding="utf-8")
+        self._jsonl = open(jsonl_path, "a", encoding="utf-8") if jsonl_path else None
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="agent-log-writer", daemon=True)
+        self._thread.start()
+
+    def emit(self, message: str, level: str = "info"):
+        """Queue one log record; the caller never touches the file."""
+        fields = _fields.get()
+        now = time.time()
+        start = fields.get("_start")
+        record = {
+            "ts": now,
+            "run_id": fields.get("run_id"),
+            "session": fields.get("session"),
+            "step": fields.get("step"),
+            "level": level,
+            "elapsed_ms": round((time.monotonic() - start) * 1000) if start else None,
+            "message": message,
+        }
+        self._queue.put(("record", record))
+
+    def write_block(self, text: str, console_text: Optional[str] = None):
+        """Queue a free-form block for the text log (and console)."""
+        self._queue.put(("block", (text, text if console_text is None else console_text)))
+
+    def reset(self, header: str):
+        """Truncate the text log and start it with header (ordered with queued records)."""
+        self._queue.put(("reset", header))
+
+    def flush(self):
+        """Block until everything queued so far has been written."""
+        if not self._closed:
+            self._queue.join()
+
+    def close(self):
+        """Flush and stop the writer thread."""
+        if self._closed:
+            return
+        self.flush()
+        self._closed = True
+        self._queue.put(None)
+        self._thread.join(timeout=5)
+        self._text.close()
+        if self._jsonl:
+            self._jsonl.close()
+
+    @staticmethod
+    def _format(record: dict) -> str:
+        timestamp = datetime.fromtimestamp(record["ts"]).strftime("%Y-%m-%d %H:%M:%S")
+        prefix = "ERROR: " if record["level"] == "error" else ""
+        return f"[{timestamp}] {prefix}{record['message']}"
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                self._queue.task_done()
+                return
+            batch = [item]
+            deadline = time.monotonic() + FLUSH_INTERVAL
+            while len(batch) < BATCH_SIZE:
+                try:
+                    nxt = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if nxt is None:
+                    self._queue.put(None)  # Handle shutdown after this batch
+                    self._queue.task_done()
+                    break
+                batch.append(nxt)
+            try:
+                self._write(batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _write(self, batch: list):
+        text, jsonl, console = [], [], []
+
+        def drain():
+            if text:
+                self._text.write("".join(text))
+                self._text.flush()
+            if jsonl and self._jsonl:
+                self._jsonl.write("".join(jsonl))
+                self._jsonl.flush()
+            if console and self.console:
+                sys.stdout.write("".join(console))
+                sys.stdout.flush()
+            text.clear()
+            jsonl.clear()
+            console.clear()
+
+        for kind, payload in batch:
+            if kind == "record":
+                line = self._format(payload)
+                text.append(line + "\n")
+                jsonl.append(json.dumps(payload, ensure_ascii=False) + "\n")
+                if payload["level"] == "error":
+                    console.append(f"\033[91m{line}\033[0m\n")  # Red for errors
+                else:
+                    console.append(line + "\n")
+            elif kind == "block":
+                text.append(payload[0])
+                console.append(payload[1])
+            elif kind == "reset":
+                drain()
+                self._text.close()
+                self._text = open(self.text_path, "w", encoding="utf-8")
+                text.append(payload)
+        drain()
+
+
+_sink: Optional[LogSink] = None
+_sink_lock = threading.Lock()
+
+
+def configure(text_path: str, jsonl_path: Optional[str] = None) -> LogSink:
+    """Return the process-wide sink, (re)creating it if the paths changed."""
+    global _sink
+    with _sink_lock:
+        if _sink is None or (_sink.text_path, _sink.jsonl_path) != (text_path, jsonl_path):
+            if _sink is not None:
+                _sink.close()
+            _sink = LogSink(text_path, jsonl_path)
+        return _sink
+
+
+def get_sink() -> Optional[LogSink]:
+    """Return the configured sink, if any."""
+    return _sink
+
+
+def log(message: str, level: str = "info"):
+    """Emit a record on the configured sink, tracking "Step N:" messages as the step."""
+    match = _STEP_PATTERN.match(message)
+    if match:
+        bind(step=f"step{match.group(1)}")
+    if _sink is None:
+        print(message)
+        return
+    _sink.emit(message, level)
+
+
+def flush():
+    """Flush the configured sink, if any."""
+    if _sink is not None:
+        _sink.flush()
+
+
+@atexit.register
+def _close_at_exit():
+    if _sink is not None:
+        _sink.close()
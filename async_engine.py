@@ -0,0 +1,417 @@
+"""
+Async Concurrent Session Engine
+
+Runs many independent test scenarios at once on top of playwright.async_api.
+All sessions share a single Chrome process (a warm browser server when one is
+running). Each session runs in a browser context borrowed from a pool of
+pre-created contexts, and the pool size caps how many sessions are active at
+the same time. Each target site gets its own pool, with its own request
+policy, saved login and memory watchdog, so a batch may mix targets.
+A session that is waiting on a long model response costs almost nothing, so
+one process can hold dozens of them.
+
+Usage:
+    python main.py --sessions 20 --concurrency 8
+"""
+
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+from urllib.parse import urlparse
+
+from playwright.async_api import async_playwright, TimeoutError as PlaywrightTimeout
+
+import agent_log
+import pacing
+from attachments import attach_files_async
+from browser_server import ContextPool, connect_async
+from completion import POLL_MS, count_messages_async, wait_for_completion_async
+from network import open_ready_async
+from selector_resolver import resolve_async
+from streaming import start_stream_async, stop_stream_async
+from timing_model import prompt_class
+from tracing import span
+from main import (
+    log,
+    auth_state,
+    context_options,
+    learned_poll,
+    learned_timeout,
+    memory_watchdog,
+    network_policy,
+    record_response,
+    record_timing,
+    screenshot_pipeline,
+    selector_cache,
+    CHATGPT_URL,
+    TIMEOUT,
+    TIMEOUT_FLOOR,
+    TIMEOUT_CEILING,
+    PROBE_TIMEOUT_FLOOR,
+    READY_TIMEOUT,
+    BLOCK_RESOURCES,
+    STREAM_CAPTURE,
+    HEADLESS,
+    DEFAULT_CONCURRENCY,
+    LAUNCH_ARGS,
+    DROP_TARGET_SELECTORS,
+    INPUT_SELECTORS,
+    SUBMIT_SELECTORS,
+    GENERATING_INDICATORS,
+    RESPONSE_SELECTORS,
+)
+
+
+@dataclass
+class Scenario:
+    """One independent prompt run against the target site."""
+    name: str
+    prompt: str
+    url: str = CHATGPT_URL
+    attachments: List[str] = field(default_factory=list)
+
+
+@dataclass
+class TargetPool:
+    """The context pool and per-target services for one target site."""
+    url: str
+    pool: ContextPool
+    policy: Any = None  # network.NetworkPolicy
+    watchdog: Any = None  # memory_watchdog.MemoryWatchdog
+    refresher: Optional[asyncio.Task] = None
+
+
+def target_key(url: str) -> str:
+    """Scenarios with the same key share a context pool."""
+    return urlparse(url).netloc or url
+
+
+@dataclass
+class SessionResult:
+    """Outcome of a single scenario session."""
+    name: str
+    success: bool
+    response: str = ""
+    error: str = ""
+    elapsed_s: float = 0.0
+    stream: dict = field(default_factory=dict)
+
+
+async def human_delay(page, min_ms: int = 800, max_ms: int = 1500):
+    """Add a human-like random delay, scaled by the pacing profile."""
+    delay = pacing.current().delay_ms(min_ms, max_ms)
+    if delay:
+        await page.wait_for_timeout(delay)
+
+
+async def type_like_human(page, element, text: str):
+    """Type text using the pacing profile's strategy (per-key delays for "human")."""
+    profile = pacing.current()
+    with span("type", chars=len(text), strategy=profile.typing):
+        if profile.needs_focus:
+            await element.click()
+            await human_delay(page, 200, 400)
+
+        await pacing.type_text_async(page, element, text, profile)
+
+        await human_delay(page, 300, 600)
+
+
+async def find_element(page, scenario: Scenario, selectors: List[str], label: str,
+                       timeout_ms: int = 3000):
+    """Race a fallback selector list in one round-trip and log which candidate won."""
+    step = f"resolve:{label}"
+    timeout_ms = learned_timeout(step, timeout_ms, PROBE_TIMEOUT_FLOOR, timeout_ms * 2,
+                                 scenario.url)
+    with span("resolve", label=label):
+        resolution = await resolve_async(page, selectors, timeout_ms=timeout_ms, label=label,
+                                         cache=selector_cache())
+    log(f"   [{scenario.name}] Resolved {resolution.describe()}")
+    record_timing(step, resolution.elapsed_ms if resolution.found else timeout_ms,
+                  scenario.url, timed_out=not resolution.found)
+    return resolution
+
+
+async def submit_prompt(page, scenario: Scenario) -> int:
+    """Type the scenario prompt and submit it. Returns the prior assistant message count."""
+    resolution = await find_element(page, scenario, INPUT_SELECTORS, "input field")
+    if not resolution.found:
+        raise RuntimeError("Could not find input field")
+
+    await type_like_human(page, resolution.locator, scenario.prompt)
+    await human_delay(page, 800, 1200)
+
+    message_count = await count_messages_async(page, RESPONSE_SELECTORS[0])
+    with span("submit"):
+        resolution = await find_element(page, scenario, SUBMIT_SELECTORS, "send button",
+                                        timeout_ms=2000)
+        if resolution.found:
+            await human_delay(page, 300, 600)
+            await resolution.locator.click()
+            log(f"   [{scenario.name}] Clicked send button: {resolution.selector}")
+        else:
+            await human_delay(page, 200, 400)
+            await page.keyboard.press("Enter")
+            log(f"   [{scenario.name}] Pressed Enter to submit")
+    return message_count
+
+
+async def wait_for_response(page, scenario: Scenario, previous_count: int,
+                            max_wait_time: Optional[int] = None) -> bool:
+    """Wait in the browser until the response stops generating.
+
+    Without max_wait_time, the timeout and poll interval are learned from past
+    completions of the same prompt class on the same site.
+    """
+    pclass = prompt_class(scenario.prompt, len(scenario.attachments))
+    if max_wait_time is None:
+        max_wait_time = learned_timeout("completion", TIMEOUT, TIMEOUT_FLOOR, TIMEOUT_CEILING,
+                                        scenario.url, pclass)
+    poll = learned_poll("completion", POLL_MS, 100, 1000, scenario.url, pclass)
+    with span("completion_wait"):
+        result = await wait_for_completion_async(
+            page, GENERATING_INDICATORS, RESPONSE_SELECTORS[0], previous_count, max_wait_time,
+            poll_ms=poll,
+        )
+    if result["reason"] != "not_started":
+        record_timing("completion", result["waitedMs"], scenario.url, pclass,
+                      timed_out=not result["completed"])
+    waited = result["waitedMs"] / 1000
+    if result["completed"]:
+        log(f"   [{scenario.name}] Response complete after {waited:.1f}s")
+    else:
+        log(f"⚠️  [{scenario.name}] Response {result['reason']} after {waited:.1f}s")
+    return result["completed"]
+
+
+async def capture_response(page, min_length: int = 100) -> str:
+    """Return the text of the most recent assistant message."""
+    with span("capture"):
+        response_text = ""
+        for selector in RESPONSE_SELECTORS:
+            try:
+                elements = await page.locator(selector).all()
+                if elements:
+                    response_text = await elements[-1].inner_text()
+                    if len(response_text) > min_length:
+                        break
+            except Exception:
+                continue
+        return response_text
+
+
+async def screenshot(page, path: str, full_page: bool = False, failure: bool = False):
+    """Queue a screenshot if the policy allows it (encoded and written off-thread)."""
+    with span("screenshot", path=path, full_page=full_page):
+        saved = await screenshot_pipeline().capture_async(page, path, full_page=full_page,
+                                                          failure=failure)
+    if saved:
+        log(f"   Screenshot queued: {saved}")
+    return saved
+
+
+async def run_scenario(page, scenario: Scenario, metrics: Optional[dict] = None) -> str:
+    """Drive one scenario on an already-open page and return the response text.
+
+    Streaming metrics (TTFT, chars/s, stalls) are stored in metrics if given.
+    """
+    log(f"   [{scenario.name}] Opening {scenario.url}...")
+    ready_timeout = learned_timeout("ready", READY_TIMEOUT, 5000, READY_TIMEOUT * 2,
+                                    scenario.url)
+    with span("goto", url=scenario.url):
+        ready = await open_ready_async(page, scenario.url, INPUT_SELECTORS, ready_timeout,
+                                       cache=selector_cache())
+    record_timing("ready", ready["waitedMs"], scenario.url, timed_out=not ready["ready"])
+    if not ready["ready"]:
+        log(f"⚠️  [{scenario.name}] Prompt input not interactive after "
+            f"{ready['waitedMs'] / 1000:.1f}s")
+    await human_delay(page, 300, 600)
+
+    if scenario.attachments:
+        with span("attach", files=len(scenario.attachments)):
+            result = await attach_files_async(page, scenario.attachments, DROP_TARGET_SELECTORS,
+                                              cache=selector_cache(), log=log)
+        if not result.success:
+            raise RuntimeError(result.describe())
+        log(f"   [{scenario.name}] {result.describe()}")
+        await human_delay(page, 2000, 3000)
+
+    message_count = await submit_prompt(page, scenario)
+    log(f"   [{scenario.name}] Prompt submitted, waiting for response...")
+    stream = None
+    if STREAM_CAPTURE:
+        try:
+            stream = await start_stream_async(page, RESPONSE_SELECTORS[0], message_count)
+        except Exception as e:
+            log(f"⚠️  [{scenario.name}] Streaming capture unavailable: {str(e)}")
+
+    await wait_for_response(page, scenario, message_count)
+    if stream is not None:
+        try:
+            stream_metrics = await stop_stream_async(page, stream)
+        except Exception as e:
+            log(f"⚠️  [{scenario.name}] Streaming capture failed: {str(e)}")
+        else:
+            log(f"   [{scenario.name}] Stream: {stream_metrics.describe()}")
+            if metrics is not None:
+                metrics.update(stream_metrics.as_dict())
+    response = await capture_response(page)
+    return response or (stream.text if stream is not None else "")
+
+
+class AsyncSessionEngine:
+    """Runs scenarios concurrently on a pool of browser contexts."""
+
+    def __init__(self, concurrency: int = DEFAULT_CONCURRENCY, headless: bool = HEADLESS,
+                 endpoint: Optional[str] = None,
+                 on_result: Optional[Callable[[Scenario, SessionResult], None]] = None,
+                 block_resources: bool = BLOCK_RESOURCES):
+        self.concurrency = max(1, concurrency)
+        self.headless = headless
+        self.endpoint = endpoint
+        self.block_resources = block_resources
+        self.on_result = on_result
+
+    async def launch(self, p):
+        """Attach to the warm browser server if given, else launch a shared Chrome."""
+        slow_mo = pacing.current().slow_mo  # Human-like pacing, as in the sync path
+        if self.endpoint:
+            log(f"   Attaching to warm Chrome at {self.endpoint}")
+            return await connect_async(p, self.endpoint, slow_mo=slow_mo)
+        return await p.chromium.launch(
+            headless=self.headless,
+            channel="chrome",
+            args=LAUNCH_ARGS,
+            slow_mo=slow_mo,
+        )
+
+    def start_auth_refresher(self, browser, url: str, options: dict):
+        """Refresh the saved login in the background while sessions run, if there is one."""
+        auth = auth_state(url)
+        if not auth or "storage_state" not in options:
+            return None
+        log(f"   Saved login ({auth.account}): {auth.describe()}")
+        return auth.start_refresher(browser, options, INPUT_SELECTORS, log=log)
+
+    def open_target(self, browser, url: str, size: int) -> TargetPool:
+        """Context pool, request policy, login refresher and watchdog for one target.
+
+        The caller starts the pool.
+        """
+        policy = network_policy(url) if self.block_resources else None
+        # Every context of a target shares the same read-only saved login state
+        options = context_options(url)
+        watchdog = memory_watchdog(url)
+        pool = ContextPool(browser, size, options,
+                           setup=policy.install_async if policy else None, watchdog=watchdog)
+        refresher = self.start_auth_refresher(browser, url, options)
+        return TargetPool(url, pool, policy, watchdog, refresher)
+
+    async def close_target(self, target: TargetPool, prefix: str = ""):
+        """Stop a target's refresher, log its summaries and close its contexts."""
+        if target.refresher:
+            target.refresher.cancel()
+        host = target_key(target.url)
+        if target.policy:
+            log(f"🛡️  {prefix}Network ({host}): {target.policy.describe()}")
+        if target.watchdog:
+            log(f"♻️  {prefix}Memory ({host}): {target.watchdog.describe()}")
+        await target.pool.close()
+
+    async def run(self, scenarios: List[Scenario]) -> List[SessionResult]:
+        """Run every scenario and return the results in input order."""
+        groups: Dict[str, List[Scenario]] = {}
+        for scenario in scenarios:
+            groups.setdefault(target_key(scenario.url), []).append(scenario)
+        async with async_playwright() as p:
+            log(f"Launching shared Chrome for {len(scenarios)} sessions "
+                f"(concurrency {self.concurrency}, {len(groups)} targets)...")
+            with span("launch", warm=bool(self.endpoint)):
+                browser = await self.launch(p)
+            targets = {key: self.open_target(browser, group[0].url,
+                                             min(self.concurrency, len(group)))
+                       for key, group in groups.items()}
+            # Pools are per target; this keeps the total within the concurrency
+            limit = asyncio.Semaphore(self.concurrency)
+            try:
+                await asyncio.gather(*(t.pool.start() for t in targets.values()))
+                return await asyncio.gather(*(
+                    self._run_session(targets[target_key(s.url)].pool, s, limit)
+                    for s in scenarios))
+            finally:
+                for target in targets.values():
+                    await self.close_target(target)
+                await browser.close()
+
+    async def _run_session(self, pool: ContextPool, scenario: Scenario,
+                           limit: Optional[asyncio.Semaphore] = None) -> SessionResult:
+        """Run one scenario once a pooled context frees up."""
+        if limit is not None:
+            async with limit:
+                return await self._run_session(pool, scenario)
+        context = await pool.acquire()
+        try:
+            result = await self.run_in_context(context, scenario)
+        finally:
+            await pool.release(context)
+        if self.on_result is not None:
+            self.on_result(scenario, result)
+        return result
+
+    async def run_in_context(self, context, scenario: Scenario) -> SessionResult:
+        """Run one scenario on the first page of an acquired context."""
+        start = time.monotonic()
+        stream: dict = {}
+        # Each gather() task has its own context, so this only tags this session's records
+        agent_log.bind(session=scenario.name)
+        page = context.pages[0]
+        try:
+            with span("session", category="step", scenario=scenario.name):
+                response = await run_scenario(page, scenario, stream)
+            if not response:
+                raise RuntimeError("Could not capture response text")
+            log(f"✅ [{scenario.name}] Response captured ({len(response)} chars)")
+            await screenshot(page, f"{scenario.name}_final_output.png", full_page=True)
+            elapsed = time.monotonic() - start
+            record_response(scenario.prompt, response, scenario.url,
+                            meta={"name": scenario.name, "elapsed_s": round(elapsed, 3),
+                                  "stream": stream})
+            return SessionResult(scenario.name, True, response=response,
+                                 elapsed_s=elapsed, stream=stream)
+        except PlaywrightTimeout:
+            log(f"[{scenario.name}] Timeout while running scenario", is_error=True)
+            await self._failure_screenshot(page, scenario)
+            return SessionResult(scenario.name, False, error="timeout",
+                                 elapsed_s=time.monotonic() - start, stream=stream)
+        except Exception as e:
+            log(f"[{scenario.name}] Session failed: {str(e)}", is_error=True)
+            await self._failure_screenshot(page, scenario)
+            return SessionResult(scenario.name, False, error=str(e),
+                                 elapsed_s=time.monotonic() - start, stream=stream)
+
+    @staticmethod
+    async def _failure_screenshot(page, scenario: Scenario):
+        try:
+            await screenshot(page, f"error_{scenario.name}.png", full_page=True, failure=True)
+        except Exception:
+            pass  # The page may be gone with the failure
+
+
+def run_concurrent(prompt: str, sessions: int, concurrency: int = DEFAULT_CONCURRENCY,
+                   headless: bool = HEADLESS, endpoint: Optional[str] = None,
+                   block_resources: bool = BLOCK_RESOURCES, url: str = CHATGPT_URL) -> bool:
+    """Run `sessions` copies of a prompt concurrently. Returns True if all succeed."""
+    scenarios = [Scenario(name=f"session-{i + 1}", prompt=prompt, url=url)
+                 for i in range(sessions)]
+    engine = AsyncSessionEngine(concurrency=concurrency, headless=headless, endpoint=endpoint,
+                                block_resources=block_resources)
+    agent_log.bind(run_id=agent_log.new_run_id())
+    results = asyncio.run(engine.run(scenarios))
+
+    passed = sum(1 for r in results if r.success)
+    log(f"\n📊 {passed}/{len(results)} sessions succeeded")
+    for r in results:
+        status = "✅" if r.success else "❌"
+        log(f"   {status} {r.name}: {r.elapsed_s:.1f}s {r.error}")
+    return passed == len(results)
@@ -0,0 +1,199 @@
+"""
+File Attachment Engine
+
+Attaches one or more local files to the prompt composer. Three strategies are
+tried in order, and the first one that works wins:
+
+    input       set_input_files() on the page's <input type="file">
+    chooser     click the attach button and answer the file chooser
+    drop        dispatch a synthetic drag-and-drop on the composer
+
+The first two hand Playwright file paths, not bytes. The browser then reads
+the files from disk directly, or Playwright streams them when the browser is
+remote, so Python never holds a whole file in memory. Only the drop fallback
+needs the bytes in the page. Its base64 payloads are cached per file
+(path, size, mtime), so a file reused across prompts is encoded once, and the
+page decodes them with fetch() on a data: URL instead of a charCodeAt loop.
+
+Both a sync (main.py) and an async (async_engine.py) entry point are provided.
+"""
+
+import base64
+import mimetypes
+import os
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, List, Optional
+
+from selector_cache import SelectorCache
+from selector_resolver import resolve, resolve_async
+
+FILE_INPUT_SELECTOR = "input[type='file']"
+ATTACH_BUTTON_SELECTORS = [
+    "[data-testid='composer-plus-btn']",
+    "button[aria-label*='Attach']",
+    "button[aria-label*='Upload']",
+]
+CHOOSER_TIMEOUT_MS = 3000
+PAYLOAD_CACHE_SIZE = 16  # Prepared drop payloads kept in memory
+
+# Resolves with {success, error?}; files are [{name, mimeType, dataUrl}]
+DROP_FILES_JS = """
+async (args) => {
+    const { selector, files } = args;
+    const target = document.querySelector(selector);
+    if (!target) return { success: false, error: 'Target not found' };
+    const dataTransfer = new DataTransfer();
+    for (const f of files) {
+        const blob = await (await fetch(f.dataUrl)).blob();
+        dataTransfer.items.add(new File([blob], f.name, { type: f.mimeType }));
+    }
+    const rect = target.getBoundingClientRect();
+    const evt = (type) => new DragEvent(type, {
+        bubbles: true, cancelable: true, dataTransfer,
+        clientX: rect.left + rect.width/2, clientY: rect.top + rect.height/2
+    });
+    target.dispatchEvent(evt('dragenter'));
+    await new Promise(r => setTimeout(r, 100));
+    target.dispatchEvent(evt('dragover'));
+    await new Promise(r => setTimeout(r, 100));
+    target.dispatchEvent(evt('drop'));
+    return { success: true };
+}
+"""
+
+_payloads: "OrderedDict[tuple, dict]" = OrderedDict()
+
+
+@dataclass
+class AttachResult:
+    """Outcome of attaching a set of files."""
+    method: Optional[str]
+    files: int
+    elapsed_ms: float
+    error: str = ""
+
+    @property
+    def success(self) -> bool:
+        return self.method is not None
+
+    def describe(self) -> str:
+        """One-line summary for the log."""
+        if not self.success:
+            return f"{self.files} file(s) not attached: {self.error} ({self.elapsed_ms:.0f}ms)"
+        return f"{self.files} file(s) attached via {self.method} ({self.elapsed_ms:.0f}ms)"
+
+
+def _elapsed_ms(start: float) -> float:
+    return (time.perf_counter() - start) * 1000
+
+
+def mime_type(path: str) -> str:
+    """Guess a file's MIME type, defaulting to image/jpeg like the original shim."""
+    return mimetypes.guess_type(path)[0] or "image/jpeg"
+
+
+def drop_payload(path: str) -> dict:
+    """Return the cached drop payload for a file, encoding it on first use."""
+    stat = os.stat(path)
+    key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+    payload = _payloads.get(key)
+    if payload is None:
+        with open(path, "rb") as f:
+            encoded = base64.b64encode(f.read()).decode("ascii")
+        mime = mime_type(path)
+        payload = {
+            "name": os.path.basename(path),
+            "mimeType": mime,
+            "dataUrl": f"data:{mime};base64,{encoded}",
+        }
+        _payloads[key] = payload
+        while len(_payloads) > PAYLOAD_CACHE_SIZE:
+            _payloads.popitem(last=False)
+    else:
+        _payloads.move_to_end(key)
+    return payload
+
+
+def attach_files(page, paths: List[str], drop_selectors: List[str],
+                 cache: Optional[SelectorCache] = None,
+                 log: Callable[[str], None] = print) -> AttachResult:
+    """Attach every file in paths, trying input, chooser, then drop."""
+    start = time.perf_counter()
+    errors = []
+
+    try:
+        file_input = page.locator(FILE_INPUT_SELECTOR).first
+        if file_input.count():
+            file_input.set_input_files(paths)
+            return AttachResult("input", len(paths), _elapsed_ms(start))
+    except Exception as e:
+        errors.append(f"input: {str(e)}")
+
+    button = resolve(page, ATTACH_BUTTON_SELECTORS, timeout_ms=1000, label="attach button",
+                     cache=cache)
+    if button.found:
+        try:
+            with page.expect_file_chooser(timeout=CHOOSER_TIMEOUT_MS) as chooser_info:
+                button.locator.click()
+            chooser_info.value.set_files(paths)
+            return AttachResult("chooser", len(paths), _elapsed_ms(start))
+        except Exception as e:
+            errors.append(f"chooser: {str(e)}")
+
+    log("   Falling back to drag-and-drop attachment")
+    target = resolve(page, drop_selectors, timeout_ms=2000, label="drop target", cache=cache)
+    if not target.found:
+        errors.append("drop: no drop target")
+        return AttachResult(None, len(paths), _elapsed_ms(start), "; ".join(errors))
+    result = page.evaluate(DROP_FILES_JS, {
+        "selector": target.selector,
+        "files": [drop_payload(path) for path in paths],
+    })
+    if result.get("success"):
+        return AttachResult("drop", len(paths), _elapsed_ms(start))
+    errors.append(f"drop: {result.get('error')}")
+    return AttachResult(None, len(paths), _elapsed_ms(start), "; ".join(errors))
+
+
+async def attach_files_async(page, paths: List[str], drop_selectors: List[str],
+                             cache: Optional[SelectorCache] = None,
+                             log: Callable[[str], None] = print) -> AttachResult:
+    """Async variant of attach_files()."""
+    start = time.perf_counter()
+    errors = []
+
+    try:
+        file_input = page.locator(FILE_INPUT_SELECTOR).first
+        if await file_input.count():
+            await file_input.set_input_files(paths)
+            return AttachResult("input", len(paths), _elapsed_ms(start))
+    except Exception as e:
+        errors.append(f"input: {str(e)}")
+
+    button = await resolve_async(page, ATTACH_BUTTON_SELECTORS, timeout_ms=1000,
+                                 label="attach button", cache=cache)
+    if button.found:
+        try:
+            async with page.expect_file_chooser(timeout=CHOOSER_TIMEOUT_MS) as chooser_info:
+                await button.locator.click()
+            await (await chooser_info.value).set_files(paths)
+            return AttachResult("chooser", len(paths), _elapsed_ms(start))
+        except Exception as e:
+            errors.append(f"chooser: {str(e)}")
+
+    log("   Falling back to drag-and-drop attachment")
+    target = await resolve_async(page, drop_selectors, timeout_ms=2000, label="drop target",
+                                 cache=cache)
+    if not target.found:
+        errors.append("drop: no drop target")
+        return AttachResult(None, len(paths), _elapsed_ms(start), "; ".join(errors))
+    result = await page.evaluate(DROP_FILES_JS, {
+        "selector": target.selector,
+        "files": [drop_payload(path) for path in paths],
+    })
+    if result.get("success"):
+        return AttachResult("drop", len(paths), _elapsed_ms(start))
+    errors.append(f"drop: {result.get('error')}")
+    return AttachResult(None, len(paths), _elapsed_ms(start), "; ".join(errors))
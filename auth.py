@@ -0,0 +1,266 @@
+"""
+Authenticated Session State
+
+Saves and reuses Playwright storage_state (cookies and localStorage) per
+account, so a fresh context starts out logged in. This removes the manual
+login from every cold run.
+
+State lives in <directory>/<target host>/<account>.json, so logins for
+different targets never overwrite or clear each other. It is written
+atomically with owner-only permissions. Its status is computed from the target's session
+cookies:
+
+    missing   no saved state, or no session cookie for the target
+    expired   a session cookie has expired (the state is not used)
+    stale     expires within refresh_margin_s, or the file is older than
+              max_age_s (still used, but due for a refresh)
+    valid
+
+The parsed state is loaded once and shared by every context. Pool contexts
+are created from the same dict and never write to it; only save() replaces
+it. A stale state is refreshed in the background: a throwaway context with
+the current state loads the target, and the rotated cookies are saved.
+
+    auth = get_auth("auth_state", "default", "https://chatgpt.com")
+    context = browser.new_context(storage_state=auth.load(), ...)
+"""
+
+import asyncio
+import json
+import os
+import tempfile
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+from selector_resolver import resolve, resolve_async
+
+# Per target host: cookies that carry the login session
+SESSION_COOKIES = {
+    "chatgpt.com": ["__Secure-next-auth.session-token"],
+}
+LOGIN_SELECTORS = ["text=Log in", "button[data-testid='login-button']"]
+REFRESH_MARGIN_S = 24 * 3600  # Refresh when the session expires within a day
+MAX_AGE_S = 7 * 24 * 3600  # Refresh state files older than a week
+REFRESH_CHECK_S = 300  # How often the background refresher checks the status
+LOGIN_CHECK_MS = 15000  # How long the page gets to draw its prompt input or login button
+
+_states: Dict[Tuple[str, str], "AuthState"] = {}
+
+
+def _host_matches(domain: str, host: str) -> bool:
+    """True if a cookie domain (".chatgpt.com") applies to host."""
+    domain = domain.lstrip(".")
+    return host == domain or host.endswith("." + domain)
+
+
+def target_host(target_url: str) -> str:
+    """Directory name for a target's saved logins (its host, port included)."""
+    host = urlparse(target_url).netloc or target_url
+    return host.replace(":", "_").replace("/", "_")
+
+
+class AuthState:
+    """Saved login state for one account on one target."""
+
+    def __init__(self, directory: str, account: str, target_url: str,
+                 refresh_margin_s: float = REFRESH_MARGIN_S, max_age_s: float = MAX_AGE_S):
+        self.path = os.path.join(os.path.abspath(directory), target_host(target_url),
+                                 f"{account}.json")
+        self.account = account
+        self.target_url = target_url
+        self.refresh_margin_s = refresh_margin_s
+        self.max_age_s = max_age_s
+        self._state: Optional[dict] = None
+        self._mtime: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def _read(self) -> Optional[dict]:
+        """The state on disk, re-parsed only when the file changed."""
+        with self._lock:
+            try:
+                mtime = os.path.getmtime(self.path)
+            except OSError:
+                self._state, self._mtime = None, None
+                return None
+            if mtime != self._mtime:
+                try:
+                    with open(self.path) as f:
+                        self._state = json.load(f)
+                except (OSError, ValueError):
+                    self._state = None
+                self._mtime = mtime
+            return self._state
+
+    def session_cookies(self, state: dict) -> List[dict]:
+        """Cookies in state that carry the login session for the target."""
+        host = urlparse(self.target_url).netloc
+        names = [n for site, cookie_names in SESSION_COOKIES.items()
+                 if _host_matches(site, host) for n in cookie_names]
+        cookies = [c for c in state.get("cookies", []) if _host_matches(c["domain"], host)]
+        if names:
+            return [c for c in cookies if c["name"] in names]
+        # Unknown site: treat its persistent cookies as the session
+        return [c for c in cookies if c.get("expires", -1) > 0]
+
+    def expires_at(self) -> Optional[float]:
+        """Earliest session cookie expiry (epoch seconds), None if unknown."""
+        state = self._read()
+        if not state:
+            return None
+        expiries = [c["expires"] for c in self.session_cookies(state) if c.get("expires", -1) > 0]
+        return min(expiries) if expiries else None
+
+    def status(self) -> str:
+        """missing, expired, stale or valid (see the module docstring)."""
+        state = self._read()
+        if not state or not self.session_cookies(state):
+            return "missing"
+        now = time.time()
+        expires = self.expires_at()
+        if expires is not None and expires <= now:
+            return "expired"
+        if expires is not None and expires - now < self.refresh_margin_s:
+            return "stale"
+        if self._mtime is not None and now - self._mtime > self.max_age_s:
+            return "stale"
+        return "valid"
+
+    def load(self) -> Optional[dict]:
+        """The shared state for new_context(storage_state=...), or None if unusable.
+
+        Callers must treat the dict as read-only.
+        """
+        if self.status() in ("missing", "expired"):
+            return None
+        return self._read()
+
+    def describe(self) -> str:
+        status = self.status()
+        expires = self.expires_at()
+        if status in ("valid", "stale") and expires is not None:
+            return f"{status}, expires in {(expires - time.time()) / 3600:.1f}h"
+        return status
+
+    def save(self, state: dict):
+        """Atomically replace the saved state (owner-only, it holds session tokens)."""
+        directory = os.path.dirname(self.path)
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f".{self.account}.")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(state, f)
+            os.chmod(tmp_path, 0o600)
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        self._read()
+
+    def invalidate(self):
+        """Drop the saved state (the site rejected it)."""
+        with self._lock:
+            try:
+                os.unlink(self.path)
+            except OSError:
+                pass
+            self._state, self._mtime = None, None
+
+    def capture(self, context):
+        """Save the current state of a logged-in context."""
+        self.save(context.storage_state())
+
+    async def capture_async(self, context):
+        """Async variant of capture()."""
+        self.save(await context.storage_state())
+
+    async def refresh_async(self, browser, options: dict, ready_selectors: List[str],
+                            timeout_ms: int = 30000) -> bool:
+        """Load the target with the current state and save the rotated cookies.
+
+        Runs in its own context, so pool contexts are never touched. Returns
+        True if the session was still logged in. The state is only saved once
+        the page has drawn its prompt input (ready_selectors), and only cleared
+        once it has drawn a login button.
+        """
+        state = self._read()
+        if not state:
+            return False
+        context = await browser.new_context(**dict(options, storage_state=state))
+        try:
+            page = await context.new_page()
+            await page.goto(self.target_url, wait_until="domcontentloaded", timeout=timeout_ms)
+            logged_in = await is_logged_in_async(page, ready_selectors)
+            if logged_in is False:
+                self.invalidate()
+            if not logged_in:
+                return False
+            await self.capture_async(context)
+            return True
+        finally:
+            await context.close()
+
+    def start_refresher(self, browser, options: dict, ready_selectors: List[str], log=None,
+                        interval_s: float = REFRESH_CHECK_S) -> "asyncio.Task":
+        """Refresh the state in the background whenever it turns stale."""
+
+        async def refresher():
+            while True:
+                if self.status() == "stale":
+                    try:
+                        ok = await self.refresh_async(browser, options, ready_selectors)
+                        if log:
+                            log(f"🔑 Login state for {self.account} " + (
+                                "refreshed" if ok else
+                                "rejected, cleared" if self.status() == "missing" else
+                                "not confirmed, kept"))
+                    except Exception as e:
+                        if log:
+                            log(f"⚠️  Login state refresh failed: {str(e)}")
+                await asyncio.sleep(interval_s)
+
+        return asyncio.ensure_future(refresher())
+
+
+def get_auth(directory: str, account: str, target_url: str) -> AuthState:
+    """Return the shared state manager for an account on a target."""
+    key = (os.path.join(os.path.abspath(directory), account), target_host(target_url))
+    if key not in _states:
+        _states[key] = AuthState(directory, account, target_url)
+    return _states[key]
+
+
+def _login_verdict(resolution) -> Optional[bool]:
+    if not resolution.found:
+        return None
+    return resolution.selector not in LOGIN_SELECTORS
+
+
+def is_logged_in(page, ready_selectors: List[str],
+                 timeout_ms: int = LOGIN_CHECK_MS) -> Optional[bool]:
+    """Wait for a login button or the prompt input (ready_selectors) to appear.
+
+    True if the input appears without a login button, False if a login button
+    appears (it wins when both are drawn), None if neither appears in time.
+    """
+    return _login_verdict(resolve(page, LOGIN_SELECTORS + list(ready_selectors),
+                                  timeout_ms=timeout_ms, label="login check"))
+
+
+async def is_logged_in_async(page, ready_selectors: List[str],
+                             timeout_ms: int = LOGIN_CHECK_MS) -> Optional[bool]:
+    """Async variant of is_logged_in()."""
+    return _login_verdict(await resolve_async(page, LOGIN_SELECTORS + list(ready_selectors),
+                                              timeout_ms=timeout_ms, label="login check"))
+
+
+def wait_for_login(page, ready_selectors: List[str], timeout_ms: int,
+                   poll_ms: int = 1000) -> bool:
+    """Wait until the login prompt goes away (a manual login), up to timeout_ms."""
+    deadline = time.monotonic() + timeout_ms / 1000
+    while time.monotonic() < deadline:
+        if is_logged_in(page, ready_selectors, timeout_ms=poll_ms):
+            return True
+        page.wait_for_timeout(poll_ms)
+    return False
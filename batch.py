@@ -0,0 +1,158 @@
+"""
+Batch Prompt Runner
+
+Runs a file of prompts through the async session engine and streams each
+result to a sink as soon as that session finishes. Nothing is held until
+the end, so a crash at prompt 400 of 500 loses one result, not 399.
+
+Prompt files:
+    *.jsonl   one object per line: {"prompt": "...", "name": "...", "attachments": [...]}
+              ("name" and "attachments" are optional)
+    other     one prompt per line; blank lines and lines starting with # are skipped
+
+Result sinks, chosen by extension:
+    *.db, *.sqlite, *.sqlite3   SQLite table `results`, committed per row
+    other                       JSON Lines, flushed per row
+
+Usage:
+    python main.py --prompts prompts.jsonl --results results.db --concurrency 8
+"""
+
+import asyncio
+import json
+import os
+import sqlite3
+import time
+from typing import List, Optional
+
+import agent_log
+from async_engine import AsyncSessionEngine, Scenario, SessionResult
+from main import log, BLOCK_RESOURCES, CHATGPT_URL, DEFAULT_CONCURRENCY, HEADLESS
+
+SQLITE_EXTENSIONS = (".db", ".sqlite", ".sqlite3")
+
+
+def load_prompts(path: str, url: str = CHATGPT_URL) -> List[Scenario]:
+    """Read a prompt file into scenarios, named prompt-N unless the file names them."""
+    scenarios = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            name = f"prompt-{len(scenarios) + 1}"
+            if path.endswith(".jsonl"):
+                entry = json.loads(line)
+                scenarios.append(Scenario(
+                    name=entry.get("name", name),
+                    prompt=entry["prompt"],
+                    url=entry.get("url", url),
+                    attachments=[os.path.expanduser(a) for a in entry.get("attachments", [])],
+                ))
+            else:
+                scenarios.append(Scenario(name=name, prompt=line, url=url))
+    return scenarios
+
+
+def result_record(scenario: Scenario, result: SessionResult) -> dict:
+    """Flatten one finished session into a sink row."""
+    return {
+        "name": scenario.name,
+        "prompt": scenario.prompt,
+        "attachments": scenario.attachments,
+        "success": result.success,
+        "response": result.response,
+        "error": result.error,
+        "elapsed_s": round(result.elapsed_s, 3),
+        "stream": result.stream,
+        "finished": time.time(),
+    }
+
+
+class JsonlSink:
+    """Appends one JSON object per result."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "a", encoding="utf-8")
+
+    def write(self, record: dict):
+        self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+class SqliteSink:
+    """Inserts one row per result into a `results` table."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._db = sqlite3.connect(path)
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS results (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                name TEXT, prompt TEXT, attachments TEXT, success INTEGER,
+                response TEXT, error TEXT, elapsed_s REAL, finished REAL,
+                ttft_ms REAL, chars_per_s REAL, generation_ms REAL, stalls INTEGER
+            )
+        """)
+        self._db.commit()
+
+    def write(self, record: dict):
+        stream = record["stream"]
+        self._db.execute(
+            "INSERT INTO results (name, prompt, attachments, success, response, error, "
+            "elapsed_s, finished, ttft_ms, chars_per_s, generation_ms, stalls) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (record["name"], record["prompt"], json.dumps(record["attachments"]),
+             int(record["success"]), record["response"], record["error"],
+             record["elapsed_s"], record["finished"], stream.get("ttft_ms"),
+             stream.get("chars_per_s"), stream.get("generation_ms"), stream.get("stalls")),
+        )
+        self._db.commit()
+
+    def close(self):
+        self._db.close()
+
+
+def open_sink(path: str):
+    """Return a SQLite sink for database extensions, else a JSON Lines sink."""
+    if path.lower().endswith(SQLITE_EXTENSIONS):
+        return SqliteSink(path)
+    return JsonlSink(path)
+
+
+def run_batch(prompts_path: str, results_path: str, concurrency: int = DEFAULT_CONCURRENCY,
+              headless: bool = HEADLESS, endpoint: Optional[str] = None,
+              block_resources: bool = BLOCK_RESOURCES, url: str = CHATGPT_URL) -> bool:
+    """Run every prompt in prompts_path, streaming results. Returns True if all succeed."""
+    scenarios = load_prompts(prompts_path, url)
+    if not scenarios:
+        log(f"No prompts found in {prompts_path}", is_error=True)
+        return False
+    sink = open_sink(results_path)
+    done = []
+
+    def on_result(scenario: Scenario, result: SessionResult):
+        sink.write(result_record(scenario, result))
+        done.append(result.success)
+        log(f"   [{scenario.name}] Result {len(done)}/{len(scenarios)} written to {results_path}")
+
+    log(f"📦 Batch: {len(scenarios)} prompts from {prompts_path} -> {results_path}")
+    agent_log.bind(run_id=agent_log.new_run_id())
+    engine = AsyncSessionEngine(concurrency=concurrency, headless=headless, endpoint=endpoint,
+                                on_result=on_result, block_resources=block_resources)
+    start = time.monotonic()
+    try:
+        asyncio.run(engine.run(scenarios))
+    finally:
+        sink.close()
+
+    elapsed = time.monotonic() - start
+    passed = sum(done)
+    rate = len(done) / elapsed * 60 if elapsed else 0.0
+    log(f"\n📊 {passed}/{len(scenarios)} prompts succeeded in {elapsed:.0f}s "
+        f"({rate:.1f} prompts/min)")
+    return passed == len(scenarios)
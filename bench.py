@@ -0,0 +1,380 @@
+#!/usr/bin/env python3
+"""
+Benchmark Suite
+
+Measures the agent's own overhead against the local ChatGPT stand-in
+(mock_server.py), so the numbers do not depend on the network or the real
+service. Two benchmarks are run:
+
+    steps   run_test() end to end, several times. Reports wall time per step
+            (p50/p95) and Playwright protocol calls per step.
+    scale   the async engine at concurrency 1/4/16/64. Reports
+            sessions/minute and the success rate.
+
+Peak RSS of the driver (this Python process) and of the browser (all child
+processes) is sampled while each benchmark runs. With psutil installed the
+whole child tree is sampled; otherwise getrusage() gives the peak of the
+largest child.
+
+Results are written as JSON. `compare` flags regressions between two files:
+slower steps, more protocol calls, more memory or fewer sessions/minute.
+
+Usage:
+    python bench.py run --runs 3 --levels 1,4,16,64 --out bench_results.json
+    python bench.py compare baseline.json bench_results.json --threshold 10
+"""
+
+import argparse
+import asyncio
+import base64
+import functools
+import json
+import os
+import platform
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List
+
+import agent_log
+import pacing
+import tracing
+from mock_server import MockConfig, start_in_thread
+
+DEFAULT_LEVELS = [1, 4, 16, 64]
+DEFAULT_OUT = "bench_results.json"
+RSS_SAMPLE_S = 0.2
+LAUNCH_MODE = "cold-headless"  # Both halves launch a fresh headless Chrome, no saved login
+# Minimal 1x1 PNG used as the Step 4 attachment
+FIXTURE_PNG = base64.b64decode(
+    "iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAQAAAC1HAwCAAAAC0lEQVR42mNkYAAAAAYAAjCB0C8AAAAASUVORK5CYII="
+)
+
+
+class ProtocolCounter:
+    """Counts Playwright protocol messages, attributed to the current trace step.
+
+    Wraps the private Channel send methods. If a Playwright release renames
+    them, counting is switched off and reported as unavailable.
+    """
+
+    METHODS = ("send", "send_return_as_dict", "send_no_reply")
+
+    def __init__(self):
+        self.counts: Dict[str, int] = {}
+        self.available = False
+        self._lock = threading.Lock()
+        self._originals = {}
+
+    def _hit(self):
+        step = tracing.current_step() or "other"
+        with self._lock:
+            self.counts[step] = self.counts.get(step, 0) + 1
+
+    def install(self):
+        try:
+            from playwright._impl._connection import Channel
+        except ImportError:
+            return
+        for name in self.METHODS:
+            original = getattr(Channel, name, None)
+            if original is None:
+                continue
+
+            def wrapper(channel, *args, _original=original, **kwargs):
+                self._hit()
+                return _original(channel, *args, **kwargs)
+
+            self._originals[name] = original
+            setattr(Channel, name, functools.wraps(original)(wrapper))
+        self.available = bool(self._originals)
+
+    def uninstall(self):
+        if not self._originals:
+            return
+        from playwright._impl._connection import Channel
+        for name, original in self._originals.items():
+            setattr(Channel, name, original)
+        self._originals.clear()
+
+    def take(self) -> Dict[str, int]:
+        """Return and reset the counts."""
+        with self._lock:
+            counts, self.counts = self.counts, {}
+        return counts
+
+
+class RssSampler:
+    """Peak resident memory of this process and of its child processes, in MB."""
+
+    def __init__(self):
+        self.driver_mb = 0.0
+        self.browser_mb = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+        try:
+            import psutil
+            self._process = psutil.Process()
+        except ImportError:
+            self._process = None
+
+    def _sample(self):
+        driver = self._process.memory_info().rss
+        browser = 0
+        for child in self._process.children(recursive=True):
+            try:
+                browser += child.memory_info().rss
+            except Exception:
+                continue
+        self.driver_mb = max(self.driver_mb, driver / 2**20)
+        self.browser_mb = max(self.browser_mb, browser / 2**20)
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self._sample()
+            except Exception:
+                pass
+            self._stop.wait(RSS_SAMPLE_S)
+
+    def __enter__(self):
+        if self._process is not None:
+            self._thread = threading.Thread(target=self._run, name="rss-sampler", daemon=True)
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+        else:
+            import resource  # Unix only; without psutil there is no Windows fallback
+            # ru_maxrss is KB on Linux and bytes on macOS
+            unit = 2**20 if platform.system() == "Darwin" else 2**10
+            self.driver_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / unit
+            self.browser_mb = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / unit
+        return False
+
+    def result(self) -> dict:
+        return {"driver_peak_rss_mb": round(self.driver_mb, 1),
+                "browser_peak_rss_mb": round(self.browser_mb, 1),
+                "rss_source": "psutil" if self._process is not None else "getrusage"}
+
+
+@contextmanager
+def configured_agent(url: str, pace: str, workdir: str):
+    """Point main.py at the mock and make it non-interactive for the benchmark."""
+    import main
+    saved = {name: getattr(main, name) for name in (
+        "CHATGPT_URL", "HEADLESS", "BATCH_MODE", "ATTACHMENTS", "OUTPUT_FILE",
+        "JSONL_LOG_FILE", "SCREENSHOT_POLICY", "SELECTOR_CACHE_FILE", "TRACE_FILE",
+        "RESULT_STORE_FILE", "TIMING_MODEL_FILE", "USE_BROWSER_SERVER", "AUTH_STATE_DIR")}
+    fixture = os.path.join(workdir, "fixture.png")
+    with open(fixture, "wb") as f:
+        f.write(FIXTURE_PNG)
+    main.CHATGPT_URL = url
+    main.HEADLESS = True
+    main.BATCH_MODE = True
+    main.ATTACHMENTS = [fixture]
+    main.OUTPUT_FILE = os.path.join(workdir, "bench_output.log")
+    main.JSONL_LOG_FILE = None
+    main.SCREENSHOT_POLICY = "on-failure"
+    main.SELECTOR_CACHE_FILE = None
+    main.TRACE_FILE = None
+    main.RESULT_STORE_FILE = None  # Mock answers must not reach the real history
+    main.TIMING_MODEL_FILE = None  # Fixed timeouts: reproducible, and no dead mock ports learned
+    # Every part of a report measures the same setup: a cold headless launch, no saved login
+    main.USE_BROWSER_SERVER = False
+    main.AUTH_STATE_DIR = None
+    previous_pace = pacing.current().name
+    pacing.set_profile(pace)
+    try:
+        yield main
+    finally:
+        for name, value in saved.items():
+            setattr(main, name, value)
+        pacing.set_profile(previous_pace)
+
+
+def bench_steps(url: str, runs: int, pace: str, workdir: str) -> dict:
+    """Run run_test() `runs` times and report per-step wall time and protocol calls."""
+    counter = ProtocolCounter()
+    counter.install()
+    tracer = tracing.get_tracer()
+    walls: Dict[str, List[float]] = {}
+    calls: Dict[str, List[int]] = {}
+    successes = 0
+    try:
+        with configured_agent(url, pace, workdir) as main, RssSampler() as rss:
+            for i in range(runs):
+                tracer.reset()
+                counter.take()
+                with agent_log.bound(session=f"bench-run-{i + 1}"):
+                    successes += bool(main.run_test())
+                    tracing.end_step()
+                for event in tracer.events:
+                    if event["cat"] == "step":
+                        walls.setdefault(event["name"], []).append(event["dur"] / 1000)
+                for step, count in counter.take().items():
+                    calls.setdefault(step, []).append(count)
+    finally:
+        counter.uninstall()
+        tracer.reset()
+
+    steps = {
+        name: {
+            "p50_ms": round(tracing.percentile(values, 50), 1),
+            "p95_ms": round(tracing.percentile(values, 95), 1),
+            "calls": round(sum(calls.get(name, [0])) / runs, 1) if counter.available else None,
+        }
+        for name, values in sorted(walls.items())
+    }
+    return {"runs": runs, "successes": successes, "steps": steps, **rss.result()}
+
+
+def bench_scale(url: str, levels: List[int], pace: str, workdir: str,
+                sessions_per_level: int = 2) -> dict:
+    """Run the async engine at each concurrency level and report sessions/minute."""
+    from async_engine import AsyncSessionEngine, Scenario
+    results = {}
+    with configured_agent(url, pace, workdir) as main:
+        for level in levels:
+            sessions = max(level * sessions_per_level, 4)
+            scenarios = [Scenario(name=f"c{level}-{i + 1}", prompt=main.PROMPT, url=url)
+                         for i in range(sessions)]
+            engine = AsyncSessionEngine(concurrency=level, headless=True)
+            with RssSampler() as rss:
+                start = time.monotonic()
+                outcome = asyncio.run(engine.run(scenarios))
+                elapsed = time.monotonic() - start
+            passed = sum(1 for r in outcome if r.success)
+            results[str(level)] = {
+                "sessions": sessions,
+                "succeeded": passed,
+                "elapsed_s": round(elapsed, 2),
+                # Successful sessions only: failing fast is not throughput
+                "sessions_per_min": round(passed / elapsed * 60, 1) if elapsed else 0.0,
+                **rss.result(),
+            }
+            main.log(f"📈 concurrency {level}: {results[str(level)]['sessions_per_min']} "
+                     f"sessions/min ({passed}/{sessions} ok)")
+    tracing.get_tracer().reset()
+    return results
+
+
+def run(args) -> int:
+    """Run the benchmarks and write the result file."""
+    config = MockConfig(latency_ms=args.latency_ms, latency_jitter_ms=0,
+                        tokens_per_s=args.tokens_per_s, tokens_jitter=0, seed=0)
+    server, url = start_in_thread(config=config)
+    workdir = tempfile.mkdtemp(prefix="agent-bench-")
+    try:
+        results = {
+            "created": time.time(),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "pace": args.pace,
+            "launch": LAUNCH_MODE,
+            "mock": {"latency_ms": args.latency_ms, "tokens_per_s": args.tokens_per_s},
+            "steps": bench_steps(url, args.runs, args.pace, workdir),
+        }
+        if args.levels:
+            results["scale"] = bench_scale(url, args.levels, args.pace, workdir)
+    finally:
+        server.shutdown()
+    with open(args.out, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"Benchmark results written to {args.out}")
+    return 0
+
+
+def compare(baseline: dict, current: dict, threshold_pct: float) -> List[str]:
+    """List every metric that got worse by more than threshold_pct."""
+    regressions = []
+    if baseline.get("launch", LAUNCH_MODE) != current.get("launch", LAUNCH_MODE):
+        regressions.append(f"launch mode differs: {baseline.get('launch', LAUNCH_MODE)} -> "
+                           f"{current.get('launch', LAUNCH_MODE)} (results not comparable)")
+
+    def check(label: str, old, new, higher_is_worse: bool = True):
+        if not old or new is None:
+            return
+        change = (new - old) / old * 100
+        if (change if higher_is_worse else -change) > threshold_pct:
+            regressions.append(f"{label}: {old} -> {new} ({change:+.1f}%)")
+
+    old_steps = baseline.get("steps", {})
+    new_steps = current.get("steps", {})
+    for name, old in old_steps.get("steps", {}).items():
+        new = new_steps.get("steps", {}).get(name)
+        if new is None:
+            continue
+        check(f"{name} p50_ms", old["p50_ms"], new["p50_ms"])
+        check(f"{name} p95_ms", old["p95_ms"], new["p95_ms"])
+        check(f"{name} calls", old.get("calls"), new.get("calls"))
+    for key in ("driver_peak_rss_mb", "browser_peak_rss_mb"):
+        check(f"steps {key}", old_steps.get(key), new_steps.get(key))
+    for level, old in baseline.get("scale", {}).items():
+        new = current.get("scale", {}).get(level)
+        if new is None:
+            continue
+        check(f"concurrency {level} sessions_per_min", old["sessions_per_min"],
+              new["sessions_per_min"], higher_is_worse=False)
+        old_rate = old["succeeded"] / old["sessions"] if old.get("sessions") else None
+        new_rate = new["succeeded"] / new["sessions"] if new.get("sessions") else None
+        if old_rate is not None and new_rate is not None and new_rate < old_rate:
+            regressions.append(f"concurrency {level} success rate: {old_rate:.0%} -> "
+                               f"{new_rate:.0%}")
+        check(f"concurrency {level} browser_peak_rss_mb", old.get("browser_peak_rss_mb"),
+              new.get("browser_peak_rss_mb"))
+    return regressions
+
+
+def run_compare(args) -> int:
+    """Compare two result files; exit status 1 if anything regressed."""
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.current) as f:
+        current = json.load(f)
+    regressions = compare(baseline, current, args.threshold)
+    if not regressions:
+        print(f"✅ No regressions over {args.threshold:g}%")
+        return 0
+    print(f"❌ {len(regressions)} regression(s) over {args.threshold:g}%:")
+    for line in regressions:
+        print(f"   {line}")
+    return 1
+
+
+def parse_args(argv=None):
+    """Parse command-line options."""
+    parser = argparse.ArgumentParser(description="Agent overhead benchmarks")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = sub.add_parser("run", help="Run the benchmarks against the local mock")
+    run_parser.add_argument("--runs", type=int, default=3, help="run_test() repetitions")
+    run_parser.add_argument("--levels", default=",".join(map(str, DEFAULT_LEVELS)),
+                            type=lambda s: [int(x) for x in s.split(",") if x],
+                            help="Concurrency levels for the scale benchmark ('' to skip)")
+    run_parser.add_argument("--pace", choices=sorted(pacing.PROFILES), default="none")
+    run_parser.add_argument("--latency-ms", type=float, default=200.0)
+    run_parser.add_argument("--tokens-per-s", type=float, default=400.0)
+    run_parser.add_argument("--out", default=DEFAULT_OUT)
+
+    compare_parser = sub.add_parser("compare", help="Flag regressions between two result files")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument("--threshold", type=float, default=10.0,
+                                help="Percent change that counts as a regression (default 10)")
+    return parser.parse_args(argv)
+
+
+def main():
+    """Entry point."""
+    args = parse_args()
+    sys.exit(run(args) if args.command == "run" else run_compare(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+"""
+Warm Browser Server and Context Pool
+
+Keeps one Chrome running between test runs so that each run attaches to it
+rather than paying for a cold launch and teardown.
+
+Playwright's launch_server() is only available in the Node.js API. In Python
+we get the same effect by launching Chrome with a remote debugging port and
+attaching to it with connect_over_cdp(). The server writes its endpoint to a
+small state file; runs that find a live endpoint there attach automatically.
+
+Usage:
+    python main.py --serve-browser          # terminal 1, keep it running
+    python main.py --batch                  # terminal 2, attaches to the warm Chrome
+"""
+
+import asyncio
+import json
+import os
+import time
+import urllib.request
+from typing import Awaitable, Callable, List, Optional
+
+DEFAULT_DEBUG_PORT = 9222
+
+
+def write_state(state_file: str, endpoint: str):
+    """Record the running server's endpoint."""
+    with open(state_file, "w") as f:
+        json.dump({"endpoint": endpoint, "pid": os.getpid(), "started": time.time()}, f)
+
+
+def read_endpoint(state_file: str, probe_timeout: float = 1.0) -> Optional[str]:
+    """Return the warm browser's CDP endpoint if a server is running, else None."""
+    try:
+        with open(state_file) as f:
+            endpoint = json.load(f)["endpoint"]
+        with urllib.request.urlopen(f"{endpoint}/json/version", timeout=probe_timeout):
+            return endpoint
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def serve(p, state_file: str, launch_args: List[str], port: int = DEFAULT_DEBUG_PORT,
+          headless: bool = False, log: Callable[[str], None] = print):
+    """Launch Chrome with a debugging port and keep it alive until interrupted."""
+    browser = p.chromium.launch(
+        headless=headless,
+        channel="chrome",
+        args=launch_args + [f"--remote-debugging-port={port}"],
+    )
+    endpoint = f"http://127.0.0.1:{port}"
+    write_state(state_file, endpoint)
+    log(f"✅ Warm Chrome listening on {endpoint} (state: {state_file})")
+    log("   Press Ctrl+C to stop the server")
+    disconnected = []
+    browser.on("disconnected", lambda _: disconnected.append(True))
+    # The sync API only handles events (such as "disconnected") inside its own
+    # calls, so a cheap CDP round-trip each second pumps them; it also fails
+    # as soon as Chrome is gone
+    session = browser.new_browser_cdp_session()
+    try:
+        while not disconnected:
+            try:
+                session.send("Browser.getVersion")
+            except Exception:
+                if not disconnected:
+                    log("⚠️  Lost the connection to Chrome")
+                break
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if os.path.exists(state_file):
+            os.remove(state_file)
+        if disconnected:
+            log("⚠️  Chrome exited; endpoint withdrawn")
+        elif browser.is_connected():
+            browser.close()
+        log("Browser server stopped")
+
+
+def connect(p, endpoint: str, slow_mo: float = 0):
+    """Attach to a warm browser (sync API)."""
+    return p.chromium.connect_over_cdp(endpoint, slow_mo=slow_mo)
+
+
+async def connect_async(p, endpoint: str, slow_mo: float = 0):
+    """Attach to a warm browser (async API)."""
+    return await p.chromium.connect_over_cdp(endpoint, slow_mo=slow_mo)
+
+
+class ContextPool:
+    """A fixed set of pre-created browser contexts handed out to sessions.
+
+    Each context is created once with one open page and is reused across
+    sessions. Releasing a context closes any extra pages but keeps cookies and
+    storage, so a logged-in context stays logged in. A context that has died is
+    replaced on release. The pool size is also the concurrency limit. An optional
+    setup coroutine (e.g. request routing) runs on each new context before its
+    first page opens. An optional memory watchdog recycles contexts that have
+    grown too large when they are released.
+    """
+
+    def __init__(self, browser, size: int, options: dict,
+                 setup: Optional[Callable[..., Awaitable[None]]] = None, watchdog=None):
+        self.browser = browser
+        self.size = max(1, size)
+        self.options = options
+        self.setup = setup
+        self.watchdog = watchdog  # memory_watchdog.MemoryWatchdog checked on release
+        self._idle: asyncio.Queue = asyncio.Queue()
+        self._contexts: list = []
+
+    async def _new_context(self):
+        context = await self.browser.new_context(**self.options)
+        if self.setup is not None:
+            await self.setup(context)
+        await context.new_page()
+        self._contexts.append(context)
+        return context
+
+    async def start(self):
+        """Pre-create every context in parallel."""
+        contexts = await asyncio.gather(*(self._new_context() for _ in range(self.size)))
+        for context in contexts:
+            self._idle.put_nowait(context)
+
+    async def acquire(self):
+        """Wait for an idle context and return it."""
+        return await self._idle.get()
+
+    async def replace(self, context):
+        """Close a context and return a new one in its place."""
+        if context in self._contexts:
+            self._contexts.remove(context)
+        try:
+            await context.close()
+        except Exception:
+            pass
+        return await self._new_context()
+
+    async def release(self, context):
+        """Return a context to the pool, replacing it if it is no longer usable.
+
+        With a watchdog, a context over its memory thresholds is recycled first.
+        """
+        try:
+            pages = context.pages
+            if not pages:
+                await context.new_page()
+            for page in pages[1:]:
+                await page.close()
+            if self.watchdog is not None:
+                context = await self.watchdog.check(context, self.replace)
+        except Exception:
+            context = await self.replace(context)
+        self._idle.put_nowait(context)
+
+    async def close(self):
+        """Close every context owned by the pool."""
+        for context in self._contexts:
+            try:
+                await context.close()
+            except Exception:
+                pass
+        self._contexts.clear()
@@ -0,0 +1,156 @@
+"""
+Response Completion Detection
+
+Detects the end of a model response inside the browser instead of polling
+from Python. A MutationObserver watches the page; the wait resolves as soon
+as the "generating" indicators are gone and the newest assistant message has
+stopped changing for a short quiet window.
+
+Both a sync (main.py) and an async (async_engine.py) entry point are provided.
+Callers pass in their own selector lists, so this module has no dependency on
+the rest of the agent.
+"""
+
+from typing import List
+
+QUIET_MS = 1500  # Assistant message must be unchanged this long to count as done
+START_TIMEOUT_MS = 30000  # Give up if generation never starts
+POLL_MS = 250  # Quiet-window re-check interval
+
+COUNT_MESSAGES_JS = "(selector) => document.querySelectorAll(selector).length"
+
+# Resolves with {completed, reason, waitedMs, textLength}
+WAIT_FOR_COMPLETION_JS = """
+async (args) => {
+    const { indicators, messageSelector, previousCount, quietMs, startTimeoutMs, timeoutMs,
+            pollMs } = args;
+    const start = performance.now();
+
+    const isVisible = (el) => {
+        const rect = el.getBoundingClientRect();
+        const style = getComputedStyle(el);
+        return rect.width > 0 && rect.height > 0
+            && style.visibility !== 'hidden' && style.display !== 'none';
+    };
+    const isGenerating = () => {
+        for (const selector of indicators) {
+            try {
+                for (const el of document.querySelectorAll(selector)) {
+                    if (isVisible(el)) return true;
+                }
+            } catch (e) {
+                // Playwright-only selectors (e.g. :has-text) are handled below
+            }
+        }
+        for (const btn of document.querySelectorAll('button')) {
+            if (/^stop\\b/i.test(btn.textContent.trim()) && isVisible(btn)) return true;
+        }
+        return false;
+    };
+    const messages = () => document.querySelectorAll(messageSelector);
+    const lastMessage = () => {
+        const list = messages();
+        return list.length ? list[list.length - 1] : null;
+    };
+
+    return await new Promise((resolve) => {
+        let started = false;
+        let done = false;
+        let lastChange = performance.now();
+
+        const finish = (completed, reason) => {
+            if (done) return;
+            done = true;
+            observer.disconnect();
+            clearInterval(timer);
+            const last = lastMessage();
+            resolve({
+                completed,
+                reason,
+                waitedMs: Math.round(performance.now() - start),
+                textLength: last ? last.innerText.length : 0,
+            });
+        };
+        const check = () => {
+            const now = performance.now();
+            if (!started) {
+                if (isGenerating() || messages().length > previousCount) {
+                    started = true;
+                    lastChange = now;
+                } else if (now - start > startTimeoutMs) {
+                    finish(false, 'not_started');
+                }
+                return;
+            }
+            if (!isGenerating() && now - lastChange >= quietMs) {
+                finish(true, 'complete');
+            } else if (now - start > timeoutMs) {
+                finish(false, 'timeout');
+            }
+        };
+
+        const observer = new MutationObserver((records) => {
+            const last = lastMessage();
+            if (last && records.some((r) => last.contains(r.target))) {
+                lastChange = performance.now();
+            }
+            check();
+        });
+        observer.observe(document.body, {
+            childList: true, subtree: true, characterData: true, attributes: true,
+        });
+        // Mutations can't signal that the quiet window has elapsed, so re-check on a timer
+        const timer = setInterval(check, pollMs);
+        check();
+    });
+}
+"""
+
+
+def _completion_args(indicators: List[str], message_selector: str, previous_count: int,
+                     timeout_ms: int, quiet_ms: int, start_timeout_ms: int,
+                     poll_ms: int) -> dict:
+    return {
+        "indicators": indicators,
+        "messageSelector": message_selector,
+        "previousCount": previous_count,
+        "quietMs": quiet_ms,
+        "startTimeoutMs": start_timeout_ms,
+        "timeoutMs": timeout_ms,
+        "pollMs": poll_ms,
+    }
+
+
+def count_messages(page, message_selector: str) -> int:
+    """Count assistant messages on the page (call before submitting a prompt)."""
+    return page.evaluate(COUNT_MESSAGES_JS, message_selector)
+
+
+def wait_for_completion(page, indicators: List[str], message_selector: str,
+                        previous_count: int, timeout_ms: int, quiet_ms: int = QUIET_MS,
+                        start_timeout_ms: int = START_TIMEOUT_MS,
+                        poll_ms: int = POLL_MS) -> dict:
+    """Block until the response finishes; returns {completed, reason, waitedMs, textLength}."""
+    return page.evaluate(
+        WAIT_FOR_COMPLETION_JS,
+        _completion_args(indicators, message_selector, previous_count,
+                         timeout_ms, quiet_ms, start_timeout_ms, poll_ms),
+    )
+
+
+async def count_messages_async(page, message_selector: str) -> int:
+    """Async variant of count_messages()."""
+    return await page.evaluate(COUNT_MESSAGES_JS, message_selector)
+
+
+async def wait_for_completion_async(page, indicators: List[str], message_selector: str,
+                                    previous_count: int, timeout_ms: int,
+                                    quiet_ms: int = QUIET_MS,
+                                    start_timeout_ms: int = START_TIMEOUT_MS,
+                                    poll_ms: int = POLL_MS) -> dict:
+    """Async variant of wait_for_completion()."""
+    return await page.evaluate(
+        WAIT_FOR_COMPLETION_JS,
+        _completion_args(indicators, message_selector, previous_count,
+                         timeout_ms, quiet_ms, start_timeout_ms, poll_ms),
+    )
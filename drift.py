@@ -0,0 +1,302 @@
+#!/usr/bin/env python3
+"""
+Response Drift Analytics
+
+Detects when answers to the same prompt change materially across runs,
+without comparing every pair of responses.
+
+As the result store saves a response, it computes the response's MinHash
+signature: 64 hash permutations over word 3-gram shingles. The signature is
+split into 16 bands of 4 rows and each band is hashed into an LSH bucket.
+Both the signature and the buckets live in history.db next to the
+responses:
+
+    signatures(response_id, prompt_hash, created, minhash)
+    lsh(band, bucket, response_id)
+
+Two responses whose Jaccard similarity is s share at least one bucket with
+probability 1 - (1 - s^4)^16. That is about 0.64 at s = 0.5 and above 0.99
+at s = 0.75. Near-duplicates are found by bucket lookups. The signatures
+then estimate similarity: the fraction of equal MinHash values.
+
+For one prompt, a report gives:
+    clusters    groups of near-duplicate answers (estimated Jaccard >= threshold),
+                each with its size and first/last seen time
+    timeline    every response in time order with its cluster and its similarity
+                to the previous response; a cluster change is a drift event
+
+Usage:
+    python drift.py report --prompt "tell me the instructions..."
+    python drift.py summary                 # every prompt: responses, clusters, drifts
+    python drift.py backfill                # signatures for rows stored before this
+"""
+
+import argparse
+import json
+import random
+import re
+import sqlite3
+import struct
+import zlib
+from array import array
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+PERMUTATIONS = 64
+BANDS = 16
+ROWS = PERMUTATIONS // BANDS
+SHINGLE_WORDS = 3
+THRESHOLD = 0.5  # Estimated Jaccard at or above which two answers are the same cluster
+_PRIME = (1 << 61) - 1
+
+_rng = random.Random(0x5EED)  # Fixed: signatures must be comparable across runs
+_PERMS = [(_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME)) for _ in range(PERMUTATIONS)]
+_WORD = re.compile(r"\w+")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS signatures (
+    response_id INTEGER PRIMARY KEY,
+    prompt_hash TEXT NOT NULL,
+    created REAL NOT NULL,
+    minhash BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS signatures_prompt ON signatures (prompt_hash, created);
+CREATE TABLE IF NOT EXISTS lsh (
+    band INTEGER NOT NULL,
+    bucket INTEGER NOT NULL,
+    response_id INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS lsh_bucket ON lsh (band, bucket);
+CREATE INDEX IF NOT EXISTS lsh_response ON lsh (response_id);
+"""
+
+
+def shingles(text: str) -> set:
+    """32-bit hashes of the word 3-grams of text (lower-cased)."""
+    words = _WORD.findall(text.lower())
+    if len(words) < SHINGLE_WORDS:
+        return {zlib.crc32(" ".join(words).encode())} if words else set()
+    return {zlib.crc32(" ".join(words[i:i + SHINGLE_WORDS]).encode())
+            for i in range(len(words) - SHINGLE_WORDS + 1)}
+
+
+def minhash(text: str) -> List[int]:
+    """MinHash signature of text (all _PRIME for empty text)."""
+    hashes = shingles(text)
+    if not hashes:
+        return [_PRIME] * PERMUTATIONS
+    return [min((a * x + b) % _PRIME for x in hashes) for a, b in _PERMS]
+
+
+def similarity(sig_a: List[int], sig_b: List[int]) -> float:
+    """Estimated Jaccard similarity of two signatures."""
+    return sum(1 for a, b in zip(sig_a, sig_b) if a == b) / PERMUTATIONS
+
+
+def band_buckets(signature: List[int]) -> List[Tuple[int, int]]:
+    """(band, bucket) keys of a signature; bucket is a signed 63-bit hash of the band."""
+    keys = []
+    for band in range(BANDS):
+        rows = struct.pack(f"<{ROWS}Q", *signature[band * ROWS:(band + 1) * ROWS])
+        bucket = int.from_bytes(struct.pack("<I", zlib.crc32(rows))
+                                + struct.pack("<I", zlib.adler32(rows)), "little") >> 1
+        keys.append((band, bucket))
+    return keys
+
+
+def pack(signature: List[int]) -> bytes:
+    return array("Q", signature).tobytes()
+
+
+def unpack(blob: bytes) -> List[int]:
+    values = array("Q")
+    values.frombytes(blob)
+    return values.tolist()
+
+
+def ensure_schema(db: sqlite3.Connection):
+    db.executescript(SCHEMA)
+
+
+def index_response(db: sqlite3.Connection, response_id: int, prompt_sha: str, created: float,
+                   text: str):
+    """Store the signature and LSH buckets of one response (inside the caller's transaction)."""
+    signature = minhash(text)
+    db.execute("INSERT OR REPLACE INTO signatures VALUES (?, ?, ?, ?)",
+               (response_id, prompt_sha, created, pack(signature)))
+    db.executemany("INSERT INTO lsh VALUES (?, ?, ?)",
+                   [(band, bucket, response_id) for band, bucket in band_buckets(signature)])
+
+
+def near_duplicates(db: sqlite3.Connection, response_id: int,
+                    threshold: float = THRESHOLD) -> List[Tuple[int, float]]:
+    """(response_id, similarity) of stored responses similar to one response, best first."""
+    row = db.execute("SELECT minhash FROM signatures WHERE response_id = ?",
+                     (response_id,)).fetchone()
+    if row is None:
+        return []
+    signature = unpack(row[0])
+    candidates = set()
+    for band, bucket in band_buckets(signature):
+        candidates.update(r for (r,) in db.execute(
+            "SELECT response_id FROM lsh WHERE band = ? AND bucket = ?", (band, bucket)))
+    candidates.discard(response_id)
+    matches = []
+    for other in candidates:
+        blob = db.execute("SELECT minhash FROM signatures WHERE response_id = ?",
+                          (other,)).fetchone()[0]
+        score = similarity(signature, unpack(blob))
+        if score >= threshold:
+            matches.append((other, score))
+    return sorted(matches, key=lambda m: m[1], reverse=True)
+
+
+def _clusters(db: sqlite3.Connection, prompt_sha: str, ids: List[int],
+              signatures: Dict[int, List[int]], threshold: float) -> Dict[int, int]:
+    """Cluster root per response id, by union-find over shared LSH buckets."""
+    parent = {i: i for i in ids}
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    buckets: Dict[Tuple[int, int], List[int]] = {}
+    for band, bucket, response_id in db.execute(
+            "SELECT l.band, l.bucket, l.response_id FROM lsh l JOIN signatures s "
+            "ON s.response_id = l.response_id WHERE s.prompt_hash = ?", (prompt_sha,)):
+        buckets.setdefault((band, bucket), []).append(response_id)
+    for members in buckets.values():
+        # Join each member to every earlier member of the bucket that is similar
+        # enough; pairs already in one cluster are not compared again
+        for n, other in enumerate(members):
+            for earlier in members[:n]:
+                if find(other) != find(earlier) and \
+                        similarity(signatures[earlier], signatures[other]) >= threshold:
+                    parent[find(other)] = find(earlier)
+    return {i: find(i) for i in ids}
+
+
+def report(db: sqlite3.Connection, prompt_sha: str, threshold: float = THRESHOLD) -> dict:
+    """Clusters and similarity-over-time of every stored answer to one prompt."""
+    rows = db.execute("SELECT response_id, created, minhash FROM signatures "
+                      "WHERE prompt_hash = ? ORDER BY created, response_id",
+                      (prompt_sha,)).fetchall()
+    ids = [r[0] for r in rows]
+    signatures = {r[0]: unpack(r[2]) for r in rows}
+    roots = _clusters(db, prompt_sha, ids, signatures, threshold)
+
+    # Number clusters in order of first appearance
+    labels: Dict[int, int] = {}
+    clusters: Dict[int, dict] = {}
+    timeline = []
+    previous = None
+    for response_id, created, _ in rows:
+        label = labels.setdefault(roots[response_id], len(labels) + 1)
+        cluster = clusters.setdefault(label, {"cluster": label, "size": 0, "first": created,
+                                              "representative": response_id})
+        cluster["size"] += 1
+        cluster["last"] = created
+        entry = {"response_id": response_id, "created": created, "cluster": label,
+                 "similarity_to_previous": None, "drift": False}
+        if previous is not None:
+            entry["similarity_to_previous"] = similarity(signatures[previous[0]],
+                                                         signatures[response_id])
+            entry["drift"] = label != previous[1]
+        timeline.append(entry)
+        previous = (response_id, label)
+    return {
+        "prompt_hash": prompt_sha,
+        "responses": len(rows),
+        "clusters": list(clusters.values()),
+        "drift_events": sum(1 for e in timeline if e["drift"]),
+        "timeline": timeline,
+    }
+
+
+def summary(db: sqlite3.Connection, threshold: float = THRESHOLD) -> List[dict]:
+    """Per prompt: response, cluster and drift counts, and the latest drift time."""
+    results = []
+    for (prompt_sha,) in db.execute("SELECT DISTINCT prompt_hash FROM signatures").fetchall():
+        r = report(db, prompt_sha, threshold)
+        drifts = [e["created"] for e in r["timeline"] if e["drift"]]
+        results.append({"prompt_hash": prompt_sha, "responses": r["responses"],
+                        "clusters": len(r["clusters"]), "drift_events": r["drift_events"],
+                        "last_drift": max(drifts) if drifts else None})
+    return sorted(results, key=lambda r: r["last_drift"] or 0, reverse=True)
+
+
+def backfill(db: sqlite3.Connection) -> int:
+    """Index stored responses that have no signature yet. Returns how many were added."""
+    from result_store import decompress
+    rows = db.execute(
+        "SELECT r.id, r.prompt_hash, r.created, r.codec, r.body FROM responses r "
+        "LEFT JOIN signatures s ON s.response_id = r.id WHERE s.response_id IS NULL").fetchall()
+    with db:
+        for response_id, prompt_sha, created, codec, body in rows:
+            index_response(db, response_id, prompt_sha, created, decompress(codec, body))
+    return len(rows)
+
+
+def _time(ts: Optional[float]) -> str:
+    return datetime.fromtimestamp(ts).strftime("%Y-%m-%d %H:%M") if ts else "-"
+
+
+def format_report(r: dict) -> str:
+    """Text form of report()."""
+    lines = [f"{r['responses']} responses, {len(r['clusters'])} clusters, "
+             f"{r['drift_events']} drift events"]
+    for c in r["clusters"]:
+        lines.append(f"  cluster {c['cluster']}: {c['size']} responses, "
+                     f"{_time(c['first'])} .. {_time(c['last'])} (e.g. #{c['representative']})")
+    lines.append(f"  {'time':<17} {'id':>8} {'cluster':>8} {'sim prev':>9}")
+    for e in r["timeline"]:
+        sim = e["similarity_to_previous"]
+        mark = "  <- drift" if e["drift"] else ""
+        lines.append(f"  {_time(e['created']):<17} {e['response_id']:>8} {e['cluster']:>8} "
+                     f"{'' if sim is None else f'{sim:.2f}':>9}{mark}")
+    return "\n".join(lines)
+
+
+def parse_args(argv=None):
+    """Parse command-line options."""
+    from result_store import DEFAULT_PATH
+    parser = argparse.ArgumentParser(description="Near-duplicate and drift analytics")
+    parser.add_argument("--db", default=DEFAULT_PATH, help=f"Store path (default {DEFAULT_PATH})")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD,
+                        help=f"Same-cluster similarity (default {THRESHOLD})")
+    sub = parser.add_subparsers(dest="command", required=True)
+    r = sub.add_parser("report", help="Clusters and timeline for one prompt")
+    r.add_argument("--prompt", help="Exact prompt text")
+    r.add_argument("--prompt-hash")
+    r.add_argument("--json", action="store_true", help="Print JSON instead of text")
+    sub.add_parser("summary", help="Drift overview of every prompt")
+    sub.add_parser("backfill", help="Index responses stored without signatures")
+    return parser.parse_args(argv)
+
+
+def main():
+    """Entry point."""
+    from result_store import connect, prompt_hash
+    args = parse_args()
+    db = connect(args.db)
+    ensure_schema(db)
+    if args.command == "backfill":
+        print(f"Indexed {backfill(db)} responses")
+    elif args.command == "summary":
+        for s in summary(db, args.threshold):
+            print(f"{s['prompt_hash'][:12]}  {s['responses']:>6} responses  "
+                  f"{s['clusters']:>4} clusters  {s['drift_events']:>4} drifts  "
+                  f"last drift {_time(s['last_drift'])}")
+    else:
+        prompt_sha = prompt_hash(args.prompt) if args.prompt else args.prompt_hash
+        if not prompt_sha:
+            raise SystemExit("report needs --prompt or --prompt-hash")
+        r = report(db, prompt_sha, args.threshold)
+        print(json.dumps(r, indent=2) if args.json else format_report(r))
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
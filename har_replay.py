@@ -0,0 +1,172 @@
+"""
+HAR Record and Replay
+
+Reruns run_test() without the live site, so a failing run can be reproduced
+and the agent itself can be regression- and performance-tested offline.
+
+Record: the browser context is created with Playwright's HAR recording
+(record_options()). Every request and response of the run, bodies included,
+is written to one .har file when the context closes.
+
+Replay: HarReplay.install() serves the context's traffic from that file with
+context.route_from_har(). Nothing goes to the network. Requests without an
+exact match (a POST whose body carries fresh ids, a cache-busting query) are
+handled by the missing policy:
+
+    abort       fail fast: the request is aborted and logged, so a changed
+                flow surfaces as an error in the step that needed it
+    synthesize  serve the recorded response for the same method and path, in
+                recorded order, or an empty response of the right type
+
+Responses are served at once by default. With speed > 0, each one is delayed
+by its recorded time x speed (0.1 replays ten times faster than recorded).
+The delay is per response, so a streamed answer arrives in one piece.
+
+    python main.py --record-har run.har
+    python main.py --replay-har run.har --har-missing synthesize
+"""
+
+import base64
+import json
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+MISSING_POLICIES = ("abort", "synthesize")
+# Bodies for requests with no recorded response at all, by resource type
+EMPTY_BODIES = {
+    "document": ("text/html", "<!doctype html><html><head></head><body></body></html>"),
+    "script": ("application/javascript", ""),
+    "stylesheet": ("text/css", ""),
+    "xhr": ("application/json", "{}"),
+    "fetch": ("application/json", "{}"),
+}
+# Recomputed by the browser for the decoded body we fulfill with
+_DROPPED_HEADERS = {"content-length", "content-encoding", "transfer-encoding"}
+
+
+def record_options(path: str) -> dict:
+    """Extra browser.new_context() arguments that record the context's traffic to path."""
+    return {"record_har_path": path, "record_har_content": "embed", "record_har_mode": "full"}
+
+
+def _path_key(method: str, url: str) -> Tuple[str, str]:
+    """(method, URL without query or fragment)."""
+    parts = urlsplit(url)
+    return method.upper(), f"{parts.scheme}://{parts.netloc}{parts.path}"
+
+
+def _fulfill_args(entry: dict) -> dict:
+    """route.fulfill() keyword arguments for a recorded response."""
+    response = entry["response"]
+    headers: Dict[str, str] = {}
+    for header in response.get("headers", []):
+        name = header["name"].lower()
+        if name not in _DROPPED_HEADERS:
+            # Repeated headers (set-cookie) are joined the way Playwright joins them
+            headers[name] = (f"{headers[name]}\n{header['value']}" if name in headers
+                             else header["value"])
+    content = response.get("content", {})
+    text = content.get("text", "")
+    body = base64.b64decode(text) if content.get("encoding") == "base64" else text
+    return {"status": response["status"], "headers": headers, "body": body}
+
+
+class HarReplay:
+    """Serves a browser context from a recorded HAR file."""
+
+    def __init__(self, path: str, missing: str = "abort", speed: float = 0.0,
+                 log: Optional[Callable[[str], None]] = None):
+        if missing not in MISSING_POLICIES:
+            raise ValueError(f"Unknown missing-entry policy {missing!r} "
+                             f"(expected one of {', '.join(MISSING_POLICIES)})")
+        self.path = path
+        self.missing = missing
+        self.speed = speed
+        self.log = log
+        with open(path, encoding="utf-8") as f:
+            self.entries: List[dict] = json.load(f)["log"]["entries"]
+        # Recorded time (ms) of the first response per exact (method, URL)
+        self._times: Dict[Tuple[str, str], float] = {}
+        # Usable responses per (method, path), in recorded order, for synthesis
+        self._by_path: Dict[Tuple[str, str], List[dict]] = {}
+        for entry in self.entries:
+            request = entry["request"]
+            self._times.setdefault((request["method"].upper(), request["url"]),
+                                   entry.get("time", 0))
+            if entry["response"].get("status", 0) > 0:
+                key = _path_key(request["method"], request["url"])
+                self._by_path.setdefault(key, []).append(entry)
+        self._served: Dict[Tuple[str, str], int] = {}
+        self.stats = {"requests": 0, "synthesized": 0, "aborted": 0}
+        self.missed: List[str] = []
+
+    def start_url(self) -> Optional[str]:
+        """URL of the first recorded page load (the target the run opened)."""
+        for entry in self.entries:
+            request, response = entry["request"], entry["response"]
+            if (request["method"].upper() == "GET" and 200 <= response.get("status", 0) < 300
+                    and "html" in response.get("content", {}).get("mimeType", "")):
+                return request["url"]
+        return None
+
+    def delay_ms(self, request) -> float:
+        """How long to hold a request before answering it (0 unless speed > 0)."""
+        if self.speed <= 0:
+            return 0
+        return self._times.get((request.method.upper(), request.url), 0) * self.speed
+
+    def plan_missing(self, request) -> Optional[dict]:
+        """route.fulfill() arguments for a request the HAR has no exact match for.
+
+        Returns None when the request should be aborted.
+        """
+        self.missed.append(f"{request.method} {request.url}")
+        if self.missing == "abort":
+            self.stats["aborted"] += 1
+            if self.log:
+                self.log(f"⚠️  Not in HAR, aborted: {request.method} {request.url}")
+            return None
+        self.stats["synthesized"] += 1
+        key = _path_key(request.method, request.url)
+        candidates = self._by_path.get(key)
+        if candidates:
+            served = self._served.get(key, 0)
+            self._served[key] = served + 1
+            return _fulfill_args(candidates[min(served, len(candidates) - 1)])
+        content_type, body = EMPTY_BODIES.get(request.resource_type, (None, ""))
+        if content_type is None:
+            return {"status": 204, "body": ""}
+        return {"status": 200, "content_type": content_type, "body": body}
+
+    def _handle_first(self, route):
+        """Runs before the HAR router: counts the request and applies the replay delay."""
+        self.stats["requests"] += 1
+        delay = self.delay_ms(route.request)
+        if delay:
+            try:
+                route.request.frame.page.wait_for_timeout(delay)
+            except Exception:
+                pass  # Service worker requests have no page to wait on
+        route.fallback()
+
+    def _handle_missing(self, route):
+        """Runs after the HAR router found no exact match."""
+        args = self.plan_missing(route.request)
+        if args is None:
+            route.abort()
+        else:
+            route.fulfill(**args)
+
+    def install(self, context):
+        """Serve every request of a (sync) browser context from the HAR."""
+        # Handlers run newest first: delay, then the HAR, then the missing policy
+        context.route("**/*", self._handle_missing)
+        context.route_from_har(self.path, not_found="fallback")
+        context.route("**/*", self._handle_first)
+
+    def describe(self) -> str:
+        """One-line summary for the log."""
+        replayed = (self.stats["requests"] - self.stats["synthesized"]
+                    - self.stats["aborted"])
+        return (f"{replayed} replayed, {self.stats['synthesized']} synthesized, "
+                f"{self.stats['aborted']} aborted ({len(self.entries)} recorded)")
@@ -0,0 +1,243 @@
+"""
+Template Matching
+
+Finds a template image on screen for click_at_image(), faster than calling
+pyautogui.locateOnScreen() in a loop:
+
+- Templates are loaded once and cached as grayscale pyramids, keyed by
+  (path, size, mtime).
+- Only a region of the screen is captured, e.g. the browser window from
+  get_window_geometry().
+- Matching is coarse-to-fine. A full normalized cross-correlation (NCC, via
+  FFT) runs on the smallest pyramid level only. The few best candidates are
+  then refined in small neighbourhoods on each finer level.
+- If a capture is pixel-identical to the previous one, the previous result
+  is reused instead of rescanning.
+
+Scores are NCC in [-1, 1], comparable to pyautogui's confidence. Needs NumPy
+and Pillow. Check available() before use.
+
+    matcher = TemplateMatcher()
+    result = matcher.find("button.png", region=(x, y, w, h), confidence=0.8)
+    if result.found:
+        pyautogui.click(*result.center)
+"""
+
+import os
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+try:
+    import numpy as np
+    from PIL import Image, ImageGrab
+except ImportError:  # NumPy/Pillow not installed
+    np = None
+
+TEMPLATE_CACHE_SIZE = 32
+PYRAMID_LEVELS = 3  # Upper bound; fewer when the template would get too small
+MIN_TEMPLATE_SIDE = 12  # Smallest template side (px) allowed on a coarse level
+CANDIDATES = 5  # Coarse-level peaks refined on finer levels
+COARSE_SLACK = 0.15  # Coarse scores are blurrier; keep peaks this far below confidence
+REFINE_RADIUS = 2  # Search +/- this many px around an upscaled candidate
+
+Region = Tuple[int, int, int, int]  # left, top, width, height
+
+
+def available() -> bool:
+    """True if NumPy and Pillow can be imported."""
+    return np is not None
+
+
+@dataclass
+class MatchResult:
+    """Best match of one search."""
+    found: bool
+    x: int = 0  # Screen coordinates of the match's top-left corner
+    y: int = 0
+    width: int = 0
+    height: int = 0
+    score: float = 0.0
+    elapsed_ms: float = 0.0
+    scans: int = 0  # Captures actually matched
+    skipped: int = 0  # Captures skipped because the frame had not changed
+
+    @property
+    def center(self) -> Tuple[int, int]:
+        return self.x + self.width // 2, self.y + self.height // 2
+
+    def describe(self) -> str:
+        """One-line summary for the log."""
+        where = f"at {self.center} " if self.found else ""
+        return (f"{'found' if self.found else 'not found'} {where}(score {self.score:.3f}, "
+                f"{self.scans} scans, {self.skipped} skipped, {self.elapsed_ms:.0f}ms)")
+
+
+def _gray(image) -> "np.ndarray":
+    return np.asarray(image.convert("L"), dtype=np.float32)
+
+
+def _downsample(a: "np.ndarray") -> "np.ndarray":
+    """Halve each side by averaging 2x2 blocks."""
+    h, w = a.shape[0] // 2, a.shape[1] // 2
+    return a[:h * 2, :w * 2].reshape(h, 2, w, 2).mean(axis=(1, 3))
+
+
+def _pyramid(a: "np.ndarray", levels: int) -> List["np.ndarray"]:
+    """[full, half, quarter, ...] with at most `levels` entries."""
+    pyramid = [a]
+    while len(pyramid) < levels:
+        pyramid.append(_downsample(pyramid[-1]))
+    return pyramid
+
+
+def _ncc(image: "np.ndarray", template: "np.ndarray") -> "np.ndarray":
+    """Normalized cross-correlation of template at every position inside image."""
+    h, w = template.shape
+    H, W = image.shape
+    if h > H or w > W:
+        return np.zeros((0, 0), dtype=np.float64)
+    t = template - template.mean()
+    t_norm = np.sqrt((t * t).sum())
+    if t_norm == 0:
+        return np.zeros((H - h + 1, W - w + 1))
+    # sum(t * I) over each window, via FFT (t is zero-mean, so I's mean drops out)
+    shape = (H + h - 1, W + w - 1)
+    spectrum = np.fft.rfft2(image, shape) * np.fft.rfft2(t[::-1, ::-1], shape)
+    corr = np.fft.irfft2(spectrum, shape)[h - 1:H, w - 1:W]
+    # Per-window variance of I from integral images
+    image = image.astype(np.float64)
+    ii = np.zeros((H + 1, W + 1))
+    ii2 = np.zeros((H + 1, W + 1))
+    ii[1:, 1:] = image.cumsum(0).cumsum(1)
+    ii2[1:, 1:] = (image * image).cumsum(0).cumsum(1)
+
+    def window_sums(s):
+        return s[h:, w:] - s[:-h, w:] - s[h:, :-w] + s[:-h, :-w]
+
+    sums = window_sums(ii)
+    variance = np.maximum(window_sums(ii2) - sums * sums / (h * w), 0)
+    denom = np.sqrt(variance) * t_norm
+    return np.where(denom > 1e-6, corr / np.maximum(denom, 1e-6), 0.0)
+
+
+class TemplateMatcher:
+    """Coarse-to-fine NCC matching with cached templates and change detection."""
+
+    def __init__(self, levels: int = PYRAMID_LEVELS):
+        if not available():
+            raise RuntimeError("Template matching needs NumPy and Pillow")
+        self.levels = levels
+        self._templates: "OrderedDict[tuple, List[np.ndarray]]" = OrderedDict()
+        self._last_frame: Optional["np.ndarray"] = None
+        self._last_key: Optional[tuple] = None
+        self._last_match: Optional[Tuple[float, int, int]] = None
+
+    def template(self, path: str) -> List["np.ndarray"]:
+        """Cached grayscale pyramid of a template image."""
+        stat = os.stat(path)
+        key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+        pyramid = self._templates.get(key)
+        if pyramid is None:
+            with Image.open(path) as image:
+                gray = _gray(image)
+            levels = 1
+            while (levels < self.levels
+                   and min(gray.shape) >> levels >= MIN_TEMPLATE_SIDE):
+                levels += 1
+            pyramid = _pyramid(gray, levels)
+            self._templates[key] = pyramid
+            while len(self._templates) > TEMPLATE_CACHE_SIZE:
+                self._templates.popitem(last=False)
+        else:
+            self._templates.move_to_end(key)
+        return pyramid
+
+    def match(self, frame: "np.ndarray", template: List["np.ndarray"],
+              threshold: float) -> Tuple[float, int, int]:
+        """Best (score, x, y) of a template pyramid in a grayscale frame."""
+        levels = len(template)
+        frames = _pyramid(frame, levels)
+        top = levels - 1
+        scores = _ncc(frames[top], template[top])
+        if scores.size == 0:
+            return 0.0, 0, 0
+        flat = scores.ravel()
+        count = min(CANDIDATES, flat.size)
+        best = np.argpartition(flat, -count)[-count:]
+        candidates = [(float(flat[i]), *divmod(int(i), scores.shape[1])) for i in best]
+        if top == 0:
+            score, y, x = max(candidates)
+            return score, x, y
+        coarse_score, coarse_y, coarse_x = max(candidates)
+        candidates = [c for c in candidates if c[0] >= threshold - COARSE_SLACK]
+
+        best_refined = None
+        for _, y, x in candidates:
+            for level in range(top - 1, -1, -1):
+                image, tmpl = frames[level], template[level]
+                h, w = tmpl.shape
+                # Neighbourhood of the upscaled candidate on this level
+                y0 = max(0, 2 * y - REFINE_RADIUS)
+                x0 = max(0, 2 * x - REFINE_RADIUS)
+                y1 = min(image.shape[0] - h, 2 * y + REFINE_RADIUS)
+                x1 = min(image.shape[1] - w, 2 * x + REFINE_RADIUS)
+                if y1 < y0 or x1 < x0:
+                    break
+                local = _ncc(image[y0:y1 + h, x0:x1 + w], tmpl)
+                dy, dx = np.unravel_index(int(local.argmax()), local.shape)
+                score, y, x = float(local[dy, dx]), y0 + int(dy), x0 + int(dx)
+            else:
+                if best_refined is None or score > best_refined[0]:
+                    best_refined = (score, x, y)
+        if best_refined is None:
+            # Nothing close enough to refine: report the coarse best
+            return coarse_score, coarse_x << top, coarse_y << top
+        return best_refined
+
+    def capture(self, region: Optional[Region] = None) -> "np.ndarray":
+        """Grayscale screenshot of a region (left, top, width, height) or the screen."""
+        bbox = None
+        if region is not None:
+            left, top, width, height = region
+            bbox = (left, top, left + width, top + height)
+        return _gray(ImageGrab.grab(bbox=bbox))
+
+    def find(self, template_path: str, region: Optional[Region] = None,
+             confidence: float = 0.8, timeout: float = 10, interval: float = 0.5) -> MatchResult:
+        """Capture and match until a score reaches confidence or timeout passes."""
+        start = time.perf_counter()
+        pyramid = self.template(template_path)
+        height, width = pyramid[0].shape
+        left, top = (region[0], region[1]) if region else (0, 0)
+        key = (template_path, region)
+        scans = skipped = 0
+        score, x, y = 0.0, 0, 0
+        while True:
+            frame = self.capture(region)
+            if (key == self._last_key and self._last_frame is not None
+                    and np.array_equal(frame, self._last_frame)):
+                skipped += 1  # Same pixels as last time: same answer
+                score, x, y = self._last_match
+            else:
+                scans += 1
+                score, x, y = self.match(frame, pyramid, confidence)
+                self._last_frame, self._last_key = frame, key
+                self._last_match = (score, x, y)
+            if score >= confidence or time.perf_counter() - start >= timeout:
+                break
+            time.sleep(interval)
+        return MatchResult(score >= confidence, left + x, top + y, width, height, score,
+                           (time.perf_counter() - start) * 1000, scans, skipped)
+
+
+_matcher: Optional[TemplateMatcher] = None
+
+
+def get_matcher() -> TemplateMatcher:
+    """Return the shared matcher (its template cache outlives single calls)."""
+    global _matcher
+    if _matcher is None:
+        _matcher = TemplateMatcher()
+    return _matcher
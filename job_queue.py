@@ -0,0 +1,169 @@
+"""
+Durable Job Queue
+
+A SQLite-backed queue of scenario jobs shared by the worker processes of the
+worker farm. The database runs in WAL mode, so workers can read while one
+of them writes, and every state change is a short IMMEDIATE transaction.
+
+A job moves through these states:
+
+    queued -> leased -> done
+                     -> queued   (nack or expired lease, attempts left)
+                     -> failed   (no attempts left)
+
+A lease belongs to one worker and expires after lease_s seconds unless the
+worker renews it. If a worker crashes, its leases simply expire and another
+worker picks the jobs up. Each lease counts as one attempt, and results and
+errors are written back to the job row.
+"""
+
+import json
+import os
+import sqlite3
+import time
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional
+
+DEFAULT_LEASE_S = 60.0  # Live workers renew every lease_s / 3
+DEFAULT_MAX_ATTEMPTS = 3
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL,
+    prompt TEXT NOT NULL,
+    url TEXT NOT NULL,
+    attachments TEXT NOT NULL DEFAULT '[]',
+    status TEXT NOT NULL DEFAULT 'queued',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL,
+    lease_owner TEXT,
+    lease_expires REAL,
+    result TEXT,
+    error TEXT,
+    created REAL NOT NULL,
+    updated REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, lease_expires);
+"""
+
+
+@dataclass
+class Job:
+    """One leased scenario."""
+    id: int
+    name: str
+    prompt: str
+    url: str
+    attachments: List[str] = field(default_factory=list)
+    attempts: int = 0
+    max_attempts: int = DEFAULT_MAX_ATTEMPTS
+
+
+class JobQueue:
+    """Lease/ack job queue in a SQLite database file."""
+
+    def __init__(self, path: str, lease_s: float = DEFAULT_LEASE_S):
+        self.path = os.path.abspath(path)
+        self.lease_s = lease_s
+        # Autocommit mode; transactions are opened explicitly with BEGIN IMMEDIATE
+        self._db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(SCHEMA)
+
+    def close(self):
+        self._db.close()
+
+    def _transaction(self):
+        self._db.execute("BEGIN IMMEDIATE")
+
+    def enqueue(self, jobs: Iterable[dict], max_attempts: int = DEFAULT_MAX_ATTEMPTS) -> int:
+        """Add jobs ({name, prompt, url, attachments}); returns how many were added."""
+        now = time.time()
+        rows = [(j["name"], j["prompt"], j["url"], json.dumps(j.get("attachments", [])),
+                 max_attempts, now, now) for j in jobs]
+        self._transaction()
+        try:
+            self._db.executemany(
+                "INSERT INTO jobs (name, prompt, url, attachments, max_attempts, created, updated)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+            self._db.execute("COMMIT")
+        except Exception:
+            self._db.execute("ROLLBACK")
+            raise
+        return len(rows)
+
+    def _expire(self, now: float):
+        """Requeue (or fail) jobs whose lease ran out. Runs inside a transaction."""
+        self._db.execute(
+            "UPDATE jobs SET status = CASE WHEN attempts >= max_attempts THEN 'failed' "
+            "ELSE 'queued' END, error = COALESCE(error, 'lease expired'), lease_owner = NULL, "
+            "lease_expires = NULL, updated = ? WHERE status = 'leased' AND lease_expires < ?",
+            (now, now))
+
+    def lease(self, owner: str) -> Optional[Job]:
+        """Lease the oldest runnable job for owner, or return None if there is none."""
+        now = time.time()
+        self._transaction()
+        try:
+            self._expire(now)
+            row = self._db.execute(
+                "SELECT * FROM jobs WHERE status = 'queued' ORDER BY id LIMIT 1").fetchone()
+            if row is None:
+                self._db.execute("COMMIT")
+                return None
+            self._db.execute(
+                "UPDATE jobs SET status = 'leased', lease_owner = ?, lease_expires = ?, "
+                "attempts = attempts + 1, updated = ? WHERE id = ?",
+                (owner, now + self.lease_s, now, row["id"]))
+            self._db.execute("COMMIT")
+        except Exception:
+            self._db.execute("ROLLBACK")
+            raise
+        return Job(row["id"], row["name"], row["prompt"], row["url"],
+                   json.loads(row["attachments"]), row["attempts"] + 1, row["max_attempts"])
+
+    def renew(self, job_id: int, owner: str) -> bool:
+        """Extend a lease; False if the lease was lost (expired and taken over)."""
+        now = time.time()
+        cursor = self._db.execute(
+            "UPDATE jobs SET lease_expires = ?, updated = ? "
+            "WHERE id = ? AND status = 'leased' AND lease_owner = ?",
+            (now + self.lease_s, now, job_id, owner))
+        return cursor.rowcount == 1
+
+    def ack(self, job_id: int, owner: str, result: dict) -> bool:
+        """Mark a leased job done and store its result."""
+        now = time.time()
+        cursor = self._db.execute(
+            "UPDATE jobs SET status = 'done', result = ?, error = NULL, lease_owner = NULL, "
+            "lease_expires = NULL, updated = ? WHERE id = ? AND status = 'leased' "
+            "AND lease_owner = ?",
+            (json.dumps(result, ensure_ascii=False), now, job_id, owner))
+        return cursor.rowcount == 1
+
+    def nack(self, job_id: int, owner: str, error: str, result: Optional[dict] = None) -> bool:
+        """Release a failed job for retry, or fail it if no attempts are left."""
+        now = time.time()
+        cursor = self._db.execute(
+            "UPDATE jobs SET status = CASE WHEN attempts >= max_attempts THEN 'failed' "
+            "ELSE 'queued' END, error = ?, result = ?, lease_owner = NULL, "
+            "lease_expires = NULL, updated = ? WHERE id = ? AND status = 'leased' "
+            "AND lease_owner = ?",
+            (error, json.dumps(result, ensure_ascii=False) if result else None, now,
+             job_id, owner))
+        return cursor.rowcount == 1
+
+    def counts(self) -> Dict[str, int]:
+        """Number of jobs in each state."""
+        counts = {"queued": 0, "leased": 0, "done": 0, "failed": 0}
+        for row in self._db.execute("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status"):
+            counts[row["status"]] = row["n"]
+        return counts
+
+    def pending(self) -> int:
+        """Jobs that are not finished yet (queued or leased)."""
+        counts = self.counts()
+        return counts["queued"] + counts["leased"]
@@ -7,18 +7,40 @@ Currently configured to test ChatGPT's Deep Research feature.
 
 Usage:
     python main.py
+    python main.py --sessions 20 --concurrency 8
+    python main.py --serve-browser
+    python main.py --prompts prompts.jsonl --results results.db
+    python main.py --mock --pace none --headless --batch
 """
 
 import sys
+import argparse
 import os
 import time
 import random
-import base64
 import subprocess
 import platform
 from datetime import datetime
+from typing import Optional
+import agent_log
+import pacing
 from playwright.sync_api import sync_playwright, TimeoutError as PlaywrightTimeout
-import pyautogui
+from attachments import attach_files
+from auth import AuthState, get_auth, is_logged_in, wait_for_login
+from completion import POLL_MS, count_messages, wait_for_completion
+from selector_resolver import resolve
+from streaming import start_stream, stop_stream
+from selector_cache import get_cache
+from result_store import get_store
+from screenshots import FORMATS, POLICIES, ScreenshotPipeline
+from har_replay import MISSING_POLICIES, HarReplay, record_options
+from memory_watchdog import MemoryWatchdog, Thresholds
+from network import DEFAULT_ALLOWLIST, NetworkPolicy, open_ready
+from timing_model import TimingModel, get_model, prompt_class
+from tracing import begin_step, end_step, get_tracer, span
+from browser_server import DEFAULT_DEBUG_PORT, connect, read_endpoint, serve
+# Desktop automation (pyautogui, python-xlib, NumPy) is imported on first use:
+# it is slow to load and fails on machines without a display
 
 # Enable ANSI colors on Windows
 if platform.system() == "Windows":
@@ -31,6 +53,7 @@ IS_MAC = platform.system() == "Darwin"
 
 # Configuration
 OUTPUT_FILE = "output.log"
+JSONL_LOG_FILE = "output.jsonl"  # Structured log records (None disables)
 CHATGPT_URL = "https://chatgpt.com"
 PROMPT = "tell me the instructions to debug video stutter issue on a android phone"
 PROMPT_2 = "tell me how many rockets in the attached picture?"  # Second prompt about the image
@@ -40,63 +63,391 @@ if IS_WINDOWS:
     IMAGE_PATH = os.path.join(os.path.expanduser("~"), "Downloads", "cape.jpg")
 else:
     IMAGE_PATH = os.path.expanduser("~/Downloads/cape.jpg")
+ATTACHMENTS = [IMAGE_PATH]  # Files attached together in Step 4
 
-TIMEOUT = 120000  # 2 minutes timeout for Deep Research (it takes time)
-STEP_DELAY = 1000  # 1 second delay between steps (in milliseconds)
+TIMEOUT = 120000  # Completion timeout until there is timing history (see timing_model.py)
+TIMEOUT_FLOOR = 30000  # Learned completion timeouts stay within these bounds
+TIMEOUT_CEILING = 1800000  # Deep Research can run for many minutes
+PROBE_TIMEOUT_FLOOR = 500  # Lower bound for learned selector-probe timeouts
+TIMING_MODEL_FILE = "timing_model.json"  # Observed step durations (None disables learning)
+PACING_PROFILE = "human"  # human, fast or none (see pacing.py)
+HEADLESS = False  # Set to True (or pass --headless) to hide the browser window
+DEFAULT_CONCURRENCY = 8  # Max sessions active at once in the async engine
+SELECTOR_CACHE_FILE = "selector_cache.json"  # Learned winning selectors (None disables)
+BROWSER_SERVER_FILE = "browser_server.json"  # Endpoint of the warm browser server
+USE_BROWSER_SERVER = True  # Attach to a running warm browser server when available
+SCREENSHOT_POLICY = "always"  # always, on-failure, sampled or off
+SCREENSHOT_FORMAT = "png"  # png, jpeg or webp
+SCREENSHOT_QUALITY = 80  # JPEG/WebP quality
+SCREENSHOT_SAMPLE_RATE = 0.25  # Fraction of non-failure captures kept by "sampled"
+STREAM_CAPTURE = True  # Follow responses as they stream in and log TTFT/throughput
+TRACE_FILE = "trace.json"  # Chrome trace-event export of every span (None disables)
+BATCH_RESULTS_FILE = "results.jsonl"  # Default sink for --prompts
+RESULT_STORE_FILE = "history.db"  # Every captured response, queryable (None disables)
+JOB_QUEUE_FILE = "jobs.db"  # SQLite job queue shared by --workers processes
+BLOCK_RESOURCES = True  # Block fonts/images/media and stub trackers (--no-block disables)
+NETWORK_ALLOWLIST = DEFAULT_ALLOWLIST  # Per target host: request hosts that are never blocked
+READY_TIMEOUT = 30000  # Max ms for the prompt input to become interactive after goto
+AUTH_STATE_DIR = "auth_state"  # Saved login state per account (None disables)
+AUTH_ACCOUNT = "default"  # Account whose saved login state is used
+LOGIN_TIMEOUT = 300000  # Max ms to wait for a manual login (headed runs only)
+KEEP_OPEN_MS = 10000  # Keep the browser open for review at the end of a run
+MEMORY_POLICY = "reopen-page"  # Recycling of pooled contexts over a memory threshold (None disables)
+MEMORY_HEAP_MB = 512  # JS heap of a context's page
+MEMORY_NODES = 150000  # DOM nodes of a context's page
+MEMORY_LAYOUTS = 50000  # Layouts since the page loaded
+MEMORY_RSS_MB = 6144  # Resident memory of the whole browser
+RECORD_HAR = None  # Set by --record-har: write the run's traffic to this HAR file
+REPLAY_HAR = None  # Set by --replay-har: serve the run from this HAR file, offline
+HAR_MISSING = "abort"  # Requests not in the HAR: abort (fail fast) or synthesize
+HAR_SPEED = 0.0  # Replay delay as a fraction of recorded time (0 = instant)
+BATCH_MODE = False  # Set by --batch: no review pause at the end of a run
+
+# Browser launch arguments shared by every engine
+LAUNCH_ARGS = [
+    "--start-maximized",
+    "--disable-blink-features=AutomationControlled",  # Hide automation
+]
+
+# ChatGPT UI may vary, so every lookup tries a list of selectors in order
+DEEP_RESEARCH_SELECTORS = [
+    "text=Deep Research",
+    "button:has-text('Deep Research')",
+    "[data-testid='model-selector']",
+    "text=Research",
+    # Dropdown menu approach
+    "[aria-label='Model selector']",
+    "button:has-text('GPT')",
+]
+DROP_TARGET_SELECTORS = ["#prompt-textarea", "textarea", "[contenteditable='true']"]
+INPUT_SELECTORS = [
+    "textarea[placeholder*='Message']",
+    "textarea[placeholder*='Send']",
+    "#prompt-textarea",
+    "textarea",
+    "[contenteditable='true']",
+]
+SUBMIT_SELECTORS = [
+    "button[data-testid='send-button']",
+    "button[aria-label='Send']",
+    "button:has-text('Send')",
+    "button[type='submit']",
+]
+GENERATING_INDICATORS = [
+    "button:has-text('Stop')",
+    "[aria-label='Stop']",
+    ".result-streaming",
+]
+RESPONSE_SELECTORS = [
+    "[data-message-author-role='assistant']",
+    ".markdown",
+    ".prose",
+    "[class*='response']",
+    "[class*='message']",
+]
+
+
+def log_sink() -> agent_log.LogSink:
+    """Return the shared buffered sink for OUTPUT_FILE and JSONL_LOG_FILE."""
+    return agent_log.configure(OUTPUT_FILE, JSONL_LOG_FILE)
 
 
 def log(message: str, is_error: bool = False):
-    """Log message to both stdout and file."""
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    formatted_msg = f"[{timestamp}] {'ERROR: ' if is_error else ''}{message}"
-    
-    # Print to stdout
-    if is_error:
-        print(f"\033[91m{formatted_msg}\033[0m")  # Red for errors
-    else:
-        print(formatted_msg)
-    
-    # Append to file
-    with open(OUTPUT_FILE, "a") as f:
-        f.write(formatted_msg + "\n")
-    
-    sys.stdout.flush()
+    """Queue a log message for stdout, OUTPUT_FILE and the JSONL log."""
+    log_sink()
+    agent_log.log(message, "error" if is_error else "info")
+
+
+def network_policy(target_url: str) -> NetworkPolicy:
+    """Request-blocking policy for a target, with the configured allowlist."""
+    return NetworkPolicy(target_url, allowlist=dict(NETWORK_ALLOWLIST))
+
+
+def get_user_agent() -> str:
+    """Return a platform-specific Chrome user agent."""
+    if IS_WINDOWS:
+        return "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+    elif IS_MAC:
+        return "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+    return "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+
+
+def auth_state(target_url: Optional[str] = None) -> Optional[AuthState]:
+    """Return the saved-login manager for AUTH_ACCOUNT on a target, or None if disabled."""
+    if not AUTH_STATE_DIR:
+        return None
+    return get_auth(AUTH_STATE_DIR, AUTH_ACCOUNT, target_url or CHATGPT_URL)
+
+
+def context_options(target_url: Optional[str] = None) -> dict:
+    """Keyword arguments for browser.new_context(), shared by every engine.
+
+    Includes the saved login state for the target when there is a usable one.
+    """
+    options = {
+        "viewport": {"width": 1920, "height": 1080},
+        "user_agent": get_user_agent(),
+        "locale": "en-US",
+        "timezone_id": "America/Los_Angeles",
+        # Add extra headers to appear more human
+        "extra_http_headers": {"Accept-Language": "en-US,en;q=0.9"},
+    }
+    auth = auth_state(target_url)
+    state = auth.load() if auth else None
+    if state:
+        options["storage_state"] = state
+    return options
+
+
+def memory_watchdog(target_url: Optional[str] = None) -> Optional[MemoryWatchdog]:
+    """Memory watchdog for a context pool on a target, or None if disabled."""
+    if not MEMORY_POLICY:
+        return None
+    thresholds = Thresholds(MEMORY_HEAP_MB, MEMORY_NODES, MEMORY_LAYOUTS, MEMORY_RSS_MB)
+    return MemoryWatchdog(target_url or CHATGPT_URL, MEMORY_POLICY, thresholds, log=log)
 
 
 def human_delay(page, min_ms: int = 800, max_ms: int = 1500):
-    """Add a human-like random delay."""
-    delay = random.randint(min_ms, max_ms)
-    page.wait_for_timeout(delay)
+    """Add a human-like random delay, scaled by the pacing profile."""
+    delay = pacing.current().delay_ms(min_ms, max_ms)
+    if delay:
+        page.wait_for_timeout(delay)
+
+
+def step_pause(page):
+    """Pause between steps for the pacing profile's step delay."""
+    delay = pacing.current().step_delay_ms
+    if delay:
+        log(f"   Waiting {delay}ms before next step...")
+        page.wait_for_timeout(delay)
 
 
 def type_like_human(page, element, text: str):
-    """Type text with human-like delays between keystrokes."""
-    element.click()
-    human_delay(page, 200, 400)
-    
-    for char in text:
-        element.type(char, delay=random.randint(30, 100))
-    
-    human_delay(page, 300, 600)
+    """Type text using the pacing profile's strategy (per-key delays for "human")."""
+    profile = pacing.current()
+    with span("type", chars=len(text), strategy=profile.typing):
+        if profile.needs_focus:
+            element.click()
+            human_delay(page, 200, 400)
+        
+        pacing.type_text(page, element, text, profile)
+        
+        human_delay(page, 300, 600)
+
+
+def selector_cache():
+    """Return the learned-selector cache, or None if disabled."""
+    return get_cache(SELECTOR_CACHE_FILE) if SELECTOR_CACHE_FILE else None
+
+
+def timing_model() -> Optional[TimingModel]:
+    """Return the learned-timeout model, or None if disabled."""
+    return get_model(TIMING_MODEL_FILE) if TIMING_MODEL_FILE else None
+
+
+def learned_timeout(step: str, default: int, floor: int, ceiling: int,
+                    target: Optional[str] = None, pclass: str = "any") -> int:
+    """Timeout for a step from its timing history (default until there is enough)."""
+    model = timing_model()
+    if model is None:
+        return default
+    return model.timeout_ms(target or CHATGPT_URL, step, default, floor, ceiling, pclass)
+
+
+def learned_poll(step: str, default: int, floor: int, ceiling: int,
+                 target: Optional[str] = None, pclass: str = "any") -> int:
+    """Poll interval for a step from its timing history (default until there is enough)."""
+    model = timing_model()
+    if model is None:
+        return default
+    return model.poll_ms(target or CHATGPT_URL, step, default, floor, ceiling, pclass)
+
+
+def record_timing(step: str, duration_ms: float, target: Optional[str] = None,
+                  pclass: str = "any", timed_out: bool = False):
+    """Add an observed step duration to the timing history."""
+    model = timing_model()
+    if model is not None:
+        model.record(target or CHATGPT_URL, step, duration_ms, pclass, timed_out)
+
+
+_screenshots = None
+
+
+def screenshot_pipeline() -> ScreenshotPipeline:
+    """Return the shared screenshot pipeline, created on first use."""
+    global _screenshots
+    if _screenshots is None:
+        _screenshots = ScreenshotPipeline(SCREENSHOT_POLICY, SCREENSHOT_FORMAT,
+                                          SCREENSHOT_QUALITY, SCREENSHOT_SAMPLE_RATE, log=log)
+    return _screenshots
+
+
+_har_replay = None
+
+
+def har_replay() -> Optional[HarReplay]:
+    """Return the HAR replay for REPLAY_HAR, loaded on first use, or None."""
+    global _har_replay
+    if _har_replay is None and REPLAY_HAR:
+        _har_replay = HarReplay(REPLAY_HAR, HAR_MISSING, HAR_SPEED, log=log)
+    return _har_replay
+
+
+def close_browser(browser, context):
+    """Close our context, then the browser.
+
+    A HAR being recorded is only written when its context closes.
+    """
+    try:
+        context.close()
+    except Exception:
+        pass
+    if RECORD_HAR:
+        log(f"📼 Traffic recorded to: {RECORD_HAR}")
+    replay = har_replay()
+    if replay:
+        log(f"📼 Replay: {replay.describe()}")
+    browser.close()
+
+
+def screenshot(page, path: str, full_page: bool = False, failure: bool = False):
+    """Queue a screenshot if the policy allows it (encoded and written off-thread)."""
+    with span("screenshot", path=path, full_page=full_page):
+        saved = screenshot_pipeline().capture(page, path, full_page=full_page, failure=failure)
+    if saved:
+        log(f"   Screenshot queued: {saved}")
+    return saved
+
+
+def find_element(page, selectors: list, label: str, timeout_ms: int = 3000):
+    """Race a fallback selector list in one round-trip and log which candidate won."""
+    # Learned from past probes; a miss counts as "took at least the timeout"
+    step = f"resolve:{label}"
+    timeout_ms = learned_timeout(step, timeout_ms, PROBE_TIMEOUT_FLOOR, timeout_ms * 2)
+    with span("resolve", label=label):
+        resolution = resolve(page, selectors, timeout_ms=timeout_ms, label=label,
+                             cache=selector_cache())
+    log(f"   Resolved {resolution.describe()}")
+    record_timing(step, resolution.elapsed_ms if resolution.found else timeout_ms,
+                  timed_out=not resolution.found)
+    return resolution
+
+
+def wait_for_response(page, previous_count: int, pclass: str = "any") -> bool:
+    """Wait until the newest response stops generating. Returns True if it completed."""
+    timeout = learned_timeout("completion", TIMEOUT, TIMEOUT_FLOOR, TIMEOUT_CEILING,
+                              pclass=pclass)
+    poll = learned_poll("completion", POLL_MS, 100, 1000, pclass=pclass)
+    if timing_model():
+        log(f"   Completion timeout {timeout / 1000:.0f}s, poll {poll}ms "
+            f"({pclass}: {timing_model().describe(CHATGPT_URL, 'completion', pclass)})")
+    with span("completion_wait"):
+        result = wait_for_completion(
+            page, GENERATING_INDICATORS, RESPONSE_SELECTORS[0], previous_count, timeout,
+            poll_ms=poll,
+        )
+    if result["reason"] != "not_started":
+        record_timing("completion", result["waitedMs"], pclass=pclass,
+                      timed_out=not result["completed"])
+    waited = result["waitedMs"] / 1000
+    if result["completed"]:
+        log(f"   Response complete after {waited:.1f}s ({result['textLength']} chars)")
+    elif result["reason"] == "not_started":
+        log(f"⚠️  Response did not start within {waited:.1f}s", is_error=False)
+    else:
+        log(f"⚠️  Response still generating after {waited:.1f}s - capturing anyway", is_error=False)
+    return result["completed"]
+
+
+def submit_prompt(page):
+    """Click the send button, or press Enter if there is none."""
+    with span("submit"):
+        resolution = find_element(page, SUBMIT_SELECTORS, "send button", timeout_ms=2000)
+        if resolution.found:
+            human_delay(page, 300, 600)
+            resolution.locator.click()
+            log(f"   Clicked send button: {resolution.selector}")
+        else:
+            # Fallback: press Enter
+            human_delay(page, 200, 400)
+            page.keyboard.press("Enter")
+            log("   Pressed Enter to submit")
+
+
+def follow_response(page, previous_count: int):
+    """Start streaming capture of the next response, or return None if it is off or fails."""
+    if not STREAM_CAPTURE:
+        return None
+    try:
+        return start_stream(page, RESPONSE_SELECTORS[0], previous_count)
+    except Exception as e:
+        log(f"⚠️  Streaming capture unavailable: {str(e)}", is_error=False)
+        return None
+
+
+def finish_stream(page, stream):
+    """Stop streaming capture and log time-to-first-token and throughput."""
+    if stream is None:
+        return None
+    try:
+        metrics = stop_stream(page, stream)
+    except Exception as e:
+        log(f"⚠️  Streaming capture failed: {str(e)}", is_error=False)
+        return None
+    log(f"   Stream: {metrics.describe()}")
+    return metrics
+
+
+def stream_text(stream) -> str:
+    """Text rebuilt from the streamed deltas (fallback when capture finds nothing)."""
+    return stream.text if stream is not None else ""
+
+
+def capture_response(page, min_length: int = 100) -> str:
+    """Return the text of the most recent assistant message."""
+    with span("capture"):
+        response_text = ""
+        for selector in RESPONSE_SELECTORS:
+            try:
+                elements = page.locator(selector).all()
+                if elements:
+                    # Get the last (most recent) response
+                    response_text = elements[-1].inner_text()
+                    if len(response_text) > min_length:  # Meaningful response
+                        break
+            except Exception:
+                continue
+        return response_text
 
 
 def save_output(content: str):
     """Save the final output to file."""
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    separator = "=" * 60
-    
-    with open(OUTPUT_FILE, "a") as f:
-        f.write(f"\n{separator}\n")
-        f.write(f"DEEP RESEARCH OUTPUT - {timestamp}\n")
-        f.write(f"{separator}\n")
-        f.write(content)
-        f.write(f"\n{separator}\n")
-    
-    print(f"\n{'=' * 60}")
-    print("DEEP RESEARCH OUTPUT")
-    print("=" * 60)
-    print(content)
-    print("=" * 60)
+    save_output_with_header(content, "DEEP RESEARCH OUTPUT", PROMPT)
+
+
+def record_response(prompt: str, response: str, target: str, header: Optional[str] = None,
+                    meta: Optional[dict] = None):
+    """Add a captured response to the run history store, tagged with the bound log fields."""
+    if not RESULT_STORE_FILE:
+        return
+    fields = agent_log.current_fields()
+    get_store(RESULT_STORE_FILE).add(
+        prompt, response, run_id=fields.get("run_id"), session=fields.get("session"),
+        target=target, step=fields.get("step"), header=header, meta=meta,
+    )
+
+
+_pyautogui = None
+
+
+def load_pyautogui():
+    """Import pyautogui on first use; only the desktop-automation helpers need it."""
+    global _pyautogui
+    if _pyautogui is None:
+        import pyautogui
+        _pyautogui = pyautogui
+    return _pyautogui
 
 
 def pyautogui_delay(min_sec: float = 0.3, max_sec: float = 0.8):
@@ -127,7 +478,16 @@ def get_window_geometry(window_name: str) -> dict:
             pass
         return None
     
-    # Linux: Try xdotool first
+    # Linux: Cached lookups on a persistent X connection (python-xlib)
+    from window_control import get_backend
+    backend = get_backend()
+    if backend is not None:
+        try:
+            return backend.geometry(window_name)
+        except Exception as e:
+            log(f"⚠️  X11 window lookup failed, using xdotool: {str(e)}")
+    
+    # Linux: Try xdotool
     try:
         result = subprocess.run(
             ["xdotool", "search", "--name", window_name],
@@ -200,14 +560,25 @@ def focus_window(window_name: str) -> bool:
             pass
         # Fallback: Alt+Tab
         try:
-            pyautogui.hotkey('alt', 'tab')
+            load_pyautogui().hotkey('alt', 'tab')
             time.sleep(0.5)
             return True
         except:
             pass
         return False
     
-    # Linux: Try xdotool first
+    # Linux: Activate through the persistent X connection (python-xlib)
+    from window_control import get_backend
+    backend = get_backend()
+    if backend is not None:
+        try:
+            if backend.focus(window_name):
+                time.sleep(0.3)
+                return True
+        except Exception as e:
+            log(f"⚠️  X11 focus failed, using xdotool: {str(e)}")
+    
+    # Linux: Try xdotool
     try:
         result = subprocess.run(
             ["xdotool", "search", "--name", window_name],
@@ -239,7 +610,7 @@ def focus_window(window_name: str) -> bool:
     
     # Last resort: use pyautogui Alt+Tab
     try:
-        pyautogui.hotkey('alt', 'tab')
+        load_pyautogui().hotkey('alt', 'tab')
         time.sleep(0.5)
         return True
     except:
@@ -248,8 +619,27 @@ def focus_window(window_name: str) -> bool:
     return False
 
 
-def click_at_image(image_path: str, confidence: float = 0.8, timeout: int = 10) -> bool:
-    """Try to find and click on an image on screen."""
+def click_at_image(image_path: str, confidence: float = 0.8, timeout: int = 10,
+                   window_name: Optional[str] = None) -> bool:
+    """Try to find and click on an image on screen (only inside window_name if given)."""
+    import image_match
+    pyautogui = load_pyautogui()
+    if image_match.available():
+        region = None
+        if window_name:
+            geometry = get_window_geometry(window_name)
+            if geometry:
+                region = (geometry["x"], geometry["y"], geometry["width"], geometry["height"])
+        try:
+            result = image_match.get_matcher().find(image_path, region, confidence, timeout)
+        except Exception as e:
+            log(f"⚠️  Template matching failed, using pyautogui: {str(e)}")
+        else:
+            log(f"   Image {os.path.basename(image_path)}: {result.describe()}")
+            if result.found:
+                pyautogui.click(*result.center)
+            return result.found
+    
     start_time = time.time()
     while time.time() - start_time < timeout:
         try:
@@ -266,160 +656,164 @@ def click_at_image(image_path: str, confidence: float = 0.8, timeout: int = 10)
     return False
 
 
-def save_output_with_header(content: str, header: str):
-    """Save output to file with a custom header."""
+def save_output_with_header(content: str, header: str, prompt: Optional[str] = None):
+    """Save output to file with a custom header, and to the history store if prompt is given."""
+    if prompt is not None:
+        record_response(prompt, content, CHATGPT_URL, header=header)
     timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     separator = "=" * 60
     
-    with open(OUTPUT_FILE, "a") as f:
-        f.write(f"\n{separator}\n")
-        f.write(f"{header} - {timestamp}\n")
-        f.write(f"{separator}\n")
-        f.write(content)
-        f.write(f"\n{separator}\n")
-    
-    print(f"\n{'=' * 60}")
-    print(header)
-    print("=" * 60)
-    print(content)
-    print("=" * 60)
+    # Queued behind earlier log records so the file stays in order
+    log_sink().write_block(
+        f"\n{separator}\n{header} - {timestamp}\n{separator}\n{content}\n{separator}\n",
+        f"\n{separator}\n{header}\n{separator}\n{content}\n{separator}\n",
+    )
 
 
 def run_test():
     """Main test function."""
     
     # Clear previous output file
-    with open(OUTPUT_FILE, "w") as f:
-        f.write(f"Web Testing Agent - Started {datetime.now()}\n")
-        f.write("=" * 60 + "\n\n")
+    log_sink().reset(f"Web Testing Agent - Started {datetime.now()}\n" + "=" * 60 + "\n\n")
+    agent_log.bind(run_id=agent_log.new_run_id(), session="main")
     
     log("🚀 Starting Web Testing Agent...")
-    log(f"   Using {STEP_DELAY}ms delay between steps for human-like behavior")
+    profile = pacing.current()
+    log(f"   Pacing '{profile.name}': {profile.typing} typing, "
+        f"{profile.step_delay_ms}ms between steps, slow_mo {profile.slow_mo:g}ms")
     
     try:
         with sync_playwright() as p:
             # Step 1: Launch Google Chrome browser
             log("Step 1: Launching Google Chrome browser...")
+            begin_step("step1")
             try:
-                # Launch Google Chrome (not Chromium)
-                browser = p.chromium.launch(
-                    headless=False,
-                    channel="chrome",  # Use installed Google Chrome
-                    args=[
-                        "--start-maximized",
-                        "--disable-blink-features=AutomationControlled",  # Hide automation
-                    ],
-                    slow_mo=50,  # Slow down actions by 50ms for more human-like behavior
-                )
-                # Platform-specific user agent
-                if IS_WINDOWS:
-                    user_agent = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
-                elif IS_MAC:
-                    user_agent = "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
-                else:
-                    user_agent = "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
-                
-                context = browser.new_context(
-                    viewport={"width": 1920, "height": 1080},
-                    user_agent=user_agent,
-                    locale="en-US",
-                    timezone_id="America/Los_Angeles",
-                )
-                
-                # Add extra headers to appear more human
-                context.set_extra_http_headers({
-                    "Accept-Language": "en-US,en;q=0.9",
-                })
-                
-                page = context.new_page()
-                log("✅ Google Chrome browser launched successfully")
+                # Attach to a warm browser server if one is running
+                endpoint = read_endpoint(BROWSER_SERVER_FILE) if USE_BROWSER_SERVER else None
+                with span("launch", warm=bool(endpoint)):
+                    if endpoint:
+                        browser = connect(p, endpoint, slow_mo=profile.slow_mo)
+                        log(f"✅ Attached to warm Chrome at {endpoint}")
+                    else:
+                        # Launch Google Chrome (not Chromium)
+                        browser = p.chromium.launch(
+                            headless=HEADLESS,
+                            channel="chrome",  # Use installed Google Chrome
+                            args=LAUNCH_ARGS,
+                            slow_mo=profile.slow_mo,  # Human-like pacing (50ms for "human")
+                        )
+                        log("✅ Google Chrome browser launched successfully")
+                    auth = auth_state()
+                    if auth:
+                        log(f"   Saved login ({auth.account}): {auth.describe()}")
+                    options = context_options()
+                    if RECORD_HAR:
+                        options.update(record_options(RECORD_HAR))
+                    context = browser.new_context(**options)
+                    replay = har_replay()
+                    if replay:
+                        # Everything is served from the recording; nothing to block
+                        replay.install(context)
+                        log(f"📼 Replaying {REPLAY_HAR} ({HAR_MISSING} on missing entries, "
+                            f"speed {HAR_SPEED:g})")
+                    policy = None
+                    if BLOCK_RESOURCES and not replay:
+                        policy = network_policy(CHATGPT_URL)
+                    if policy:
+                        policy.install(context)
+                    
+                    page = context.new_page()
             except Exception as e:
                 log(f"Failed to launch Chrome: {str(e)}", is_error=True)
                 log("   Make sure Google Chrome is installed on your system", is_error=True)
                 return False
             
             # Delay before next step
-            log(f"   Waiting {STEP_DELAY}ms before next step...")
-            page.wait_for_timeout(STEP_DELAY)
+            step_pause(page)
             
             # Step 2: Open ChatGPT
             log(f"Step 2: Opening {CHATGPT_URL}...")
+            begin_step("step2")
             try:
-                page.goto(CHATGPT_URL, wait_until="networkidle", timeout=30000)
-                log(f"✅ Successfully opened {CHATGPT_URL}")
+                # Ready means the prompt input is interactive, not networkidle
+                ready_timeout = learned_timeout("ready", READY_TIMEOUT, 5000, READY_TIMEOUT * 2)
+                with span("goto", url=CHATGPT_URL):
+                    ready = open_ready(page, CHATGPT_URL, INPUT_SELECTORS, ready_timeout,
+                                       cache=selector_cache())
+                record_timing("ready", ready["waitedMs"], timed_out=not ready["ready"])
+                if ready["ready"]:
+                    log(f"✅ Successfully opened {CHATGPT_URL} "
+                        f"(input ready after {ready['waitedMs'] / 1000:.1f}s)")
+                else:
+                    log(f"⚠️  Opened {CHATGPT_URL} but the prompt input is not interactive "
+                        f"after {ready['waitedMs'] / 1000:.1f}s", is_error=False)
                 
-                # Wait for page to fully load with human-like delay
-                human_delay(page, 2000, 3000)
+                # Short human-like pause before interacting
+                human_delay(page, 300, 600)
                 
                 # Take screenshot for debugging
-                page.screenshot(path="step2_chatgpt_loaded.png")
-                log("   Screenshot saved: step2_chatgpt_loaded.png")
+                screenshot(page, "step2_chatgpt_loaded.png")
                 
             except PlaywrightTimeout:
                 log(f"Timeout while loading {CHATGPT_URL}", is_error=True)
-                browser.close()
+                close_browser(browser, context)
                 return False
             except Exception as e:
                 log(f"Failed to open {CHATGPT_URL}: {str(e)}", is_error=True)
-                browser.close()
+                close_browser(browser, context)
                 return False
             
             # Delay before next step
-            log(f"   Waiting {STEP_DELAY}ms before next step...")
-            page.wait_for_timeout(STEP_DELAY)
+            step_pause(page)
             
             # Step 3: Select Deep Research feature
             log("Step 3: Selecting 'Deep Research' feature...")
+            begin_step("step3")
+            research_mode = False  # Deep Research answers get their own timing history
             try:
                 # Look for model selector or Deep Research button
                 # ChatGPT UI may vary, trying multiple selectors
-                deep_research_selectors = [
-                    "text=Deep Research",
-                    "button:has-text('Deep Research')",
-                    "[data-testid='model-selector']",
-                    "text=Research",
-                    # Dropdown menu approach
-                    "[aria-label='Model selector']",
-                    "button:has-text('GPT')",
-                ]
-                
-                found_selector = False
-                for selector in deep_research_selectors:
-                    try:
-                        element = page.locator(selector).first
-                        if element.is_visible(timeout=3000):
-                            human_delay(page, 500, 800)  # Human-like pause before click
-                            element.click()
-                            log(f"   Clicked: {selector}")
-                            found_selector = True
-                            human_delay(page, 800, 1200)  # Wait after click
-                            break
-                    except:
-                        continue
+                resolution = find_element(page, DEEP_RESEARCH_SELECTORS, "Deep Research entry")
+                found_selector = resolution.found
+                if found_selector:
+                    human_delay(page, 500, 800)  # Human-like pause before click
+                    resolution.locator.click()
+                    research_mode = True
+                    log(f"   Clicked: {resolution.selector}")
+                    human_delay(page, 800, 1200)  # Wait after click
                 
                 if not found_selector:
                     # Try to find any model/feature dropdown
                     log("   Looking for model dropdown menu...")
-                    page.screenshot(path="step3_looking_for_dropdown.png")
+                    screenshot(page, "step3_looking_for_dropdown.png")
                     
                     # Check if we need to log in first
-                    if page.locator("text=Log in").is_visible(timeout=2000):
-                        log("ChatGPT requires login. Please log in manually.", is_error=True)
-                        log("   Waiting 60 seconds for manual login...")
-                        page.wait_for_timeout(60000)
+                    if is_logged_in(page, INPUT_SELECTORS) is False:
+                        if auth and auth.load():
+                            log("   Saved login was rejected, clearing it")
+                            auth.invalidate()
+                        if HEADLESS:
+                            log("ChatGPT requires login. Run once with a visible browser "
+                                "to save a login.", is_error=True)
+                        else:
+                            log("ChatGPT requires login. Please log in manually.", is_error=True)
+                            log(f"   Waiting up to {LOGIN_TIMEOUT // 1000}s for manual login...")
+                            if wait_for_login(page, INPUT_SELECTORS, LOGIN_TIMEOUT):
+                                log("✅ Logged in")
+                                if auth:
+                                    auth.capture(context)
+                                    log(f"   Login saved for {auth.account}: {auth.path}")
+                            else:
+                                log("   Timed out waiting for login", is_error=True)
                     
                     # After potential login, try again
-                    for selector in deep_research_selectors:
-                        try:
-                            element = page.locator(selector).first
-                            if element.is_visible(timeout=3000):
-                                human_delay(page, 500, 800)
-                                element.click()
-                                found_selector = True
-                                human_delay(page, 800, 1200)
-                                break
-                        except:
-                            continue
+                    resolution = find_element(page, DEEP_RESEARCH_SELECTORS, "Deep Research entry")
+                    found_selector = resolution.found
+                    if found_selector:
+                        human_delay(page, 500, 800)
+                        resolution.locator.click()
+                        research_mode = True
+                        human_delay(page, 800, 1200)
                 
                 # Try clicking on Deep Research in dropdown if it appeared
                 try:
@@ -427,6 +821,7 @@ def run_test():
                     if deep_research_option.is_visible(timeout=3000):
                         human_delay(page, 400, 700)
                         deep_research_option.click()
+                        research_mode = True
                         log("✅ Selected 'Deep Research' feature")
                         human_delay(page, 800, 1200)
                     else:
@@ -434,145 +829,64 @@ def run_test():
                 except:
                     log("⚠️  Could not find Deep Research - continuing with default model")
                 
-                page.screenshot(path="step3_after_selection.png")
-                log("   Screenshot saved: step3_after_selection.png")
+                screenshot(page, "step3_after_selection.png")
                 
             except Exception as e:
                 log(f"Warning in Step 3: {str(e)}", is_error=False)
                 log("   Continuing with default model...")
             
+            mode = "research" if research_mode else "chat"
+            
             # Delay before next step
-            log(f"   Waiting {STEP_DELAY}ms before next step...")
-            page.wait_for_timeout(STEP_DELAY)
+            step_pause(page)
             
             # Step 4: Attach image
             log(f"Step 4: Attaching image...")
-            log(f"   Image path: {IMAGE_PATH}")
+            begin_step("step4")
+            log(f"   Files: {', '.join(ATTACHMENTS)}")
             try:
-                # Check if image file exists
-                if not os.path.exists(IMAGE_PATH):
-                    log(f"Image file not found: {IMAGE_PATH}", is_error=True)
-                    browser.close()
+                # Check every file exists before touching the page
+                missing = [path for path in ATTACHMENTS if not os.path.exists(path)]
+                if missing:
+                    log(f"Image file not found: {', '.join(missing)}", is_error=True)
+                    close_browser(browser, context)
                     return False
                 
-                # Read the image file
-                with open(IMAGE_PATH, "rb") as f:
-                    file_data = f.read()
+                log("   Attaching image...")
+                human_delay(page, 500, 800)
                 
-                file_name = os.path.basename(IMAGE_PATH)
-                file_size = len(file_data)
-                
-                # Determine MIME type
-                ext = os.path.splitext(IMAGE_PATH)[1].lower()
-                mime_types = {
-                    ".jpg": "image/jpeg", ".jpeg": "image/jpeg",
-                    ".png": "image/png", ".gif": "image/gif",
-                    ".webp": "image/webp", ".bmp": "image/bmp",
-                }
-                mime_type = mime_types.get(ext, "image/jpeg")
-                
-                log(f"   File: {file_name} ({file_size} bytes, {mime_type})")
-                
-                # Find drop target
-                working_selector = None
-                for selector in ["#prompt-textarea", "textarea", "[contenteditable='true']"]:
-                    try:
-                        if page.locator(selector).first.is_visible(timeout=2000):
-                            working_selector = selector
-                            log(f"   Found drop target: {selector}")
-                            break
-                    except:
-                        continue
-                
-                if working_selector is None:
-                    log("⚠️  Could not find drop target", is_error=False)
+                # Hands Playwright the file paths; drag-and-drop is only the last resort
+                with span("attach", files=len(ATTACHMENTS)):
+                    result = attach_files(page, ATTACHMENTS, DROP_TARGET_SELECTORS,
+                                          cache=selector_cache(), log=log)
+                if result.success:
+                    log(f"✅ Image attached successfully ({result.describe()})")
+                    human_delay(page, 2000, 3000)
+                    screenshot(page, "step4_image_attached.png")
                 else:
-                    # Convert to base64
-                    file_data_base64 = base64.b64encode(file_data).decode('utf-8')
-                    
-                    log("   Attaching image...")
-                    human_delay(page, 500, 800)
-                    
-                    # JavaScript to simulate drag/drop with file
-                    js_attach = """
-                    async (args) => {
-                        const { selector, fileDataBase64, fileName, mimeType } = args;
-                        const binaryString = atob(fileDataBase64);
-                        const bytes = new Uint8Array(binaryString.length);
-                        for (let i = 0; i < binaryString.length; i++) {
-                            bytes[i] = binaryString.charCodeAt(i);
-                        }
-                        const file = new File([bytes], fileName, { type: mimeType });
-                        const dataTransfer = new DataTransfer();
-                        dataTransfer.items.add(file);
-                        const target = document.querySelector(selector);
-                        if (!target) return { success: false, error: 'Target not found' };
-                        const rect = target.getBoundingClientRect();
-                        const evt = (type) => new DragEvent(type, {
-                            bubbles: true, cancelable: true, dataTransfer,
-                            clientX: rect.left + rect.width/2, clientY: rect.top + rect.height/2
-                        });
-                        target.dispatchEvent(evt('dragenter'));
-                        await new Promise(r => setTimeout(r, 100));
-                        target.dispatchEvent(evt('dragover'));
-                        await new Promise(r => setTimeout(r, 100));
-                        target.dispatchEvent(evt('drop'));
-                        return { success: true };
-                    }
-                    """
-                    
-                    result = page.evaluate(js_attach, {
-                        "selector": working_selector,
-                        "fileDataBase64": file_data_base64,
-                        "fileName": file_name,
-                        "mimeType": mime_type,
-                    })
-                    
-                    if result.get("success"):
-                        log("✅ Image attached successfully")
-                        human_delay(page, 2000, 3000)
-                        page.screenshot(path="step4_image_attached.png")
-                        log("   Screenshot saved: step4_image_attached.png")
-                    else:
-                        log(f"⚠️  Attachment failed: {result.get('error')}", is_error=False)
+                    log(f"⚠️  Attachment failed: {result.describe()}", is_error=False)
                 
             except Exception as e:
                 log(f"Warning in Step 4: {str(e)}", is_error=False)
                 log("   Continuing without image attachment...")
             
             # Delay before next step
-            log(f"   Waiting {STEP_DELAY}ms before next step...")
-            page.wait_for_timeout(STEP_DELAY)
+            step_pause(page)
             
             # Step 5: Input prompt
             log(f"Step 5: Inputting prompt...")
+            begin_step("step5")
             log(f"   Prompt: \"{PROMPT}\"")
             try:
                 # Find the textarea/input field
-                input_selectors = [
-                    "textarea[placeholder*='Message']",
-                    "textarea[placeholder*='Send']",
-                    "#prompt-textarea",
-                    "textarea",
-                    "[contenteditable='true']",
-                ]
-                
-                input_found = False
-                input_element = None
-                for selector in input_selectors:
-                    try:
-                        input_element = page.locator(selector).first
-                        if input_element.is_visible(timeout=3000):
-                            input_found = True
-                            log(f"   Found input field: {selector}")
-                            break
-                    except:
-                        continue
+                resolution = find_element(page, INPUT_SELECTORS, "input field")
+                input_found = resolution.found
+                input_element = resolution.locator
                 
                 if not input_found or input_element is None:
                     log("Could not find input field", is_error=True)
-                    page.screenshot(path="error_no_input_field.png")
-                    browser.close()
+                    screenshot(page, "error_no_input_field.png", failure=True)
+                    close_browser(browser, context)
                     return False
                 
                 # Type like a human (with delays between keystrokes)
@@ -580,113 +894,41 @@ def run_test():
                 type_like_human(page, input_element, PROMPT)
                 
                 log("✅ Prompt entered successfully")
-                page.screenshot(path="step5_prompt_entered.png")
+                screenshot(page, "step5_prompt_entered.png")
                 
                 # Human-like delay before submitting
                 human_delay(page, 800, 1200)
                 
                 # Submit the prompt
                 log("   Submitting prompt...")
+                message_count = count_messages(page, RESPONSE_SELECTORS[0])
                 
                 # Try pressing Enter or clicking send button
-                submit_selectors = [
-                    "button[data-testid='send-button']",
-                    "button[aria-label='Send']",
-                    "button:has-text('Send')",
-                    "button[type='submit']",
-                ]
-                
-                submitted = False
-                for selector in submit_selectors:
-                    try:
-                        btn = page.locator(selector).first
-                        if btn.is_visible(timeout=2000):
-                            human_delay(page, 300, 600)
-                            btn.click()
-                            submitted = True
-                            log(f"   Clicked send button: {selector}")
-                            break
-                    except:
-                        continue
-                
-                if not submitted:
-                    # Fallback: press Enter
-                    human_delay(page, 200, 400)
-                    page.keyboard.press("Enter")
-                    log("   Pressed Enter to submit")
+                submit_prompt(page)
+                stream = follow_response(page, message_count)
                 
                 log("✅ Prompt submitted")
                 
             except Exception as e:
                 log(f"Failed to input prompt: {str(e)}", is_error=True)
-                page.screenshot(path="error_input_prompt.png")
-                browser.close()
+                screenshot(page, "error_input_prompt.png", failure=True)
+                close_browser(browser, context)
                 return False
             
             # Delay before next step
-            log(f"   Waiting {STEP_DELAY}ms before next step...")
-            page.wait_for_timeout(STEP_DELAY)
+            step_pause(page)
             
             # Step 6: Wait for response and capture output
             log("Step 6: Waiting for response (this may take a while for Deep Research)...")
+            begin_step("step6")
             try:
-                # Wait for response to start appearing
-                page.wait_for_timeout(5000)
-                
-                # Wait for response to complete
-                # Look for indicators that response is done
-                max_wait_time = TIMEOUT
-                wait_interval = 5000
-                total_waited = 0
-                
-                while total_waited < max_wait_time:
-                    # Check if still generating
-                    is_generating = False
-                    generating_indicators = [
-                        "button:has-text('Stop')",
-                        "[aria-label='Stop']",
-                        ".result-streaming",
-                    ]
-                    
-                    for indicator in generating_indicators:
-                        try:
-                            if page.locator(indicator).first.is_visible(timeout=1000):
-                                is_generating = True
-                                break
-                        except:
-                            continue
-                    
-                    if not is_generating:
-                        log("   Response appears complete")
-                        break
-                    
-                    log(f"   Still generating... ({total_waited // 1000}s elapsed)")
-                    page.wait_for_timeout(wait_interval)
-                    total_waited += wait_interval
-                
-                # Extra wait for final rendering
-                human_delay(page, 2000, 3000)
+                # Wait for the response to finish (detected in the browser, no polling)
+                wait_for_response(page, message_count,
+                                  prompt_class(PROMPT, len(ATTACHMENTS), mode))
+                finish_stream(page, stream)
                 
                 # Capture the response
-                response_selectors = [
-                    "[data-message-author-role='assistant']",
-                    ".markdown",
-                    ".prose",
-                    "[class*='response']",
-                    "[class*='message']",
-                ]
-                
-                response_text = ""
-                for selector in response_selectors:
-                    try:
-                        elements = page.locator(selector).all()
-                        if elements:
-                            # Get the last (most recent) response
-                            response_text = elements[-1].inner_text()
-                            if len(response_text) > 100:  # Meaningful response
-                                break
-                    except:
-                        continue
+                response_text = capture_response(page, min_length=100) or stream_text(stream)
                 
                 if response_text:
                     log("✅ Response captured successfully")
@@ -694,56 +936,38 @@ def run_test():
                 else:
                     log("Could not capture response text", is_error=True)
                     # Take screenshot of current state
-                    page.screenshot(path="step6_response_state.png", full_page=True)
-                    log("   Screenshot saved: step6_response_state.png")
+                    screenshot(page, "step6_response_state.png", full_page=True, failure=True)
                 
-                page.screenshot(path="step6_final_output.png", full_page=True)
-                log("   Final screenshot saved: step6_final_output.png")
+                screenshot(page, "step6_final_output.png", full_page=True)
                 
             except PlaywrightTimeout:
                 log("Timeout while waiting for response", is_error=True)
-                page.screenshot(path="error_timeout.png")
-                browser.close()
+                screenshot(page, "error_timeout.png", failure=True)
+                close_browser(browser, context)
                 return False
             except Exception as e:
                 log(f"Failed to capture response: {str(e)}", is_error=True)
-                page.screenshot(path="error_capture_response.png")
-                browser.close()
+                screenshot(page, "error_capture_response.png", failure=True)
+                close_browser(browser, context)
                 return False
             
             # Delay before next step
-            log(f"   Waiting {STEP_DELAY}ms before next step...")
-            page.wait_for_timeout(STEP_DELAY)
+            step_pause(page)
             
             # Step 7: Input second prompt (about the attached image)
             log(f"Step 7: Inputting second prompt...")
+            begin_step("step7")
             log(f"   Prompt: \"{PROMPT_2}\"")
             try:
                 # Find the textarea/input field
-                input_selectors = [
-                    "textarea[placeholder*='Message']",
-                    "textarea[placeholder*='Send']",
-                    "#prompt-textarea",
-                    "textarea",
-                    "[contenteditable='true']",
-                ]
-                
-                input_found = False
-                input_element = None
-                for selector in input_selectors:
-                    try:
-                        input_element = page.locator(selector).first
-                        if input_element.is_visible(timeout=3000):
-                            input_found = True
-                            log(f"   Found input field: {selector}")
-                            break
-                    except:
-                        continue
+                resolution = find_element(page, INPUT_SELECTORS, "input field")
+                input_found = resolution.found
+                input_element = resolution.locator
                 
                 if not input_found or input_element is None:
                     log("Could not find input field for second prompt", is_error=True)
-                    page.screenshot(path="error_no_input_field_step7.png")
-                    browser.close()
+                    screenshot(page, "error_no_input_field_step7.png", failure=True)
+                    close_browser(browser, context)
                     return False
                 
                 # Type like a human (with delays between keystrokes)
@@ -751,145 +975,87 @@ def run_test():
                 type_like_human(page, input_element, PROMPT_2)
                 
                 log("✅ Second prompt entered successfully")
-                page.screenshot(path="step7_prompt_entered.png")
+                screenshot(page, "step7_prompt_entered.png")
                 
                 # Human-like delay before submitting
                 human_delay(page, 800, 1200)
                 
                 # Submit the prompt
                 log("   Submitting prompt...")
+                message_count = count_messages(page, RESPONSE_SELECTORS[0])
                 
                 # Try pressing Enter or clicking send button
-                submit_selectors = [
-                    "button[data-testid='send-button']",
-                    "button[aria-label='Send']",
-                    "button:has-text('Send')",
-                    "button[type='submit']",
-                ]
-                
-                submitted = False
-                for selector in submit_selectors:
-                    try:
-                        btn = page.locator(selector).first
-                        if btn.is_visible(timeout=2000):
-                            human_delay(page, 300, 600)
-                            btn.click()
-                            submitted = True
-                            log(f"   Clicked send button: {selector}")
-                            break
-                    except:
-                        continue
-                
-                if not submitted:
-                    # Fallback: press Enter
-                    human_delay(page, 200, 400)
-                    page.keyboard.press("Enter")
-                    log("   Pressed Enter to submit")
+                submit_prompt(page)
+                stream = follow_response(page, message_count)
                 
                 log("✅ Second prompt submitted")
                 
             except Exception as e:
                 log(f"Failed to input second prompt: {str(e)}", is_error=True)
-                page.screenshot(path="error_input_prompt_step7.png")
-                browser.close()
+                screenshot(page, "error_input_prompt_step7.png", failure=True)
+                close_browser(browser, context)
                 return False
             
             # Delay before next step
-            log(f"   Waiting {STEP_DELAY}ms before next step...")
-            page.wait_for_timeout(STEP_DELAY)
+            step_pause(page)
             
             # Step 8: Wait for second response and capture output
             log("Step 8: Waiting for second response...")
+            begin_step("step8")
             try:
-                # Wait for response to start appearing
-                page.wait_for_timeout(5000)
-                
-                # Wait for response to complete
-                max_wait_time = TIMEOUT
-                wait_interval = 5000
-                total_waited = 0
-                
-                while total_waited < max_wait_time:
-                    # Check if still generating
-                    is_generating = False
-                    generating_indicators = [
-                        "button:has-text('Stop')",
-                        "[aria-label='Stop']",
-                        ".result-streaming",
-                    ]
-                    
-                    for indicator in generating_indicators:
-                        try:
-                            if page.locator(indicator).first.is_visible(timeout=1000):
-                                is_generating = True
-                                break
-                        except:
-                            continue
-                    
-                    if not is_generating:
-                        log("   Response appears complete")
-                        break
-                    
-                    log(f"   Still generating... ({total_waited // 1000}s elapsed)")
-                    page.wait_for_timeout(wait_interval)
-                    total_waited += wait_interval
-                
-                # Extra wait for final rendering
-                human_delay(page, 2000, 3000)
+                # Wait for the response to finish (detected in the browser, no polling)
+                wait_for_response(page, message_count,
+                                  prompt_class(PROMPT_2, len(ATTACHMENTS), mode))
+                finish_stream(page, stream)
                 
                 # Capture the response
-                response_selectors = [
-                    "[data-message-author-role='assistant']",
-                    ".markdown",
-                    ".prose",
-                    "[class*='response']",
-                    "[class*='message']",
-                ]
-                
-                response_text_2 = ""
-                for selector in response_selectors:
-                    try:
-                        elements = page.locator(selector).all()
-                        if elements:
-                            # Get the last (most recent) response
-                            response_text_2 = elements[-1].inner_text()
-                            if len(response_text_2) > 50:  # Meaningful response
-                                break
-                    except:
-                        continue
+                response_text_2 = capture_response(page, min_length=50) or stream_text(stream)
                 
                 if response_text_2:
                     log("✅ Second response captured successfully")
                     # Save to output file with header
-                    save_output_with_header(response_text_2, "SECOND PROMPT RESPONSE (Image Analysis)")
+                    save_output_with_header(response_text_2, "SECOND PROMPT RESPONSE (Image Analysis)",
+                                            PROMPT_2)
                 else:
                     log("Could not capture second response text", is_error=True)
-                    page.screenshot(path="step8_response_state.png", full_page=True)
-                    log("   Screenshot saved: step8_response_state.png")
+                    screenshot(page, "step8_response_state.png", full_page=True, failure=True)
                 
-                page.screenshot(path="step8_final_output.png", full_page=True)
-                log("   Final screenshot saved: step8_final_output.png")
+                screenshot(page, "step8_final_output.png", full_page=True)
                 
             except PlaywrightTimeout:
                 log("Timeout while waiting for second response", is_error=True)
-                page.screenshot(path="error_timeout_step8.png")
-                browser.close()
+                screenshot(page, "error_timeout_step8.png", failure=True)
+                close_browser(browser, context)
                 return False
             except Exception as e:
                 log(f"Failed to capture second response: {str(e)}", is_error=True)
-                page.screenshot(path="error_capture_response_step8.png")
-                browser.close()
+                screenshot(page, "error_capture_response_step8.png", failure=True)
+                close_browser(browser, context)
                 return False
             
             # Cleanup
             log("\n🎉 Test completed successfully!")
             log(f"📄 Output saved to: {OUTPUT_FILE}")
+            if policy:
+                log(f"🛡️  Network: {policy.describe()}")
+            if auth and auth.status() == "stale":
+                # The site rotates its session cookies during a run; keep the newer ones
+                auth.capture(context)
+                log(f"🔑 Login state for {auth.account} refreshed ({auth.describe()})")
+            cache = selector_cache()
+            if cache is not None:
+                cache.save()
+                stats = cache.stats()
+                log(f"🧠 Selector cache: {stats['hits']} hits, {stats['misses']} misses "
+                    f"({stats['entries']} entries)")
             
-            # Keep browser open for review (optional)
-            log("\nBrowser will close in 10 seconds...")
-            page.wait_for_timeout(10000)
+            # Keep browser open for review (skipped in batch mode and on a warm server)
+            if KEEP_OPEN_MS and not BATCH_MODE and not endpoint:
+                log(f"\nBrowser will close in {KEEP_OPEN_MS // 1000} seconds...")
+                page.wait_for_timeout(KEEP_OPEN_MS)
             
-            browser.close()
+            # On a warm server this only closes our context and disconnects
+            close_browser(browser, context)
             return True
             
     except Exception as e:
@@ -897,17 +1063,157 @@ def run_test():
         return False
 
 
+def write_trace():
+    """Close the open step span, export the Chrome trace and log the latency summary."""
+    end_step()
+    tracer = get_tracer()
+    if not tracer.events:
+        return
+    if TRACE_FILE:
+        tracer.export_chrome_trace(TRACE_FILE)
+        log(f"⏱️  Trace saved to: {TRACE_FILE} (open in chrome://tracing or ui.perfetto.dev)")
+    log("⏱️  Latency summary:\n" + tracer.summary_table())
+
+
+def parse_args(argv=None):
+    """Parse command-line options."""
+    parser = argparse.ArgumentParser(description="Website Functionality Testing Agent")
+    parser.add_argument("--headless", action="store_true",
+                        help="Run Chrome without showing the browser window")
+    parser.add_argument("--sessions", type=int, default=0,
+                        help="Run N concurrent sessions of PROMPT with the async engine")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY,
+                        help=f"Max sessions active at once (default {DEFAULT_CONCURRENCY})")
+    parser.add_argument("--serve-browser", action="store_true",
+                        help="Start a long-lived warm Chrome that later runs attach to")
+    parser.add_argument("--port", type=int, default=DEFAULT_DEBUG_PORT,
+                        help=f"Debugging port for --serve-browser (default {DEFAULT_DEBUG_PORT})")
+    parser.add_argument("--cold", action="store_true",
+                        help="Always launch a fresh Chrome, even if a warm server is running")
+    parser.add_argument("--batch", action="store_true",
+                        help="Batch mode: skip the review pause before the browser closes")
+    parser.add_argument("--pace", choices=sorted(pacing.PROFILES),
+                        help=f"Pacing profile for typing and delays (default {PACING_PROFILE}, "
+                             f"none with --replay-har)")
+    parser.add_argument("--url",
+                        help=f"Target URL (default {CHATGPT_URL}, or the recorded page "
+                             f"with --replay-har)")
+    parser.add_argument("--mock", action="store_true",
+                        help="Start the local ChatGPT stand-in (mock_server.py) and target it")
+    parser.add_argument("--no-block", action="store_true",
+                        help="Load every resource (no font/image/media/tracker blocking)")
+    parser.add_argument("--prompts", metavar="FILE",
+                        help="Run every prompt in FILE (.jsonl or one per line) with the async engine")
+    parser.add_argument("--results", metavar="FILE", default=BATCH_RESULTS_FILE,
+                        help=f"Result sink for --prompts, .jsonl or .db (default {BATCH_RESULTS_FILE})")
+    parser.add_argument("--workers", type=int, default=0,
+                        help="Run K worker processes (own Chrome each) that drain the job queue")
+    parser.add_argument("--queue", metavar="FILE", default=JOB_QUEUE_FILE,
+                        help=f"SQLite job queue for --workers; --prompts are added to it "
+                             f"(default {JOB_QUEUE_FILE})")
+    har = parser.add_mutually_exclusive_group()
+    har.add_argument("--record-har", metavar="FILE",
+                     help="Record the run's network traffic to a HAR file")
+    har.add_argument("--replay-har", metavar="FILE",
+                     help="Replay a recorded HAR file instead of using the network")
+    parser.add_argument("--har-missing", choices=MISSING_POLICIES, default=HAR_MISSING,
+                        help=f"Requests not in the replayed HAR: abort or synthesize "
+                             f"(default {HAR_MISSING})")
+    parser.add_argument("--har-speed", type=float, default=HAR_SPEED,
+                        help="Replay each response after its recorded time x this factor "
+                             "(default 0: instant)")
+    parser.add_argument("--import-time", action="store_true",
+                        help="Print a per-import breakdown of start-up time and exit")
+    parser.add_argument("--screenshots", choices=POLICIES, default=SCREENSHOT_POLICY,
+                        help=f"Screenshot policy (default {SCREENSHOT_POLICY})")
+    parser.add_argument("--screenshot-format", choices=FORMATS, default=SCREENSHOT_FORMAT,
+                        help=f"Screenshot image format (default {SCREENSHOT_FORMAT})")
+    args = parser.parse_args(argv)
+    if (args.record_har or args.replay_har) and (args.sessions or args.prompts or args.workers):
+        parser.error("--record-har/--replay-har apply to a single run_test() run")
+    return args
+
+
 def main():
     """Entry point."""
+    global HEADLESS, USE_BROWSER_SERVER, BATCH_MODE, SCREENSHOT_POLICY, SCREENSHOT_FORMAT
+    global BLOCK_RESOURCES, CHATGPT_URL, RECORD_HAR, REPLAY_HAR, HAR_MISSING, HAR_SPEED
+    global TIMING_MODEL_FILE, RESULT_STORE_FILE, AUTH_STATE_DIR
+    # The async engines do `from main import ...`; run as a script, that would load a
+    # second copy with the defaults instead of the flags parsed below
+    sys.modules.setdefault("main", sys.modules[__name__])
+    args = parse_args()
+    if args.import_time:
+        from startup import report
+        print(report("main"))
+        sys.exit(0)
+    HEADLESS = HEADLESS or args.headless
+    USE_BROWSER_SERVER = USE_BROWSER_SERVER and not args.cold
+    BATCH_MODE = BATCH_MODE or args.batch
+    SCREENSHOT_POLICY = args.screenshots
+    SCREENSHOT_FORMAT = args.screenshot_format
+    BLOCK_RESOURCES = BLOCK_RESOURCES and not args.no_block
+    RECORD_HAR = args.record_har
+    REPLAY_HAR = args.replay_har
+    HAR_MISSING = args.har_missing
+    HAR_SPEED = args.har_speed
+    pacing.set_profile(args.pace or ("none" if REPLAY_HAR else PACING_PROFILE))
+    CHATGPT_URL = args.url or CHATGPT_URL
+    if REPLAY_HAR:
+        try:
+            recorded_url = har_replay().start_url()
+        except (OSError, ValueError, KeyError) as e:
+            print(f"❌ Cannot replay {REPLAY_HAR}: {e}")
+            sys.exit(1)
+        CHATGPT_URL = args.url or recorded_url or CHATGPT_URL
+        # A replay is offline and finishes in seconds: no review pause, and no
+        # timings, history or login state learned from a site never contacted
+        BATCH_MODE = True
+        TIMING_MODEL_FILE = RESULT_STORE_FILE = AUTH_STATE_DIR = None
+    elif args.mock:
+        from mock_server import start_in_thread
+        _, CHATGPT_URL = start_in_thread()
+        # Mock answers share PROMPT with real ones; keep them out of history.db, and
+        # don't learn timeouts for a throwaway port
+        RESULT_STORE_FILE = TIMING_MODEL_FILE = None
+    
+    if args.serve_browser:
+        with sync_playwright() as p:
+            serve(p, BROWSER_SERVER_FILE, LAUNCH_ARGS, port=args.port, headless=HEADLESS, log=log)
+        sys.exit(0)
+    
     print("=" * 60)
     print("🌐 Website Functionality Testing Agent")
     print("=" * 60)
-    print(f"Target: ChatGPT Deep Research")
+    print(f"Target: ChatGPT Deep Research ({CHATGPT_URL})")
     print(f"Output: {OUTPUT_FILE}")
-    print(f"Step Delay: {STEP_DELAY}ms")
+    print(f"Pacing: {pacing.current().name}")
     print("=" * 60 + "\n")
     
-    success = run_test()
+    if args.workers > 0:
+        from worker_farm import run_workers
+        print(f"Workers: {args.workers} x {args.concurrency} slots on {args.queue}\n")
+        success = run_workers(args.queue, args.workers, args.concurrency,
+                              headless=HEADLESS, block_resources=BLOCK_RESOURCES,
+                              url=CHATGPT_URL, prompts_path=args.prompts, mock=args.mock)
+    elif args.prompts:
+        from batch import run_batch
+        print(f"Prompts: {args.prompts} -> {args.results} (concurrency {args.concurrency})\n")
+        endpoint = read_endpoint(BROWSER_SERVER_FILE) if USE_BROWSER_SERVER else None
+        success = run_batch(args.prompts, args.results, args.concurrency,
+                            headless=HEADLESS, endpoint=endpoint,
+                            block_resources=BLOCK_RESOURCES, url=CHATGPT_URL)
+    elif args.sessions > 0:
+        from async_engine import run_concurrent
+        print(f"Sessions: {args.sessions} (concurrency {args.concurrency})\n")
+        endpoint = read_endpoint(BROWSER_SERVER_FILE) if USE_BROWSER_SERVER else None
+        success = run_concurrent(PROMPT, args.sessions, args.concurrency,
+                                 headless=HEADLESS, endpoint=endpoint,
+                                 block_resources=BLOCK_RESOURCES, url=CHATGPT_URL)
+    else:
+        success = run_test()
+    write_trace()
+    agent_log.flush()
     
     if success:
         print("\n✅ All steps completed successfully!")
@@ -0,0 +1,175 @@
+"""
+Browser Memory Watchdog
+
+Long batches reuse pooled contexts and pages for hours, and Chrome's memory
+grows until pages slow down or crash. Every time a context goes back to the
+pool, the watchdog samples:
+
+    js_heap_mb    Performance.getMetrics JSHeapUsedSize of the context's page
+    nodes         Performance.getMetrics Nodes (DOM size)
+    layouts       Performance.getMetrics LayoutCount (since the page loaded)
+    rss_mb        resident memory of the whole browser (every Chrome process
+                  from SystemInfo.getProcessInfo). Chrome does not map pages
+                  to processes, so this cannot be split per context.
+
+If any value crosses its threshold, the context is recycled by the policy:
+
+    new-conversation  navigate the page back to the target (fresh document)
+    reopen-page       open a new page in the same context, close the old one
+    replace-context   close the context and create a new one (cookies are
+                      restored from the pool's options, e.g. saved login)
+
+Each recycle is logged with the samples before and after it.
+
+RSS is read with psutil when it is installed, else from /proc (Linux). If
+neither is available, rss_mb is None and its threshold is ignored.
+"""
+
+import os
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, List, Optional
+
+try:
+    import psutil
+except ImportError:  # Optional; /proc is used on Linux
+    psutil = None
+
+POLICIES = ("new-conversation", "reopen-page", "replace-context")
+
+
+@dataclass
+class Thresholds:
+    """Values above which a context is recycled (None disables one check)."""
+    js_heap_mb: Optional[float] = 512
+    nodes: Optional[int] = 150000
+    layouts: Optional[int] = 50000
+    rss_mb: Optional[float] = 6144
+
+
+@dataclass
+class MemorySample:
+    """One reading of a page's metrics and the browser's resident memory."""
+    js_heap_mb: float
+    nodes: int
+    layouts: int
+    rss_mb: Optional[float] = None
+
+    def describe(self) -> str:
+        """One-line summary for the log."""
+        rss = f", RSS {self.rss_mb:.0f}MB" if self.rss_mb is not None else ""
+        return (f"heap {self.js_heap_mb:.0f}MB, {self.nodes} nodes, "
+                f"{self.layouts} layouts{rss}")
+
+
+def process_rss_mb(pids: List[int]) -> Optional[float]:
+    """Summed resident memory of the given processes, or None if it cannot be read."""
+    total = 0
+    readable = False
+    for pid in pids:
+        try:
+            if psutil is not None:
+                total += psutil.Process(pid).memory_info().rss
+            else:
+                with open(f"/proc/{pid}/statm") as f:
+                    total += int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+            readable = True
+        except Exception:
+            continue  # Exited, not ours (remote browser) or no /proc
+    return total / 2 ** 20 if readable else None
+
+
+async def browser_rss_mb(browser) -> Optional[float]:
+    """Resident memory of every process of a Chromium browser."""
+    try:
+        session = await browser.new_browser_cdp_session()
+        try:
+            info = await session.send("SystemInfo.getProcessInfo")
+        finally:
+            await session.detach()
+    except Exception:
+        return None
+    return process_rss_mb([p["id"] for p in info.get("processInfo", [])])
+
+
+async def sample(page, browser=None) -> MemorySample:
+    """Sample a page's CDP performance metrics and, if given, the browser's RSS."""
+    session = await page.context.new_cdp_session(page)
+    try:
+        await session.send("Performance.enable")
+        result = await session.send("Performance.getMetrics")
+    finally:
+        await session.detach()
+    metrics: Dict[str, float] = {m["name"]: m["value"] for m in result["metrics"]}
+    rss = await browser_rss_mb(browser) if browser is not None else None
+    return MemorySample(metrics.get("JSHeapUsedSize", 0) / 2 ** 20,
+                        int(metrics.get("Nodes", 0)), int(metrics.get("LayoutCount", 0)), rss)
+
+
+class MemoryWatchdog:
+    """Samples pooled contexts on release and recycles those over a threshold."""
+
+    def __init__(self, url: str, policy: str = "reopen-page",
+                 thresholds: Optional[Thresholds] = None,
+                 log: Optional[Callable[[str], None]] = None):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown recycle policy {policy!r} "
+                             f"(expected one of {', '.join(POLICIES)})")
+        self.url = url
+        self.policy = policy
+        self.thresholds = thresholds or Thresholds()
+        self.log = log
+        self.samples = 0
+        self.recycles = 0
+        self.peak = MemorySample(0, 0, 0)
+
+    def exceeded(self, s: MemorySample) -> List[str]:
+        """Descriptions of the thresholds a sample crosses."""
+        t = self.thresholds
+        crossed = []
+        for name, value, limit in (("heap MB", s.js_heap_mb, t.js_heap_mb),
+                                   ("nodes", s.nodes, t.nodes),
+                                   ("layouts", s.layouts, t.layouts),
+                                   ("RSS MB", s.rss_mb, t.rss_mb)):
+            if value is not None and limit is not None and value > limit:
+                crossed.append(f"{name} {value:.0f} > {limit:g}")
+        return crossed
+
+    def _track(self, s: MemorySample):
+        self.samples += 1
+        rss = s.rss_mb if self.peak.rss_mb is None else max(self.peak.rss_mb, s.rss_mb or 0)
+        self.peak = MemorySample(max(self.peak.js_heap_mb, s.js_heap_mb),
+                                 max(self.peak.nodes, s.nodes),
+                                 max(self.peak.layouts, s.layouts), rss)
+
+    async def check(self, context, replace: Callable[..., Awaitable]):
+        """Sample a released context and recycle it if needed. Returns the context to pool.
+
+        replace(context) must close the context and return a new one with a page.
+        """
+        page = context.pages[0]
+        browser = context.browser
+        before = await sample(page, browser)
+        self._track(before)
+        reasons = self.exceeded(before)
+        if not reasons:
+            return context
+
+        if self.policy == "new-conversation":
+            await page.goto(self.url, wait_until="domcontentloaded")
+        elif self.policy == "reopen-page":
+            old_page, page = page, await context.new_page()
+            await old_page.close()
+        else:
+            context = await replace(context)
+            page = context.pages[0]
+        self.recycles += 1
+        after = await sample(page, browser)
+        if self.log:
+            self.log(f"♻️  Memory recycle ({self.policy}; {', '.join(reasons)}): "
+                     f"before {before.describe()} -> after {after.describe()}")
+        return context
+
+    def describe(self) -> str:
+        """One-line summary for the log."""
+        return (f"{self.samples} samples, {self.recycles} recycles ({self.policy}), "
+                f"peak {self.peak.describe()}")
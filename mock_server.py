@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+"""
+Local ChatGPT Stand-in
+
+A small offline server for benchmarking the agent and running it in CI. It
+serves one chat page with the selectors the agent relies on:
+
+    #prompt-textarea                          contenteditable prompt input
+    button[data-testid='send-button']         send button
+    button[aria-label='Stop'] ("Stop")        shown while a response streams
+    [data-message-author-role='assistant']    one element per response
+    "Deep Research" button, <input type="file"> for attachments
+
+Responses stream from /api/generate as plain-text chunks. Latency, token rate
+and failures are drawn from configurable distributions with a fixed seed.
+The response text is derived from the prompt, so the same prompt always gets
+the same answer.
+
+Only the standard library is used.
+
+Usage:
+    python mock_server.py --port 8765 --latency-ms 800 --tokens-per-s 40
+    python main.py --mock                    # run_test() against an in-process server
+"""
+
+import argparse
+import hashlib
+import json
+import random
+import threading
+import time
+from dataclasses import asdict, dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+DEFAULT_PORT = 8765
+
+WORDS = (
+    "the video stutter is usually caused by dropped frames in the decoder pipeline "
+    "check developer options enable gpu rendering profile and look for long frames "
+    "thermal throttling background sync and battery saver can all reduce clocks "
+    "capture a systrace or perfetto trace while reproducing the issue then compare "
+    "vsync and present timings to find where the frame budget is exceeded"
+).split()
+
+
+@dataclass
+class MockConfig:
+    """Latency, throughput and failure-injection settings."""
+    latency_ms: float = 800.0  # Mean time to first token
+    latency_jitter_ms: float = 200.0  # Std deviation of time to first token
+    tokens_per_s: float = 40.0  # Mean streaming rate
+    tokens_jitter: float = 0.2  # Relative std deviation of the per-token delay
+    response_tokens: Tuple[int, int] = (80, 200)  # Response length range, in words
+    fail_rate: float = 0.0  # Probability a request fails with HTTP 500
+    stall_rate: float = 0.0  # Probability of one mid-stream stall
+    stall_ms: float = 3000.0  # Length of an injected stall
+    seed: int = 0
+
+
+PAGE = """<!DOCTYPE html>
+<html lang="en">
+<head>
+<meta charset="utf-8">
+<title>ChatGPT (mock)</title>
+<style>
+  body { font-family: sans-serif; margin: 0 auto; max-width: 800px; padding: 16px; }
+  #thread > div { white-space: pre-wrap; margin: 12px 0; padding: 8px; border-radius: 6px; }
+  [data-message-author-role='user'] { background: #eef; }
+  [data-message-author-role='assistant'] { background: #f6f6f6; }
+  #prompt-textarea { min-height: 48px; border: 1px solid #999; padding: 8px; }
+  .hidden { display: none; }
+</style>
+</head>
+<body>
+<button id="model" data-testid="model-selector">Deep Research</button>
+<div id="thread"></div>
+<form id="composer">
+  <input type="file" id="upload" multiple class="hidden">
+  <div id="prompt-textarea" contenteditable="true" data-placeholder="Message ChatGPT"></div>
+  <button type="button" data-testid="send-button" aria-label="Send">Send</button>
+  <button type="button" id="stop" aria-label="Stop" class="hidden">Stop</button>
+</form>
+<script>
+  const input = document.getElementById('prompt-textarea');
+  const thread = document.getElementById('thread');
+  const send = document.querySelector("[data-testid='send-button']");
+  const stop = document.getElementById('stop');
+  let controller = null;
+
+  const addMessage = (role, text) => {
+    const el = document.createElement('div');
+    el.setAttribute('data-message-author-role', role);
+    el.textContent = text;
+    thread.appendChild(el);
+    return el;
+  };
+
+  async function submit() {
+    const prompt = input.innerText.trim();
+    if (!prompt || controller) return;
+    const files = document.getElementById('upload').files.length;
+    addMessage('user', prompt + (files ? ` [${files} attachment(s)]` : ''));
+    input.textContent = '';
+    const reply = addMessage('assistant', '');
+    reply.classList.add('result-streaming');
+    controller = new AbortController();
+    send.classList.add('hidden');
+    stop.classList.remove('hidden');
+    try {
+      const res = await fetch('/api/generate?prompt=' + encodeURIComponent(prompt),
+                              { signal: controller.signal });
+      if (!res.ok) throw new Error('HTTP ' + res.status);
+      const reader = res.body.getReader();
+      const decoder = new TextDecoder();
+      for (;;) {
+        const { done, value } = await reader.read();
+        if (done) break;
+        reply.textContent += decoder.decode(value, { stream: true });
+      }
+    } catch (e) {
+      reply.textContent += (reply.textContent ? '\\n' : '') + 'Something went wrong. (' + e.message + ')';
+    } finally {
+      reply.classList.remove('result-streaming');
+      controller = null;
+      stop.classList.add('hidden');
+      send.classList.remove('hidden');
+    }
+  }
+
+  send.addEventListener('click', submit);
+  stop.addEventListener('click', () => controller && controller.abort());
+  input.addEventListener('keydown', (e) => {
+    if (e.key === 'Enter' && !e.shiftKey) { e.preventDefault(); submit(); }
+  });
+</script>
+</body>
+</html>
+"""
+
+
+def response_for(prompt: str, config: MockConfig) -> str:
+    """Deterministic answer text for a prompt."""
+    digest = hashlib.sha256(f"{config.seed}:{prompt}".encode()).digest()
+    rng = random.Random(digest)
+    count = rng.randint(*config.response_tokens)
+    return " ".join(rng.choice(WORDS) for _ in range(count)) + "."
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    """Serves the chat page and streams generated responses."""
+
+    config = MockConfig()
+    rng = random.Random(0)
+    rng_lock = threading.Lock()
+
+    def log_message(self, format, *args):
+        pass  # Keep the agent's console clean
+
+    def _draw(self):
+        """Draw this request's latency, failure and stall outcome."""
+        c = self.config
+        with self.rng_lock:
+            latency = max(0.0, self.rng.gauss(c.latency_ms, c.latency_jitter_ms))
+            fail = self.rng.random() < c.fail_rate
+            stall = self.rng.random() < c.stall_rate
+            jitters = [max(0.0, self.rng.gauss(1.0, c.tokens_jitter)) for _ in range(64)]
+        return latency, fail, stall, jitters
+
+    def _send(self, status: int, body: bytes, content_type: str):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path == "/api/generate":
+            self._generate(parse_qs(url.query).get("prompt", [""])[0])
+        elif url.path == "/api/config":
+            self._send(200, json.dumps(asdict(self.config)).encode(), "application/json")
+        elif url.path in ("/", "/index.html") or url.path.startswith("/c/"):
+            self._send(200, PAGE.encode(), "text/html; charset=utf-8")
+        else:
+            self._send(404, b"not found", "text/plain")
+
+    def _generate(self, prompt: str):
+        latency, fail, stall, jitters = self._draw()
+        time.sleep(latency / 1000)
+        if fail:
+            self._send(500, b"injected failure", "text/plain")
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; charset=utf-8")
+        self.send_header("Cache-Control", "no-store")
+        self.end_headers()
+        tokens = response_for(prompt, self.config).split(" ")
+        stall_at = len(tokens) // 2 if stall else -1
+        delay = 1.0 / self.config.tokens_per_s if self.config.tokens_per_s > 0 else 0.0
+        try:
+            for i, token in enumerate(tokens):
+                if i == stall_at:
+                    time.sleep(self.config.stall_ms / 1000)
+                self.wfile.write((token if i == 0 else " " + token).encode())
+                self.wfile.flush()
+                time.sleep(delay * jitters[i % len(jitters)])
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # Client pressed Stop
+        self.close_connection = True
+
+
+def make_server(host: str = "127.0.0.1", port: int = DEFAULT_PORT,
+                config: Optional[MockConfig] = None) -> ThreadingHTTPServer:
+    """Create (but do not start) a mock server; port 0 picks a free port."""
+    config = config or MockConfig()
+    handler = type("ConfiguredMockHandler", (MockHandler,), {
+        "config": config,
+        "rng": random.Random(config.seed),
+        "rng_lock": threading.Lock(),
+    })
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def start_in_thread(host: str = "127.0.0.1", port: int = 0,
+                    config: Optional[MockConfig] = None) -> Tuple[ThreadingHTTPServer, str]:
+    """Start a mock server on a background thread. Returns (server, base URL)."""
+    server = make_server(host, port, config)
+    threading.Thread(target=server.serve_forever, name="mock-chatgpt", daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+def parse_args(argv=None):
+    """Parse command-line options."""
+    defaults = MockConfig()
+    parser = argparse.ArgumentParser(description="Local ChatGPT stand-in for benchmarking")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--latency-ms", type=float, default=defaults.latency_ms,
+                        help="Mean time to first token")
+    parser.add_argument("--latency-jitter-ms", type=float, default=defaults.latency_jitter_ms)
+    parser.add_argument("--tokens-per-s", type=float, default=defaults.tokens_per_s)
+    parser.add_argument("--fail-rate", type=float, default=defaults.fail_rate,
+                        help="Probability of an HTTP 500 instead of a response")
+    parser.add_argument("--stall-rate", type=float, default=defaults.stall_rate,
+                        help="Probability of one mid-stream stall")
+    parser.add_argument("--stall-ms", type=float, default=defaults.stall_ms)
+    parser.add_argument("--seed", type=int, default=defaults.seed)
+    return parser.parse_args(argv)
+
+
+def config_from_args(args) -> MockConfig:
+    """Build a MockConfig from parsed options."""
+    return MockConfig(
+        latency_ms=args.latency_ms,
+        latency_jitter_ms=args.latency_jitter_ms,
+        tokens_per_s=args.tokens_per_s,
+        fail_rate=args.fail_rate,
+        stall_rate=args.stall_rate,
+        stall_ms=args.stall_ms,
+        seed=args.seed,
+    )
+
+
+def main():
+    """Entry point."""
+    args = parse_args()
+    server = make_server(args.host, args.port, config_from_args(args))
+    print(f"Mock ChatGPT listening on http://{args.host}:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
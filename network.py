@@ -0,0 +1,158 @@
+"""
+Network Layer and Page Readiness
+
+Two things that make page loads cheaper and more predictable:
+
+1. A context.route() handler that drops requests the agent never needs.
+   Fonts, images and media are aborted. Third-party trackers are stubbed with
+   an empty 204, so their callers see success instead of a network error.
+   Each target site has an allowlist that always wins, so the site's own CDN
+   and bot checks are never blocked.
+
+2. A readiness check that replaces wait_until="networkidle". A chatty SPA
+   rarely goes quiet because analytics and long-polling keep the network busy.
+   So the page counts as ready once the prompt input is visible and editable.
+
+Both a sync (main.py) and an async (async_engine.py) entry point are provided.
+"""
+
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Set
+from urllib.parse import urlparse
+
+from selector_cache import SelectorCache
+from selector_resolver import resolve, resolve_async
+
+BLOCKED_RESOURCE_TYPES = {"font", "image", "media"}
+TRACKER_HOSTS = [
+    "google-analytics.com",
+    "googletagmanager.com",
+    "doubleclick.net",
+    "segment.io",
+    "segment.com",
+    "sentry.io",
+    "browser-intake-datadoghq.com",
+    "intercom.io",
+    "featuregates.org",
+    "hotjar.com",
+]
+# Per target host: request host suffixes that are never blocked or stubbed
+DEFAULT_ALLOWLIST = {
+    "chatgpt.com": ["chatgpt.com", "oaistatic.com", "oaiusercontent.com",
+                    "challenges.cloudflare.com"],
+}
+
+
+def host_matches(host: str, domain: str) -> bool:
+    """True if host is domain or one of its subdomains (not merely ending in its text)."""
+    return host == domain or host.endswith("." + domain)
+
+
+@dataclass
+class NetworkPolicy:
+    """Which requests to block (abort) or stub (empty 204) for one target."""
+    target_url: str
+    block_types: Set[str] = field(default_factory=lambda: set(BLOCKED_RESOURCE_TYPES))
+    trackers: List[str] = field(default_factory=lambda: list(TRACKER_HOSTS))
+    allowlist: Dict[str, List[str]] = field(default_factory=lambda: dict(DEFAULT_ALLOWLIST))
+    stats: Dict[str, int] = field(default_factory=lambda: {"allowed": 0, "blocked": 0,
+                                                           "stubbed": 0})
+
+    def allowed_hosts(self) -> List[str]:
+        """Host suffixes that are never blocked for this target."""
+        host = urlparse(self.target_url).hostname or ""
+        return [p for site, patterns in self.allowlist.items()
+                if host_matches(host, site) for p in patterns]
+
+    def decide(self, url: str, resource_type: str) -> str:
+        """Return "allow", "block" or "stub" for one request."""
+        host = urlparse(url).hostname or ""
+        if any(host_matches(host, p) for p in self.allowed_hosts()):
+            action = "allow"
+        elif any(host_matches(host, p) for p in self.trackers):
+            action = "stub"
+        elif resource_type in self.block_types:
+            action = "block"
+        else:
+            action = "allow"
+        self.stats[{"allow": "allowed", "block": "blocked", "stub": "stubbed"}[action]] += 1
+        return action
+
+    def handle(self, route):
+        """Sync route handler."""
+        action = self.decide(route.request.url, route.request.resource_type)
+        if action == "block":
+            route.abort()
+        elif action == "stub":
+            route.fulfill(status=204, body="")
+        else:
+            route.continue_()
+
+    async def handle_async(self, route):
+        """Async route handler."""
+        action = self.decide(route.request.url, route.request.resource_type)
+        if action == "block":
+            await route.abort()
+        elif action == "stub":
+            await route.fulfill(status=204, body="")
+        else:
+            await route.continue_()
+
+    def install(self, context):
+        """Route every request of a (sync) browser context through this policy."""
+        context.route("**/*", self.handle)
+
+    async def install_async(self, context):
+        """Route every request of an async browser context through this policy."""
+        await context.route("**/*", self.handle_async)
+
+    def describe(self) -> str:
+        """One-line summary for the log."""
+        return (f"{self.stats['blocked']} blocked, {self.stats['stubbed']} stubbed, "
+                f"{self.stats['allowed']} allowed")
+
+
+def _ready_result(resolution, editable: bool, start: float) -> dict:
+    return {
+        "ready": bool(resolution.found and editable),
+        "selector": resolution.selector,
+        "waitedMs": round((time.perf_counter() - start) * 1000),
+    }
+
+
+def open_ready(page, url: str, input_selectors: List[str], timeout_ms: int = 30000,
+               cache: Optional[SelectorCache] = None) -> dict:
+    """Navigate, then wait until the prompt input is interactive.
+
+    Returns {ready, selector, waitedMs}.
+    """
+    start = time.perf_counter()
+    page.goto(url, wait_until="domcontentloaded", timeout=timeout_ms)
+    remaining = max(1000, timeout_ms - int((time.perf_counter() - start) * 1000))
+    resolution = resolve(page, input_selectors, timeout_ms=remaining, label="input field",
+                         cache=cache)
+    editable = False
+    if resolution.found:
+        try:
+            editable = resolution.locator.is_editable()
+        except Exception:
+            editable = False
+    return _ready_result(resolution, editable, start)
+
+
+async def open_ready_async(page, url: str, input_selectors: List[str], timeout_ms: int = 30000,
+                           cache: Optional[SelectorCache] = None) -> dict:
+    """Async variant of open_ready()."""
+    start = time.perf_counter()
+    await page.goto(url, wait_until="domcontentloaded", timeout=timeout_ms)
+    remaining = max(1000, timeout_ms - int((time.perf_counter() - start) * 1000))
+    resolution = await resolve_async(page, input_selectors, timeout_ms=remaining,
+                                     label="input field", cache=cache)
+    editable = False
+    if resolution.found:
+        try:
+            editable = await resolution.locator.is_editable()
+        except Exception:
+            editable = False
+    return _ready_result(resolution, editable, start)
@@ -0,0 +1,119 @@
+"""
+Pacing Profiles
+
+One place that controls how "human" the agent is. That covers how prompts
+are typed, how long the human-like pauses and the pause between steps last,
+and Playwright's slow_mo.
+
+    human   per-character typing (30-100ms per key), full pauses, slow_mo 50
+            (the original behaviour)
+    fast    typed in chunks of 24 characters, pauses cut to a quarter,
+            200ms between steps, no slow_mo
+    none    the whole prompt inserted in one call, no pauses, no slow_mo
+
+Typing strategies:
+    per-char    element.type() once per character (one round-trip per key)
+    chunked     keyboard.insert_text() per chunk with a short pause between
+    insert      keyboard.insert_text() for the whole text (one round-trip)
+    fill        element.fill() (textarea/input/contenteditable, one round-trip)
+
+The active profile is module state, so main.py and async_engine.py share it:
+
+    pacing.set_profile("fast")
+"""
+
+import random
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+TYPING_STRATEGIES = ("per-char", "chunked", "insert", "fill")
+
+
+@dataclass(frozen=True)
+class PacingProfile:
+    """Typing strategy, pause scaling and slow_mo for one pacing profile."""
+    name: str
+    typing: str
+    key_delay_ms: Tuple[int, int] = (30, 100)  # per key (per-char) or per chunk (chunked)
+    chunk_size: int = 24
+    delay_scale: float = 1.0  # Multiplies every human_delay() range
+    step_delay_ms: int = 1000
+    slow_mo: float = 50
+
+    def delay_ms(self, min_ms: int, max_ms: int) -> int:
+        """A random human-like delay in [min_ms, max_ms], scaled by the profile."""
+        if self.delay_scale <= 0:
+            return 0
+        return int(random.randint(min_ms, max_ms) * self.delay_scale)
+
+    @property
+    def needs_focus(self) -> bool:
+        """True if the caller must click the element before type_text()."""
+        return self.typing != "fill"
+
+    def key_delay(self) -> int:
+        return random.randint(*self.key_delay_ms)
+
+    def chunks(self, text: str):
+        """Split text into typing chunks."""
+        return [text[i:i + self.chunk_size] for i in range(0, len(text), self.chunk_size)]
+
+
+PROFILES = {
+    "human": PacingProfile("human", "per-char"),
+    "fast": PacingProfile("fast", "chunked", key_delay_ms=(10, 30), delay_scale=0.25,
+                          step_delay_ms=200, slow_mo=0),
+    "none": PacingProfile("none", "insert", key_delay_ms=(0, 0), delay_scale=0.0,
+                          step_delay_ms=0, slow_mo=0),
+}
+
+_current = PROFILES["human"]
+
+
+def set_profile(name: str) -> PacingProfile:
+    """Make a named profile the active one."""
+    global _current
+    if name not in PROFILES:
+        raise ValueError(f"Unknown pacing profile: {name}")
+    _current = PROFILES[name]
+    return _current
+
+
+def current() -> PacingProfile:
+    """Return the active profile."""
+    return _current
+
+
+def type_text(page, element, text: str, profile: Optional[PacingProfile] = None):
+    """Type text into element using the profile's strategy.
+
+    Except for "fill", the element must already have focus (see needs_focus).
+    """
+    profile = profile or _current
+    if profile.typing == "fill":
+        element.fill(text)
+    elif profile.typing == "per-char":
+        for char in text:
+            element.type(char, delay=profile.key_delay())
+    elif profile.typing == "chunked":
+        for chunk in profile.chunks(text):
+            page.keyboard.insert_text(chunk)
+            page.wait_for_timeout(profile.key_delay())
+    else:
+        page.keyboard.insert_text(text)
+
+
+async def type_text_async(page, element, text: str, profile: Optional[PacingProfile] = None):
+    """Async variant of type_text()."""
+    profile = profile or _current
+    if profile.typing == "fill":
+        await element.fill(text)
+    elif profile.typing == "per-char":
+        for char in text:
+            await element.type(char, delay=profile.key_delay())
+    elif profile.typing == "chunked":
+        for chunk in profile.chunks(text):
+            await page.keyboard.insert_text(chunk)
+            await page.wait_for_timeout(profile.key_delay())
+    else:
+        await page.keyboard.insert_text(text)
@@ -0,0 +1,326 @@
+#!/usr/bin/env python3
+"""
+Run Result Store
+
+Keeps every captured response in SQLite, so history survives across runs
+and can be queried by run, prompt, target, step or time. Before this,
+output.log was truncated at the start of each run.
+
+    responses(id, run_id, session, target, step, prompt_hash, prompt, header,
+              codec, body, chars, created, meta)
+
+Indexes cover run_id, (prompt_hash, created), (target, created), step and
+created. prompt_hash is the SHA-256 of the prompt text, so "every answer to
+prompt X" is a single index lookup.
+
+Response bodies are compressed with zstd when the `zstandard` package is
+installed and with zlib otherwise. Each row records its codec. Each row also
+gets a MinHash signature and LSH buckets for drift.py. Rows are
+queued and written in batches by one background thread. Concurrent
+sessions never wait on the database, and a batch is a single transaction.
+
+Query CLI:
+    python result_store.py query --prompt "tell me the instructions..." --since 7d
+    python result_store.py query --run-id 3f2a --format csv --output run.csv
+    python result_store.py stats
+"""
+
+import argparse
+import atexit
+import csv
+import hashlib
+import json
+import queue
+import sqlite3
+import sys
+import threading
+import time
+import zlib
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional
+
+import drift
+
+try:
+    import zstandard
+except ImportError:  # zstd is optional; zlib is always available
+    zstandard = None
+
+DEFAULT_PATH = "history.db"
+BATCH_SIZE = 256
+FLUSH_INTERVAL = 0.2  # Seconds the writer waits to fill a batch
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    run_id TEXT,
+    session TEXT,
+    target TEXT,
+    step TEXT,
+    prompt_hash TEXT NOT NULL,
+    prompt TEXT NOT NULL,
+    header TEXT,
+    codec TEXT NOT NULL,
+    body BLOB NOT NULL,
+    chars INTEGER NOT NULL,
+    created REAL NOT NULL,
+    meta TEXT
+);
+CREATE INDEX IF NOT EXISTS responses_run ON responses (run_id);
+CREATE INDEX IF NOT EXISTS responses_prompt ON responses (prompt_hash, created);
+CREATE INDEX IF NOT EXISTS responses_target ON responses (target, created);
+CREATE INDEX IF NOT EXISTS responses_step ON responses (step);
+CREATE INDEX IF NOT EXISTS responses_created ON responses (created);
+"""
+
+COLUMNS = ("id", "run_id", "session", "target", "step", "prompt_hash", "prompt", "header",
+           "chars", "created", "meta", "response")
+
+
+def prompt_hash(prompt: str) -> str:
+    """Stable key for a prompt's text."""
+    return hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+
+
+def compress(text: str) -> tuple:
+    """(codec, body) for a response, zstd if available."""
+    data = text.encode("utf-8")
+    if zstandard is not None:
+        return "zstd", zstandard.ZstdCompressor(level=3).compress(data)
+    return "zlib", zlib.compress(data, 6)
+
+
+def decompress(codec: str, body: bytes) -> str:
+    """Inverse of compress()."""
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("This response is zstd-compressed; pip install zstandard")
+        data = zstandard.ZstdDecompressor().decompress(body)
+    elif codec == "zlib":
+        data = zlib.decompress(body)
+    else:
+        data = body
+    return data.decode("utf-8")
+
+
+def connect(path: str) -> sqlite3.Connection:
+    """Open the store, creating the schema on first use."""
+    db = sqlite3.connect(path, timeout=30)
+    db.execute("PRAGMA journal_mode=WAL")
+    db.execute("PRAGMA synchronous=NORMAL")
+    db.executescript(SCHEMA)
+    return db
+
+
+class ResultStore:
+    """Queue plus background batch writer for the responses table."""
+
+    def __init__(self, path: str = DEFAULT_PATH, signatures: bool = True):
+        self.path = path
+        self.signatures = signatures  # Index MinHash signatures for drift.py
+        self._queue: queue.Queue = queue.Queue()
+        self._closed = False
+        connect(path).close()  # Fail here, not in the writer, if the path is unusable
+        self._thread = threading.Thread(target=self._run, name="result-store-writer",
+                                        daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def add(self, prompt: str, response: str, run_id: Optional[str] = None,
+            session: Optional[str] = None, target: Optional[str] = None,
+            step: Optional[str] = None, header: Optional[str] = None,
+            meta: Optional[dict] = None):
+        """Queue one response; compression and the insert happen on the writer thread."""
+        self._queue.put({
+            "run_id": run_id, "session": session, "target": target, "step": step,
+            "prompt": prompt, "response": response, "header": header,
+            "created": time.time(), "meta": meta,
+        })
+
+    def flush(self):
+        """Block until everything queued so far is committed."""
+        if not self._closed:
+            self._queue.join()
+
+    def close(self):
+        """Flush and stop the writer thread."""
+        if self._closed:
+            return
+        self.flush()
+        self._closed = True
+        self._queue.put(None)
+        self._thread.join(timeout=5)
+
+    def _run(self):
+        db = connect(self.path)
+        if self.signatures:
+            drift.ensure_schema(db)
+        try:
+            while True:
+                item = self._queue.get()
+                if item is None:
+                    self._queue.task_done()
+                    return
+                batch = [item]
+                deadline = time.monotonic() + FLUSH_INTERVAL
+                while len(batch) < BATCH_SIZE:
+                    try:
+                        nxt = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                    except queue.Empty:
+                        break
+                    if nxt is None:
+                        self._queue.put(None)  # Handle shutdown after this batch
+                        self._queue.task_done()
+                        break
+                    batch.append(nxt)
+                try:
+                    self._write(db, batch)
+                except Exception as e:
+                    print(f"Result store write failed ({len(batch)} rows): {e}", file=sys.stderr)
+                finally:
+                    for _ in batch:
+                        self._queue.task_done()
+        finally:
+            db.close()
+
+    def _write(self, db: sqlite3.Connection, batch: List[dict]):
+        with db:
+            for r in batch:
+                codec, body = compress(r["response"])
+                sha = prompt_hash(r["prompt"])
+                cursor = db.execute(
+                    "INSERT INTO responses (run_id, session, target, step, prompt_hash, "
+                    "prompt, header, codec, body, chars, created, meta) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (r["run_id"], r["session"], r["target"], r["step"], sha, r["prompt"],
+                     r["header"], codec, body, len(r["response"]), r["created"],
+                     json.dumps(r["meta"], ensure_ascii=False) if r["meta"] else None))
+                if self.signatures:
+                    drift.index_response(db, cursor.lastrowid, sha, r["created"],
+                                         r["response"])
+
+
+_stores: Dict[str, ResultStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_store(path: str = DEFAULT_PATH) -> ResultStore:
+    """Return the shared store for path, starting its writer on first use."""
+    with _stores_lock:
+        if path not in _stores:
+            _stores[path] = ResultStore(path)
+        return _stores[path]
+
+
+def parse_time(value: str) -> float:
+    """Epoch seconds from an ISO date/time or a relative age like 7d, 12h, 30m."""
+    units = {"d": 86400, "h": 3600, "m": 60, "s": 1}
+    if value[-1:] in units and value[:-1].replace(".", "", 1).isdigit():
+        return time.time() - float(value[:-1]) * units[value[-1]]
+    return datetime.fromisoformat(value).timestamp()
+
+
+def query(path: str, run_id: Optional[str] = None, prompt: Optional[str] = None,
+          prompt_sha: Optional[str] = None, target: Optional[str] = None,
+          step: Optional[str] = None, since: Optional[float] = None,
+          until: Optional[float] = None, limit: Optional[int] = None) -> Iterator[dict]:
+    """Matching responses, oldest first, with bodies decompressed."""
+    clauses, params = [], []
+    if prompt is not None:
+        prompt_sha = prompt_hash(prompt)
+    for column, value in (("run_id", run_id), ("prompt_hash", prompt_sha),
+                          ("target", target), ("step", step)):
+        if value is not None:
+            clauses.append(f"{column} = ?")
+            params.append(value)
+    if since is not None:
+        clauses.append("created >= ?")
+        params.append(since)
+    if until is not None:
+        clauses.append("created < ?")
+        params.append(until)
+    sql = ("SELECT id, run_id, session, target, step, prompt_hash, prompt, header, chars, "
+           "created, meta, codec, body FROM responses")
+    if clauses:
+        sql += " WHERE " + " AND ".join(clauses)
+    sql += " ORDER BY created, id"
+    if limit:
+        sql += " LIMIT ?"
+        params.append(limit)
+    db = connect(path)
+    try:
+        for row in db.execute(sql, params):
+            record = dict(zip(COLUMNS[:-1], row[:11]))
+            record["meta"] = json.loads(record["meta"]) if record["meta"] else None
+            record["response"] = decompress(row[11], row[12])
+            yield record
+    finally:
+        db.close()
+
+
+def stats(path: str) -> dict:
+    """Row, run, prompt and size totals."""
+    db = connect(path)
+    try:
+        rows, runs, prompts, chars, stored, first, last = db.execute(
+            "SELECT COUNT(*), COUNT(DISTINCT run_id), COUNT(DISTINCT prompt_hash), "
+            "COALESCE(SUM(chars), 0), COALESCE(SUM(LENGTH(body)), 0), MIN(created), "
+            "MAX(created) FROM responses").fetchone()
+    finally:
+        db.close()
+    return {"responses": rows, "runs": runs, "prompts": prompts, "chars": chars,
+            "stored_bytes": stored, "first": first, "last": last}
+
+
+def export(records, fmt: str, out):
+    """Write records as JSON Lines or CSV."""
+    if fmt == "csv":
+        writer = csv.DictWriter(out, fieldnames=COLUMNS)
+        writer.writeheader()
+        for record in records:
+            writer.writerow(dict(record, meta=json.dumps(record["meta"])
+                                 if record["meta"] else ""))
+    else:
+        for record in records:
+            out.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+def parse_args(argv=None):
+    """Parse command-line options."""
+    parser = argparse.ArgumentParser(description="Query the run result store")
+    parser.add_argument("--db", default=DEFAULT_PATH, help=f"Store path (default {DEFAULT_PATH})")
+    sub = parser.add_subparsers(dest="command", required=True)
+    q = sub.add_parser("query", help="Export matching responses")
+    q.add_argument("--run-id")
+    q.add_argument("--prompt", help="Exact prompt text")
+    q.add_argument("--prompt-hash")
+    q.add_argument("--target")
+    q.add_argument("--step")
+    q.add_argument("--since", help="ISO date/time or age such as 7d, 12h")
+    q.add_argument("--until", help="ISO date/time or age such as 1d")
+    q.add_argument("--limit", type=int)
+    q.add_argument("--format", choices=("jsonl", "csv"), default="jsonl")
+    q.add_argument("--output", metavar="FILE", help="Write here instead of stdout")
+    sub.add_parser("stats", help="Show store totals")
+    return parser.parse_args(argv)
+
+
+def main():
+    """Entry point."""
+    args = parse_args()
+    if args.command == "stats":
+        print(json.dumps(stats(args.db), indent=2))
+        return
+    records = query(args.db, run_id=args.run_id, prompt=args.prompt,
+                    prompt_sha=args.prompt_hash, target=args.target, step=args.step,
+                    since=parse_time(args.since) if args.since else None,
+                    until=parse_time(args.until) if args.until else None, limit=args.limit)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8", newline="") as out:
+            export(records, args.format, out)
+    else:
+        export(records, args.format, sys.stdout)
+
+
+if __name__ == "__main__":
+    main()
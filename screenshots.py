@@ -0,0 +1,155 @@
+"""
+Screenshot Pipeline
+
+Takes step screenshots according to a policy and keeps the slow parts off
+the critical path. The browser still renders the capture, but everything
+after that happens on a single background writer thread: transcoding and
+the disk write.
+
+Policies:
+    always      capture every requested screenshot
+    on-failure  capture only screenshots flagged as failures (error_*.png)
+    sampled     capture failures plus a random fraction of the rest
+    off         capture nothing
+
+Formats are png, jpeg and webp. Chrome encodes PNG and JPEG itself. WebP is
+transcoded from a PNG capture with Pillow; without Pillow the pipeline falls
+back to PNG. A non-failure frame whose bytes are identical to the previous
+capture is skipped (and logged). Failure captures are always written.
+"""
+
+import atexit
+import hashlib
+import io
+import os
+import queue
+import random
+import threading
+from typing import Callable, Optional
+
+POLICIES = ("always", "on-failure", "sampled", "off")
+FORMATS = ("png", "jpeg", "webp")
+EXTENSIONS = {"png": ".png", "jpeg": ".jpg", "webp": ".webp"}
+
+
+def frame_digest(data: bytes) -> bytes:
+    """Exact digest of an encoded frame; equal digests mean identical captures."""
+    return hashlib.blake2b(data, digest_size=16).digest()
+
+
+def pillow_available() -> bool:
+    """True if Pillow can be imported."""
+    try:
+        import PIL  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def to_webp(data: bytes, quality: int) -> bytes:
+    """Transcode an encoded image to WebP (requires Pillow)."""
+    from PIL import Image
+    out = io.BytesIO()
+    Image.open(io.BytesIO(data)).save(out, format="WEBP", quality=quality)
+    return out.getvalue()
+
+
+class ScreenshotPipeline:
+    """Policy-driven screenshots encoded and written on a background thread."""
+
+    def __init__(self, policy: str = "always", fmt: str = "png", quality: int = 80,
+                 sample_rate: float = 0.25, log: Callable[[str], None] = print):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown screenshot policy: {policy}")
+        if fmt not in FORMATS:
+            raise ValueError(f"Unknown screenshot format: {fmt}")
+        if fmt == "webp" and not pillow_available():
+            log("⚠️  Pillow is not installed - saving screenshots as PNG instead of WebP")
+            fmt = "png"
+        self.policy = policy
+        self.fmt = fmt
+        self.quality = quality
+        self.sample_rate = sample_rate
+        self.log = log
+        self._queue: queue.Queue = queue.Queue()
+        self._last_digest: Optional[bytes] = None
+        self._last_path: Optional[str] = None
+        self._thread = threading.Thread(target=self._run, name="screenshot-writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def should_capture(self, failure: bool) -> bool:
+        """Apply the policy to one screenshot request."""
+        if self.policy == "off":
+            return False
+        if self.policy == "always" or failure:
+            return True
+        if self.policy == "sampled":
+            return random.random() < self.sample_rate
+        return False
+
+    def _prepare(self, path: str, full_page: bool, clip: Optional[dict]):
+        """Return (final path, page.screenshot() kwargs) for a request."""
+        path = os.path.splitext(path)[0] + EXTENSIONS[self.fmt]
+        options = {"full_page": full_page, "type": "jpeg" if self.fmt == "jpeg" else "png"}
+        if self.fmt == "jpeg":
+            options["quality"] = self.quality
+        if clip:
+            options["clip"] = clip
+        return path, options
+
+    def _enqueue(self, path: str, data: bytes, failure: bool) -> Optional[str]:
+        """Queue a frame for writing unless it repeats the previous one. Returns the path."""
+        digest = frame_digest(data)
+        if not failure and digest == self._last_digest:
+            self.log(f"   Screenshot {path} identical to {self._last_path} - skipped")
+            return None
+        self._last_digest, self._last_path = digest, path
+        self._queue.put((path, data))
+        return path
+
+    def capture(self, page, path: str, full_page: bool = False, clip: Optional[dict] = None,
+                failure: bool = False) -> Optional[str]:
+        """Capture the page if the policy allows it. Returns the queued path, or None."""
+        if not self.should_capture(failure):
+            return None
+        path, options = self._prepare(path, full_page, clip)
+        return self._enqueue(path, page.screenshot(**options), failure)
+
+    async def capture_async(self, page, path: str, full_page: bool = False,
+                            clip: Optional[dict] = None, failure: bool = False) -> Optional[str]:
+        """Async variant of capture()."""
+        if not self.should_capture(failure):
+            return None
+        path, options = self._prepare(path, full_page, clip)
+        return self._enqueue(path, await page.screenshot(**options), failure)
+
+    def flush(self):
+        """Block until every queued screenshot has been handled."""
+        self._queue.join()
+
+    def close(self):
+        """Flush and stop the writer thread."""
+        if not self._thread.is_alive():
+            return
+        self.flush()
+        self._queue.put(None)
+        self._thread.join(timeout=5)
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    return
+                self._write(*item)
+            except Exception as e:
+                self.log(f"⚠️  Screenshot {item[0]} not saved: {str(e)}")
+            finally:
+                self._queue.task_done()
+
+    def _write(self, path: str, data: bytes):
+        if self.fmt == "webp":
+            data = to_webp(data, self.quality)
+        with open(path, "wb") as f:
+            f.write(data)
@@ -0,0 +1,108 @@
+"""
+Learned Selector Cache
+
+Remembers which fallback selector won for each step on each target site, so
+the next run can try that one first. The resolver puts the cached selector at
+the front of its candidate list. When it is still visible, the in-page race
+stops after a single probe. When a different candidate wins, or nothing wins,
+that counts as a miss and the entry is replaced or dropped.
+
+Entries and hit/miss counts are stored as JSON on disk:
+
+    {
+      "chatgpt.com|input field": {"selector": "#prompt-textarea", "hits": 41, "misses": 1},
+      ...
+    }
+"""
+
+import atexit
+import json
+import os
+import tempfile
+import threading
+import time
+from typing import Dict, List, Optional
+from urllib.parse import urlparse
+
+_caches: Dict[str, "SelectorCache"] = {}
+
+
+class SelectorCache:
+    """Per-(site, step) winning selector with hit/miss counters."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.entries: Dict[str, dict] = {}
+        self._lock = threading.Lock()
+        self._dirty = False
+        self.load()
+        atexit.register(self.save)
+
+    @staticmethod
+    def key(url: str, step: str) -> str:
+        """Cache key for a step on a target (conversation paths are ignored)."""
+        return f"{urlparse(url).netloc or url}|{step}"
+
+    def load(self):
+        """Load entries from disk; a missing or corrupt file starts empty."""
+        try:
+            with open(self.path) as f:
+                self.entries = json.load(f)
+        except (OSError, ValueError):
+            self.entries = {}
+
+    def save(self):
+        """Atomically write the cache if anything changed."""
+        with self._lock:
+            if not self._dirty:
+                return
+            data = json.dumps(self.entries, indent=2, sort_keys=True)
+            self._dirty = False
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".selector_cache.")
+        with os.fdopen(fd, "w") as f:
+            f.write(data)
+        os.replace(tmp_path, self.path)
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached winning selector for key, if any."""
+        entry = self.entries.get(key)
+        return entry.get("selector") if entry else None
+
+    def order(self, key: str, selectors: List[str]) -> List[str]:
+        """Return selectors with the cached winner (if still a candidate) moved first."""
+        cached = self.get(key)
+        if cached is None or cached not in selectors:
+            return list(selectors)
+        return [cached] + [s for s in selectors if s != cached]
+
+    def record(self, key: str, winner: Optional[str]) -> Optional[bool]:
+        """Record a resolution. Returns True on hit, False on miss, None if nothing cached."""
+        with self._lock:
+            entry = self.entries.setdefault(key, {"selector": None, "hits": 0, "misses": 0})
+            cached = entry["selector"]
+            hit = None if cached is None else cached == winner
+            if hit:
+                entry["hits"] += 1
+            else:
+                if hit is False:
+                    entry["misses"] += 1
+                # Invalidate, then learn the new winner (if there was one)
+                entry["selector"] = winner
+            entry["updated"] = time.time()
+            self._dirty = True
+        return hit
+
+    def stats(self) -> dict:
+        """Total hits and misses across all entries."""
+        hits = sum(e.get("hits", 0) for e in self.entries.values())
+        misses = sum(e.get("misses", 0) for e in self.entries.values())
+        return {"entries": len(self.entries), "hits": hits, "misses": misses}
+
+
+def get_cache(path: str) -> SelectorCache:
+    """Return the shared cache for path, loading it on first use."""
+    path = os.path.abspath(path)
+    if path not in _caches:
+        _caches[path] = SelectorCache(path)
+    return _caches[path]
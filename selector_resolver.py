@@ -0,0 +1,160 @@
+"""
+Selector Resolver
+
+Resolves a prioritised list of fallback selectors in one round-trip. It does
+not probe each candidate with its own is_visible() call. Instead, one
+page.wait_for_function() checks every candidate inside the browser on each
+animation frame. It resolves to the highest-priority candidate that is visible
+at that moment.
+
+The in-page matcher understands the selector forms the agent uses: plain CSS,
+`text=...` and `css:has-text('...')`. Any other Playwright selector engine is
+still tried, but only by the sequential probe that runs when the race misses.
+
+When a SelectorCache is passed, the previously winning selector is raced
+first. In the common case resolution then costs a single probe.
+"""
+
+import time
+from dataclasses import dataclass
+from typing import Any, List, Optional
+
+from selector_cache import SelectorCache
+
+# Returns {index} for the first visible candidate in priority order, or null
+RACE_SELECTORS_JS = """
+(selectors) => {
+    const isVisible = (el) => {
+        if (!el) return false;
+        const rect = el.getBoundingClientRect();
+        const style = getComputedStyle(el);
+        return rect.width > 0 && rect.height > 0
+            && style.visibility !== 'hidden' && style.display !== 'none';
+    };
+    const norm = (s) => (s || '').replace(/\\s+/g, ' ').trim().toLowerCase();
+    const unquote = (s) => {
+        const m = s.match(/^(['"])(.*)\\1$/s);
+        return m ? m[2] : s;
+    };
+    const textVisible = (needle) => {
+        const walker = document.createTreeWalker(document.body, NodeFilter.SHOW_TEXT);
+        for (let node = walker.nextNode(); node; node = walker.nextNode()) {
+            if (norm(node.nodeValue).includes(needle) && isVisible(node.parentElement)) return true;
+        }
+        return false;
+    };
+    const matches = (selector) => {
+        const text = selector.match(/^text=(.*)$/s);
+        if (text) return textVisible(norm(unquote(text[1])));
+
+        const hasText = selector.match(/^(.*):has-text\\((['"])(.*)\\2\\)$/s);
+        if (hasText) {
+            const needle = norm(hasText[3]);
+            return Array.from(document.querySelectorAll(hasText[1] || '*'))
+                .some((el) => norm(el.textContent).includes(needle) && isVisible(el));
+        }
+        return Array.from(document.querySelectorAll(selector)).some(isVisible);
+    };
+
+    for (let i = 0; i < selectors.length; i++) {
+        try {
+            if (matches(selectors[i])) return { index: i };
+        } catch (e) {
+            // Unsupported engine or invalid CSS - left to the fallback probe
+        }
+    }
+    return null;
+}
+"""
+
+
+@dataclass
+class Resolution:
+    """Outcome of resolving a selector list."""
+    label: str
+    selector: Optional[str]
+    index: int
+    candidates: int
+    elapsed_ms: float
+    locator: Any = None
+    cache_hit: Optional[bool] = None
+
+    @property
+    def found(self) -> bool:
+        return self.selector is not None
+
+    def describe(self) -> str:
+        """One-line summary for the log."""
+        if not self.found:
+            return f"{self.label}: no visible candidate ({self.elapsed_ms:.0f}ms)"
+        cached = {True: ", cache hit", False: ", cache miss"}.get(self.cache_hit, "")
+        return (f"{self.label}: {self.selector} "
+                f"(candidate {self.index + 1}/{self.candidates}, "
+                f"{self.elapsed_ms:.0f}ms{cached})")
+
+
+def visible_locator(page, selector: str):
+    """Locator for the first *visible* match, so it agrees with the in-page race."""
+    return page.locator(f"{selector} >> visible=true").first
+
+
+def _candidates(page, selectors: List[str], label: str, cache: Optional[SelectorCache]):
+    """Return (cache key, race order) for a resolution."""
+    if cache is None:
+        return None, list(selectors)
+    key = SelectorCache.key(page.url, label)
+    return key, cache.order(key, selectors)
+
+
+def _resolution(page, label: str, selectors: List[str], ordered: List[str], index: int,
+                start: float, cache: Optional[SelectorCache], key: Optional[str]) -> Resolution:
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    selector = ordered[index] if index >= 0 else None
+    cache_hit = cache.record(key, selector) if cache is not None else None
+    if selector is None:
+        return Resolution(label, None, -1, len(selectors), elapsed_ms, cache_hit=cache_hit)
+    return Resolution(label, selector, selectors.index(selector), len(selectors), elapsed_ms,
+                      visible_locator(page, selector), cache_hit)
+
+
+def resolve(page, selectors: List[str], timeout_ms: int = 3000, label: str = "selector",
+            cache: Optional[SelectorCache] = None) -> Resolution:
+    """Wait up to timeout_ms for any candidate to be visible; highest priority wins."""
+    start = time.perf_counter()
+    key, ordered = _candidates(page, selectors, label, cache)
+    index = -1
+    try:
+        handle = page.wait_for_function(RACE_SELECTORS_JS, arg=ordered, timeout=timeout_ms)
+        index = handle.json_value()["index"]
+    except Exception:
+        # Race missed - one immediate Playwright probe per candidate
+        for i, selector in enumerate(ordered):
+            try:
+                if page.locator(selector).first.is_visible():
+                    index = i
+                    break
+            except Exception:
+                continue
+    return _resolution(page, label, selectors, ordered, index, start, cache, key)
+
+
+async def resolve_async(page, selectors: List[str], timeout_ms: int = 3000,
+                        label: str = "selector",
+                        cache: Optional[SelectorCache] = None) -> Resolution:
+    """Async variant of resolve()."""
+    start = time.perf_counter()
+    key, ordered = _candidates(page, selectors, label, cache)
+    index = -1
+    try:
+        handle = await page.wait_for_function(RACE_SELECTORS_JS, arg=ordered,
+                                              timeout=timeout_ms)
+        index = (await handle.json_value())["index"]
+    except Exception:
+        for i, selector in enumerate(ordered):
+            try:
+                if await page.locator(selector).first.is_visible():
+                    index = i
+                    break
+            except Exception:
+                continue
+    return _resolution(page, label, selectors, ordered, index, start, cache, key)
@@ -0,0 +1,102 @@
+"""
+Startup Import Profile
+
+Shows where start-up time goes. It imports a module in a fresh interpreter
+under `python -X importtime` and summarises the output. Time is given per
+import made directly by that module, including everything each one pulls
+in, slowest first. The module's own time, its total and the interpreter's
+wall time follow. Interpreter bootstrap imports (site, encodings, ...) are
+left out.
+
+    python main.py --import-time
+    python startup.py async_engine
+"""
+
+import os
+import subprocess
+import sys
+import time
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+_PREFIX = "import time:"
+
+
+@dataclass
+class ImportTime:
+    """One line of -X importtime output."""
+    name: str
+    depth: int  # 0 for a top-level import
+    self_us: int
+    cumulative_us: int
+
+
+def parse_importtime(output: str) -> List[ImportTime]:
+    """Parse -X importtime lines (stderr) into entries."""
+    entries = []
+    for line in output.splitlines():
+        if not line.startswith(_PREFIX):
+            continue
+        fields = line[len(_PREFIX):].split("|")
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue  # The header line
+        name = fields[2].rstrip()
+        stripped = name.lstrip()
+        entries.append(ImportTime(stripped, (len(name) - len(stripped) - 1) // 2,
+                                  int(fields[0]), int(fields[1])))
+    return entries
+
+
+def direct_imports(entries: List[ImportTime], module: str) -> Tuple[List[ImportTime],
+                                                                   Optional[ImportTime]]:
+    """(imports made directly by module, module's own entry) from parsed output.
+
+    -X importtime prints a module after everything it imports, one level deeper,
+    so module's direct imports are the depth-1 entries since the previous
+    top-level entry.
+    """
+    for i in range(len(entries) - 1, -1, -1):
+        if entries[i].depth == 0 and entries[i].name == module:
+            children = []
+            for e in reversed(entries[:i]):
+                if e.depth == 0:
+                    break
+                if e.depth == 1:
+                    children.append(e)
+            return children, entries[i]
+    return [], None
+
+
+def measure(module: str = "main") -> Tuple[List[ImportTime], float]:
+    """Import module in a fresh interpreter. Returns (entries, wall-clock ms)."""
+    cwd = os.path.dirname(os.path.abspath(__file__))
+    start = time.perf_counter()
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                          capture_output=True, text=True, cwd=cwd)
+    wall_ms = (time.perf_counter() - start) * 1000
+    if proc.returncode != 0:
+        error = proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "unknown error"
+        raise RuntimeError(f"import {module} failed: {error}")
+    return parse_importtime(proc.stderr), wall_ms
+
+
+def report(module: str = "main", top: int = 15) -> str:
+    """Text table of the slowest imports made directly by module."""
+    entries, wall_ms = measure(module)
+    children, own = direct_imports(entries, module)
+    roots = sorted(children, key=lambda e: e.cumulative_us, reverse=True)
+    lines = [f"{'import':<36} {'self ms':>9} {'total ms':>9}"]
+    for e in roots[:top]:
+        lines.append(f"{e.name[:36]:<36} {e.self_us / 1000:>9.1f} {e.cumulative_us / 1000:>9.1f}")
+    if len(roots) > top:
+        rest = sum(e.cumulative_us for e in roots[top:]) / 1000
+        lines.append(f"{f'({len(roots) - top} more)':<36} {'':>9} {rest:>9.1f}")
+    if own is not None:
+        lines.append(f"{f'{module} (own code)':<36} {own.self_us / 1000:>9.1f} {'':>9}")
+        lines.append(f"{f'import {module}':<36} {'':>9} {own.cumulative_us / 1000:>9.1f}")
+    lines.append(f"{'interpreter wall time':<36} {'':>9} {wall_ms:>9.1f}")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    print(report(sys.argv[1] if len(sys.argv) > 1 else "main"))
@@ -0,0 +1,225 @@
+"""
+Streaming Response Capture
+
+Follows the assistant message while it is being generated, not just after it
+is done. An in-page MutationObserver pushes text deltas to Python through an
+exposed function, at most once per COALESCE_MS. The Python side rebuilds the
+text and records when each delta arrived.
+
+Call start right after submitting the prompt and stop once the completion
+wait returns. The metrics are measured on the page's own clock, so IPC latency
+does not skew them:
+
+    ttft_ms         start (just after submit) -> first text (time to first token)
+    generation_ms   first text -> last change
+    chars_per_s     characters / generation time
+    stalls          gaps between deltas longer than STALL_MS
+
+Both a sync (main.py) and an async (async_engine.py) entry point are provided.
+"""
+
+import itertools
+import weakref
+from dataclasses import dataclass, field
+from typing import List, Optional, Tuple
+
+BINDING = "__agentStreamDelta"
+COALESCE_MS = 50  # Minimum spacing of delta pushes from the page
+STALL_MS = 2000  # A gap between deltas longer than this counts as a stall
+
+START_STREAM_JS = """
+(args) => {
+    const { binding, messageSelector, previousCount, streamId, coalesceMs } = args;
+    if (window.__agentStream) window.__agentStream.observer.disconnect();
+    let text = '';
+    let scheduled = false;
+    const target = () => {
+        const list = document.querySelectorAll(messageSelector);
+        return list.length > previousCount ? list[list.length - 1] : null;
+    };
+    const push = () => {
+        scheduled = false;
+        const el = target();
+        if (!el) return;
+        const now = el.innerText;
+        if (now === text) return;
+        const append = now.startsWith(text);
+        window[binding]({
+            streamId, t: performance.now(), reset: !append,
+            delta: append ? now.slice(text.length) : now,
+        });
+        text = now;
+    };
+    const observer = new MutationObserver(() => {
+        if (!scheduled) {
+            scheduled = true;
+            setTimeout(push, coalesceMs);
+        }
+    });
+    observer.observe(document.body, { childList: true, subtree: true, characterData: true });
+    window.__agentStream = { observer, push, text: () => (target() || {}).innerText || '' };
+    setTimeout(push, 0);  // Text that arrived before the observer was installed
+    return performance.now();
+}
+"""
+
+# Returns {t, text}; the text is authoritative in case the last push is still in flight
+STOP_STREAM_JS = """
+() => {
+    const stream = window.__agentStream;
+    let text = '';
+    if (stream) {
+        stream.push();
+        stream.observer.disconnect();
+        text = stream.text();
+        window.__agentStream = null;
+    }
+    return { t: performance.now(), text };
+}
+"""
+
+_stream_ids = itertools.count(1)
+# Page -> the StreamCapture currently receiving its deltas
+_active: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+_exposed: "weakref.WeakSet" = weakref.WeakSet()
+
+
+@dataclass
+class StreamMetrics:
+    """Timing of one streamed response (ms on the page clock)."""
+    chars: int
+    deltas: int
+    ttft_ms: Optional[float]
+    generation_ms: float
+    total_ms: float
+    chars_per_s: float
+    stalls: List[Tuple[float, float]] = field(default_factory=list)
+
+    @property
+    def stall_ms(self) -> float:
+        return sum(gap for _, gap in self.stalls)
+
+    def as_dict(self) -> dict:
+        """Plain dict for result sinks."""
+        return {
+            "chars": self.chars,
+            "deltas": self.deltas,
+            "ttft_ms": round(self.ttft_ms) if self.ttft_ms is not None else None,
+            "generation_ms": round(self.generation_ms),
+            "total_ms": round(self.total_ms),
+            "chars_per_s": round(self.chars_per_s, 1),
+            "stalls": len(self.stalls),
+            "stall_ms": round(self.stall_ms),
+        }
+
+    def describe(self) -> str:
+        """One-line summary for the log."""
+        if self.ttft_ms is None:
+            return f"no streamed text after {self.total_ms / 1000:.1f}s"
+        return (f"TTFT {self.ttft_ms / 1000:.2f}s, {self.chars} chars in "
+                f"{self.generation_ms / 1000:.1f}s ({self.chars_per_s:.0f} chars/s), "
+                f"{len(self.stalls)} stall(s) totalling {self.stall_ms / 1000:.1f}s")
+
+
+class StreamCapture:
+    """Receives deltas for one response and turns them into text and metrics."""
+
+    def __init__(self, stream_id: int):
+        self.stream_id = stream_id
+        self.started: Optional[float] = None
+        self.stopped: Optional[float] = None
+        self.parts: List[str] = []
+        self.times: List[float] = []
+
+    @property
+    def text(self) -> str:
+        return "".join(self.parts)
+
+    def on_delta(self, payload: dict):
+        """Apply one delta pushed by the page."""
+        if payload.get("streamId") != self.stream_id:
+            return
+        if payload.get("reset"):
+            self.parts = []
+        self.parts.append(payload.get("delta", ""))
+        self.times.append(payload["t"])
+
+    def finish(self, result: dict):
+        """Record the stop time and reconcile with the page's final text."""
+        self.stopped = result["t"]
+        if result["text"] and result["text"] != self.text:
+            self.parts = [result["text"]]
+            self.times.append(result["t"])
+
+    def metrics(self, stall_ms: float = STALL_MS) -> StreamMetrics:
+        """Compute the metrics from the deltas received so far."""
+        start = self.started or 0.0
+        end = self.stopped if self.stopped is not None else (self.times[-1] if self.times
+                                                             else start)
+        chars = len(self.text)
+        if not self.times:
+            return StreamMetrics(chars, 0, None, 0.0, end - start, 0.0)
+        generation_ms = self.times[-1] - self.times[0]
+        stalls = [(a - start, b - a) for a, b in zip(self.times, self.times[1:])
+                  if b - a > stall_ms]
+        rate = chars / (generation_ms / 1000) if generation_ms > 0 else 0.0
+        return StreamMetrics(chars, len(self.times), self.times[0] - start, generation_ms,
+                             end - start, rate, stalls)
+
+
+def _dispatch(page):
+    def on_delta(payload):
+        capture = _active.get(page)
+        if capture is not None:
+            capture.on_delta(payload)
+    return on_delta
+
+
+def _start_args(capture: StreamCapture, message_selector: str, previous_count: int) -> dict:
+    return {
+        "binding": BINDING,
+        "messageSelector": message_selector,
+        "previousCount": previous_count,
+        "streamId": capture.stream_id,
+        "coalesceMs": COALESCE_MS,
+    }
+
+
+def start_stream(page, message_selector: str, previous_count: int) -> StreamCapture:
+    """Start following the next assistant message (call right after submitting)."""
+    if page not in _exposed:
+        page.expose_function(BINDING, _dispatch(page))
+        _exposed.add(page)
+    capture = StreamCapture(next(_stream_ids))
+    _active[page] = capture
+    capture.started = page.evaluate(START_STREAM_JS,
+                                    _start_args(capture, message_selector, previous_count))
+    return capture
+
+
+def stop_stream(page, capture: StreamCapture) -> StreamMetrics:
+    """Flush the last delta, stop observing and return the metrics."""
+    capture.finish(page.evaluate(STOP_STREAM_JS))
+    if _active.get(page) is capture:
+        del _active[page]
+    return capture.metrics()
+
+
+async def start_stream_async(page, message_selector: str, previous_count: int) -> StreamCapture:
+    """Async variant of start_stream()."""
+    if page not in _exposed:
+        await page.expose_function(BINDING, _dispatch(page))
+        _exposed.add(page)
+    capture = StreamCapture(next(_stream_ids))
+    _active[page] = capture
+    capture.started = await page.evaluate(START_STREAM_JS,
+                                          _start_args(capture, message_selector, previous_count))
+    return capture
+
+
+async def stop_stream_async(page, capture: StreamCapture) -> StreamMetrics:
+    """Async variant of stop_stream()."""
+    capture.finish(await page.evaluate(STOP_STREAM_JS))
+    if _active.get(page) is capture:
+        del _active[page]
+    return capture.metrics()
@@ -0,0 +1,17 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tracing import percentile  # noqa: E402
+
+
+def test_percentile_nearest_rank():
+    assert percentile([1, 2, 3, 4, 5], 50) == 3
+    assert percentile(list(range(1, 31)), 95) == 29
+    assert percentile([5, 1, 3], 100) == 5
+    assert percentile([5, 1, 3], 0) == 1
+
+
+def test_percentile_empty():
+    assert percentile([], 99) == 0.0
@@ -0,0 +1,144 @@
+"""
+Learned Timeouts
+
+Records how long each step actually takes, per target site, step and prompt
+class. Timeouts and poll intervals are derived from those timings instead
+of fixed constants:
+
+    timeout = clamp(p99 x MARGIN, floor, ceiling)
+    poll    = clamp(p50 / POLL_DIVISOR, floor, ceiling)
+
+Until a key has MIN_SAMPLES samples, the caller's default is used. A wait
+that times out, and a selector probe that misses, is recorded as a censored
+sample (the step took at least that long). Once a key has MIN_SAMPLES
+samples, a timeout among its RECENT newest ones makes the next timeout at
+least MARGIN times longer. A step that outgrows its learned timeout therefore
+stops being cut off after a few runs, up to the ceiling. Before that,
+censored samples only count towards MIN_SAMPLES.
+
+The newest SAMPLES_PER_KEY samples per key are kept as JSON on disk:
+
+    {
+      "chatgpt.com|completion|research+files:short": [[84210, 0], [120000, 1], ...],
+      ...
+    }
+"""
+
+import atexit
+import json
+import os
+import tempfile
+import threading
+from typing import Dict, List, Optional
+from urllib.parse import urlparse
+
+from tracing import percentile
+
+SAMPLES_PER_KEY = 200
+MIN_SAMPLES = 8
+MARGIN = 1.5
+PERCENTILE = 99
+POLL_DIVISOR = 100  # Poll about 100 times over a typical (p50) wait
+RECENT = 20  # A timeout among this many newest samples raises the next timeout
+LONG_PROMPT_CHARS = 400
+
+_models: Dict[str, "TimingModel"] = {}
+
+
+def prompt_class(prompt: str, attachments: int = 0, mode: str = "chat") -> str:
+    """Coarse class of a prompt for timing purposes, e.g. "research+files:short"."""
+    size = "long" if len(prompt) > LONG_PROMPT_CHARS else "short"
+    return f"{mode}{'+files' if attachments else ''}:{size}"
+
+
+def _clamp(value: float, floor: int, ceiling: int) -> int:
+    return int(min(max(value, floor), ceiling))
+
+
+class TimingModel:
+    """Per-(site, step, prompt class) duration samples and derived waits."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.samples: Dict[str, List[list]] = {}
+        self._lock = threading.Lock()
+        self._dirty = False
+        self.load()
+        atexit.register(self.save)
+
+    @staticmethod
+    def key(url: str, step: str, pclass: str = "any") -> str:
+        return f"{urlparse(url).netloc or url}|{step}|{pclass}"
+
+    def load(self):
+        """Load samples from disk; a missing or corrupt file starts empty."""
+        try:
+            with open(self.path) as f:
+                self.samples = json.load(f)
+        except (OSError, ValueError):
+            self.samples = {}
+
+    def save(self):
+        """Atomically write the samples if anything changed."""
+        with self._lock:
+            if not self._dirty:
+                return
+            data = json.dumps(self.samples, separators=(",", ":"), sort_keys=True)
+            self._dirty = False
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".timing_model.")
+        with os.fdopen(fd, "w") as f:
+            f.write(data)
+        os.replace(tmp_path, self.path)
+
+    def record(self, url: str, step: str, duration_ms: float, pclass: str = "any",
+               timed_out: bool = False):
+        """Add one observed duration (a lower bound if timed_out)."""
+        key = self.key(url, step, pclass)
+        with self._lock:
+            samples = self.samples.setdefault(key, [])
+            samples.append([round(duration_ms), int(timed_out)])
+            del samples[:-SAMPLES_PER_KEY]
+            self._dirty = True
+
+    def _durations(self, url: str, step: str, pclass: str) -> Optional[List[list]]:
+        samples = self.samples.get(self.key(url, step, pclass))
+        return samples if samples and len(samples) >= MIN_SAMPLES else None
+
+    def timeout_ms(self, url: str, step: str, default: int, floor: int, ceiling: int,
+                   pclass: str = "any") -> int:
+        """Learned timeout for a step, or default until there are enough samples."""
+        samples = self._durations(url, step, pclass)
+        if samples is None:
+            return default
+        timeout = percentile([d for d, _ in samples], PERCENTILE) * MARGIN
+        censored = [d for d, timed_out in samples[-RECENT:] if timed_out]
+        if censored:
+            timeout = max(timeout, max(censored) * MARGIN)
+        return _clamp(timeout, floor, ceiling)
+
+    def poll_ms(self, url: str, step: str, default: int, floor: int, ceiling: int,
+                pclass: str = "any") -> int:
+        """Learned poll interval for a step, or default until there are enough samples."""
+        samples = self._durations(url, step, pclass)
+        if samples is None:
+            return default
+        return _clamp(percentile([d for d, _ in samples], 50) / POLL_DIVISOR, floor, ceiling)
+
+    def describe(self, url: str, step: str, pclass: str = "any") -> str:
+        """Sample count and p50/p99 of a step, for the log."""
+        samples = self.samples.get(self.key(url, step, pclass), [])
+        if not samples:
+            return "no history"
+        durations = [d for d, _ in samples]
+        timeouts = sum(t for _, t in samples)
+        return (f"{len(samples)} samples, p50 {percentile(durations, 50) / 1000:.1f}s, "
+                f"p99 {percentile(durations, 99) / 1000:.1f}s, {timeouts} timeouts")
+
+
+def get_model(path: str) -> TimingModel:
+    """Return the shared model for path, loading it on first use."""
+    path = os.path.abspath(path)
+    if path not in _models:
+        _models[path] = TimingModel(path)
+    return _models[path]
@@ -0,0 +1,175 @@
+"""
+Latency Tracing
+
+Span-based timing for each step and sub-operation of a run (launch, goto,
+selector probes, typing, submit, completion wait, capture, screenshots).
+Spans are recorded in microseconds. They can be exported as Chrome
+trace-event JSON, which opens in chrome://tracing or https://ui.perfetto.dev,
+or summarised as a p50/p95 table per span name across every session in a batch.
+
+Each session gets its own track in the trace. The track is taken from the
+"session" field bound in agent_log, so concurrent asyncio sessions stay apart.
+
+    with span("goto", url=url):
+        page.goto(url)
+
+    begin_step("step3")  # Ends the previous step span of this session
+"""
+
+import contextvars
+import json
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+import agent_log
+
+_current_step: contextvars.ContextVar = contextvars.ContextVar("tracing_step", default=None)
+
+
+def _now_us() -> float:
+    return time.perf_counter_ns() / 1000
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of values (0 for an empty list)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+class Tracer:
+    """Collects completed spans and exports them."""
+
+    def __init__(self):
+        self.events: List[dict] = []
+        self._tids: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def _tid(self) -> int:
+        session = agent_log.current_fields().get("session") or "main"
+        with self._lock:
+            if session not in self._tids:
+                self._tids[session] = len(self._tids) + 1
+            return self._tids[session]
+
+    def record(self, name: str, start_us: float, end_us: float, category: str = "op",
+               **args):
+        """Add one complete ("X") event."""
+        event = {
+            "name": name,
+            "cat": category,
+            "ph": "X",
+            "ts": start_us,
+            "dur": end_us - start_us,
+            "pid": os.getpid(),
+            "tid": self._tid(),
+            "args": args,
+        }
+        with self._lock:
+            self.events.append(event)
+
+    @contextmanager
+    def span(self, name: str, category: str = "op", **args):
+        """Time the enclosed block as one span."""
+        start = _now_us()
+        try:
+            yield
+        finally:
+            self.record(name, start, _now_us(), category, **args)
+
+    def reset(self):
+        """Drop every recorded span (e.g. between benchmark runs)."""
+        with self._lock:
+            self.events.clear()
+            self._tids.clear()
+        _current_step.set(None)
+
+    def begin_step(self, name: Optional[str]):
+        """End the current step span of this context and start a new one (None just ends)."""
+        now = _now_us()
+        current = _current_step.get()
+        if current is not None:
+            self.record(current[0], current[1], now, "step")
+        _current_step.set((name, now) if name else None)
+
+    def end_step(self):
+        """End the current step span, if any."""
+        self.begin_step(None)
+
+    def export_chrome_trace(self, path: str):
+        """Write every span as Chrome trace-event JSON."""
+        with self._lock:
+            events = list(self.events)
+            names = [
+                {"name": "thread_name", "ph": "M", "pid": os.getpid(), "tid": tid,
+                 "args": {"name": session}}
+                for session, tid in self._tids.items()
+            ]
+        with open(path, "w") as f:
+            json.dump({"traceEvents": names + events, "displayTimeUnit": "ms"}, f)
+
+    def summary(self) -> List[dict]:
+        """Per span name: count, total, p50, p95 and max in ms, slowest total first."""
+        durations: Dict[tuple, List[float]] = {}
+        with self._lock:
+            for event in self.events:
+                key = (event["cat"], event["name"])
+                durations.setdefault(key, []).append(event["dur"] / 1000)
+        rows = [
+            {
+                "category": category,
+                "name": name,
+                "count": len(values),
+                "total_ms": sum(values),
+                "p50_ms": percentile(values, 50),
+                "p95_ms": percentile(values, 95),
+                "max_ms": max(values),
+            }
+            for (category, name), values in durations.items()
+        ]
+        return sorted(rows, key=lambda r: r["total_ms"], reverse=True)
+
+    def summary_table(self) -> str:
+        """Summary formatted as a fixed-width text table."""
+        lines = [f"{'span':<28} {'count':>6} {'total ms':>10} {'p50 ms':>9} "
+                 f"{'p95 ms':>9} {'max ms':>9}"]
+        for row in self.summary():
+            label = f"{row['category']}:{row['name']}"[:28]
+            lines.append(f"{label:<28} {row['count']:>6} {row['total_ms']:>10.0f} "
+                         f"{row['p50_ms']:>9.0f} {row['p95_ms']:>9.0f} {row['max_ms']:>9.0f}")
+        return "\n".join(lines)
+
+
+_tracer = Tracer()
+
+
+def get_tracer() -> Tracer:
+    """Return the process-wide tracer."""
+    return _tracer
+
+
+def span(name: str, category: str = "op", **args):
+    """Time a block on the process-wide tracer."""
+    return _tracer.span(name, category, **args)
+
+
+def begin_step(name: Optional[str]):
+    """Start a step span on the process-wide tracer."""
+    _tracer.begin_step(name)
+
+
+def end_step():
+    """End the current step span on the process-wide tracer."""
+    _tracer.end_step()
+
+
+def current_step() -> Optional[str]:
+    """Name of the step span open in this context, if any."""
+    current = _current_step.get()
+    return current[0] if current else None
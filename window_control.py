@@ -0,0 +1,189 @@
+"""
+X11 Window Control
+
+Window lookups, geometry and focus over one long-lived X connection
+(python-xlib), instead of spawning xdotool/wmctrl for every call.
+
+Window ids, titles and geometry are cached. The cache is kept correct by
+X events rather than by expiry:
+
+    root _NET_CLIENT_LIST changed     window list changed: forget name lookups
+    _NET_WM_NAME / WM_NAME changed    that title is re-read
+    ConfigureNotify                   that window's geometry is re-read
+    DestroyNotify                     that window is forgotten
+
+Events are drained without blocking at the start of each call, so there is
+no background thread (python-xlib connections are not thread-safe). A cached
+answer costs no round-trip to the X server.
+
+python-xlib is optional. Without it, or without a DISPLAY, get_backend()
+returns None and main.py falls back to xdotool/wmctrl.
+
+    backend = get_backend()
+    if backend:
+        backend.geometry("Chrome")   # {"window_id", "x", "y", "width", "height"}
+        backend.focus("Chrome")
+"""
+
+import os
+import threading
+from typing import Dict, List, Optional
+
+try:
+    from Xlib import X, Xatom, display as xdisplay, error as xerror, protocol
+except ImportError:  # python-xlib not installed
+    X = None
+
+_backend = None
+_backend_lock = threading.Lock()
+_backend_failed = False
+
+
+class X11Backend:
+    """Cached window queries on one X display connection."""
+
+    def __init__(self, display_name: Optional[str] = None):
+        self.display = xdisplay.Display(display_name)
+        self.root = self.display.screen().root
+        self._atoms = {name: self.display.intern_atom(name) for name in (
+            "_NET_CLIENT_LIST", "_NET_ACTIVE_WINDOW", "_NET_WM_NAME", "UTF8_STRING")}
+        self._names: Dict[str, int] = {}  # Search string -> window id
+        self._titles: Dict[int, str] = {}
+        self._geometry: Dict[int, dict] = {}
+        self._watched = set()
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "events": 0}
+        self.root.change_attributes(event_mask=X.PropertyChangeMask)
+        self.display.flush()
+
+    def close(self):
+        self.display.close()
+
+    def _drain_events(self):
+        """Apply every queued X event to the caches (never blocks)."""
+        while self.display.pending_events():
+            event = self.display.next_event()
+            self.stats["events"] += 1
+            wid = getattr(event, "window", None)
+            wid = wid.id if wid is not None else None
+            if event.type == X.PropertyNotify:
+                if wid == self.root.id and event.atom == self._atoms["_NET_CLIENT_LIST"]:
+                    self._names.clear()
+                elif event.atom in (self._atoms["_NET_WM_NAME"], Xatom.WM_NAME):
+                    self._titles.pop(wid, None)
+                    self._names.clear()
+            elif event.type == X.ConfigureNotify:
+                self._geometry.pop(wid, None)
+            elif event.type == X.DestroyNotify:
+                self._forget(wid)
+
+    def _forget(self, wid: int):
+        self._titles.pop(wid, None)
+        self._geometry.pop(wid, None)
+        self._watched.discard(wid)
+        self._names = {name: w for name, w in self._names.items() if w != wid}
+
+    def _watch(self, window):
+        """Subscribe to title, geometry and destroy events of a client window."""
+        if window.id not in self._watched:
+            window.change_attributes(event_mask=X.PropertyChangeMask | X.StructureNotifyMask)
+            self._watched.add(window.id)
+
+    def _client_windows(self) -> List[int]:
+        """Top-level client windows, from the window manager if it publishes them."""
+        prop = self.root.get_full_property(self._atoms["_NET_CLIENT_LIST"], X.AnyPropertyType)
+        if prop is not None:
+            return list(prop.value)
+        return [w.id for w in self.root.query_tree().children]
+
+    def _title(self, wid: int) -> str:
+        if wid not in self._titles:
+            window = self.display.create_resource_object("window", wid)
+            self._watch(window)
+            prop = window.get_full_property(self._atoms["_NET_WM_NAME"],
+                                            self._atoms["UTF8_STRING"])
+            if prop is not None:
+                title = prop.value.decode("utf-8", "replace")
+            else:
+                title = window.get_wm_name() or ""
+                if isinstance(title, bytes):
+                    title = title.decode("latin-1")
+            self._titles[wid] = title
+        return self._titles[wid]
+
+    def find(self, window_name: str) -> Optional[int]:
+        """Id of the first client window whose title contains window_name (any case)."""
+        with self._lock:
+            self._drain_events()
+            return self._find(window_name)
+
+    def _find(self, window_name: str) -> Optional[int]:
+        if window_name in self._names:
+            self.stats["hits"] += 1
+            return self._names[window_name]
+        self.stats["misses"] += 1
+        needle = window_name.lower()
+        for wid in self._client_windows():
+            try:
+                if needle in self._title(wid).lower():
+                    self._names[window_name] = wid
+                    return wid
+            except xerror.BadWindow:
+                self._forget(wid)  # Closed between listing and reading
+        return None
+
+    def geometry(self, window_name: str) -> Optional[dict]:
+        """Root-relative position and size of a window, or None if there is none."""
+        with self._lock:
+            self._drain_events()
+            wid = self._find(window_name)
+            if wid is None:
+                return None
+            if wid not in self._geometry:
+                try:
+                    window = self.display.create_resource_object("window", wid)
+                    geo = window.get_geometry()
+                    origin = self.root.translate_coords(window, 0, 0)
+                except xerror.BadWindow:
+                    self._forget(wid)
+                    return None
+                self._geometry[wid] = {"window_id": str(wid), "x": origin.x, "y": origin.y,
+                                       "width": geo.width, "height": geo.height}
+            return dict(self._geometry[wid])
+
+    def focus(self, window_name: str) -> bool:
+        """Activate a window through the window manager (EWMH), raising it."""
+        with self._lock:
+            self._drain_events()
+            wid = self._find(window_name)
+            if wid is None:
+                return False
+            window = self.display.create_resource_object("window", wid)
+            event = protocol.event.ClientMessage(
+                window=window, client_type=self._atoms["_NET_ACTIVE_WINDOW"],
+                data=(32, [2, X.CurrentTime, 0, 0, 0]),  # 2: request from a pager/tool
+            )
+            try:
+                self.root.send_event(event, event_mask=X.SubstructureRedirectMask
+                                     | X.SubstructureNotifyMask)
+                window.configure(stack_mode=X.Above)
+                self.display.flush()
+            except xerror.BadWindow:
+                self._forget(wid)
+                return False
+            return True
+
+
+def get_backend() -> Optional[X11Backend]:
+    """Return the shared X11 backend, or None if python-xlib or a display is unavailable."""
+    global _backend, _backend_failed
+    with _backend_lock:
+        if _backend is None and not _backend_failed:
+            if X is None or not os.environ.get("DISPLAY"):
+                _backend_failed = True
+            else:
+                try:
+                    _backend = X11Backend()
+                except Exception:
+                    _backend_failed = True  # No X server reachable; don't retry every call
+        return _backend
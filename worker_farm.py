@@ -0,0 +1,236 @@
+"""
+Multi-Process Worker Farm
+
+Runs scenarios across K worker processes. Each worker has its own Chrome and
+its own pool of contexts per target site, and all of them pull jobs from one
+durable SQLite queue (job_queue.py). Sessions no longer share one GIL and one event loop,
+so throughput scales with cores. A Chrome crash only takes down its own
+worker.
+
+Each worker runs `concurrency` slots. A slot leases a job, runs it in a
+pooled context, then acks the result or nacks the error for a retry. A
+heartbeat renews the worker's leases while its jobs run. If a worker dies,
+its leases expire and the surviving workers pick those jobs up again. The
+parent restarts a crashed worker while there is work left.
+
+Each worker writes its own log files (output.w1.log, output.w1.jsonl, ...).
+Results are written back to the jobs table of the queue database.
+
+Usage:
+    python main.py --workers 4 --concurrency 8 --prompts prompts.jsonl --queue jobs.db
+    python main.py --workers 4 --queue jobs.db      # drain an existing queue
+"""
+
+import asyncio
+import multiprocessing
+import os
+import socket
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict
+from typing import Dict, Optional
+
+from playwright.async_api import async_playwright
+
+import agent_log
+import main
+import pacing
+from async_engine import AsyncSessionEngine, Scenario, TargetPool, target_key
+from batch import load_prompts, result_record
+from job_queue import DEFAULT_LEASE_S, DEFAULT_MAX_ATTEMPTS, JobQueue
+from main import log
+
+POLL_S = 1.0  # How often an idle slot checks the queue for new or expired jobs
+MAX_RESTARTS = 3  # Per worker slot, for workers that exit abnormally
+
+
+def worker_path(path: Optional[str], worker_id: int) -> Optional[str]:
+    """Per-worker variant of a log path: output.log -> output.w1.log."""
+    if not path:
+        return path
+    root, ext = os.path.splitext(path)
+    return f"{root}.w{worker_id}{ext}"
+
+
+class QueueWorker:
+    """One worker process: a browser, a context pool per target and `concurrency` job slots."""
+
+    def __init__(self, queue_path: str, worker_id: int, concurrency: int, headless: bool,
+                 block_resources: bool, url: str, lease_s: float = DEFAULT_LEASE_S):
+        # Queue calls block on SQLite's write lock (up to its 30s busy timeout), so
+        # they run on one thread of their own, which also owns the connection
+        self._db_thread = ThreadPoolExecutor(max_workers=1, thread_name_prefix="job-queue")
+        self.queue = self._db_thread.submit(JobQueue, queue_path, lease_s).result()
+        self.worker_id = worker_id
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:w{worker_id}"
+        self.concurrency = max(1, concurrency)
+        self.url = url
+        self.engine = AsyncSessionEngine(concurrency=self.concurrency, headless=headless,
+                                         block_resources=block_resources)
+        self.active = set()  # Job ids leased by this worker
+        self.targets: Dict[str, TargetPool] = {}  # Opened on the first job for each target
+        self.done = 0
+        self.browser_lost = False
+
+    async def _db(self, fn, *args):
+        """Run a JobQueue call on the queue thread without blocking the event loop."""
+        return await asyncio.get_running_loop().run_in_executor(self._db_thread, fn, *args)
+
+    async def run(self) -> int:
+        """Work until the queue is drained. Returns the process exit code."""
+        async with async_playwright() as p:
+            log(f"[w{self.worker_id}] Launching Chrome ({self.concurrency} slots)...")
+            browser = await self.engine.launch(p)
+            self._targets_lock = asyncio.Lock()
+            heartbeat = asyncio.ensure_future(self._heartbeat())
+            try:
+                await self._target(browser, self.url)  # The usual target, opened up front
+                await asyncio.gather(*(self._slot(browser) for _ in range(self.concurrency)))
+            finally:
+                heartbeat.cancel()
+                try:
+                    for target in self.targets.values():
+                        await self.engine.close_target(target, f"[w{self.worker_id}] ")
+                    await browser.close()
+                except Exception:
+                    pass  # Chrome already gone
+                await self._db(self.queue.close)
+                self._db_thread.shutdown()
+        log(f"[w{self.worker_id}] Finished {self.done} jobs")
+        return 1 if self.browser_lost else 0
+
+    async def _heartbeat(self):
+        """Renew this worker's leases so long scenarios are not taken over."""
+        while True:
+            await asyncio.sleep(self.queue.lease_s / 3)
+            for job_id in list(self.active):
+                if not await self._db(self.queue.renew, job_id, self.owner):
+                    log(f"⚠️  [w{self.worker_id}] Lost the lease on job {job_id}")
+
+    async def _target(self, browser, url: str) -> TargetPool:
+        """The context pool for a job's target, opened on first use."""
+        async with self._targets_lock:
+            key = target_key(url)
+            if key not in self.targets:
+                target = self.engine.open_target(browser, url, self.concurrency)
+                await target.pool.start()
+                self.targets[key] = target
+            return self.targets[key]
+
+    async def _slot(self, browser):
+        """Lease and run jobs one at a time until the queue has nothing left."""
+        while not self.browser_lost:
+            job = await self._db(self.queue.lease, self.owner)
+            if job is None:
+                if not await self._db(self.queue.pending):
+                    return
+                await asyncio.sleep(POLL_S)  # Others' leases may still expire
+                continue
+
+            scenario = Scenario(job.name, job.prompt, job.url, job.attachments)
+            log(f"   [w{self.worker_id}] Job {job.id} ({job.name}), "
+                f"attempt {job.attempts}/{job.max_attempts}")
+            self.active.add(job.id)
+            try:
+                pool = (await self._target(browser, scenario.url)).pool
+                context = await pool.acquire()
+            except Exception:
+                self.active.discard(job.id)
+                raise
+            try:
+                result = await self.engine.run_in_context(context, scenario)
+            finally:
+                self.active.discard(job.id)
+                await pool.release(context)
+
+            record = result_record(scenario, result)
+            if result.success:
+                await self._db(self.queue.ack, job.id, self.owner, record)
+                self.done += 1
+            else:
+                await self._db(self.queue.nack, job.id, self.owner, result.error, record)
+            if not browser.is_connected():
+                log(f"[w{self.worker_id}] Chrome disconnected, exiting for a restart",
+                    is_error=True)
+                self.browser_lost = True
+
+
+def worker_main(queue_path: str, worker_id: int, concurrency: int, headless: bool,
+                block_resources: bool, url: str, pace: str, lease_s: float,
+                mock: bool = False):
+    """Process entry point for one worker."""
+    # A spawned child re-imports main with its defaults; give it its own log files
+    main.OUTPUT_FILE = worker_path(main.OUTPUT_FILE, worker_id)
+    main.JSONL_LOG_FILE = worker_path(main.JSONL_LOG_FILE, worker_id)
+    if mock:
+        # Mock answers and timings stay out of the real history and timing model
+        main.RESULT_STORE_FILE = main.TIMING_MODEL_FILE = None
+    pacing.set_profile(pace)
+    agent_log.bind(run_id=agent_log.new_run_id(), worker=worker_id)
+    worker = QueueWorker(queue_path, worker_id, concurrency, headless, block_resources, url,
+                         lease_s)
+    code = asyncio.run(worker.run())
+    agent_log.flush()
+    raise SystemExit(code)
+
+
+def run_workers(queue_path: str, workers: int, concurrency: int, headless: bool,
+                block_resources: bool, url: str, prompts_path: Optional[str] = None,
+                lease_s: float = DEFAULT_LEASE_S,
+                max_attempts: int = DEFAULT_MAX_ATTEMPTS, mock: bool = False) -> bool:
+    """Enqueue prompts_path (if given), run `workers` processes until the queue drains.
+
+    mock marks a run against the mock server. Its results are kept out of the
+    shared stores. Returns True if no job in the queue ended up failed.
+    """
+    queue = JobQueue(queue_path, lease_s)
+    if prompts_path:
+        scenarios = load_prompts(prompts_path, url)
+        added = queue.enqueue((asdict(s) for s in scenarios), max_attempts)
+        log(f"📦 Queued {added} prompts from {prompts_path} in {queue_path}")
+    if not queue.pending():
+        log(f"No pending jobs in {queue_path}", is_error=True)
+        queue.close()
+        return False
+
+    spawn = multiprocessing.get_context("spawn")  # No forked Playwright/threads state
+
+    def start(worker_id: int):
+        proc = spawn.Process(
+            target=worker_main, name=f"worker-{worker_id}",
+            args=(queue_path, worker_id, concurrency, headless, block_resources, url,
+                  pacing.current().name, lease_s, mock),
+        )
+        proc.start()
+        return proc
+
+    log(f"🏭 Starting {workers} workers x {concurrency} slots on {queue_path}")
+    start_time = time.monotonic()
+    procs = {i: start(i) for i in range(1, workers + 1)}
+    restarts = {i: 0 for i in procs}
+    try:
+        while procs:
+            time.sleep(POLL_S)
+            for worker_id, proc in list(procs.items()):
+                if proc.is_alive():
+                    continue
+                proc.join()
+                if proc.exitcode != 0 and queue.pending() and restarts[worker_id] < MAX_RESTARTS:
+                    restarts[worker_id] += 1
+                    log(f"⚠️  Worker {worker_id} exited with code {proc.exitcode}, restarting "
+                        f"({restarts[worker_id]}/{MAX_RESTARTS})")
+                    procs[worker_id] = start(worker_id)
+                else:
+                    del procs[worker_id]
+    finally:
+        for proc in procs.values():
+            proc.terminate()
+
+    counts = queue.counts()
+    queue.close()
+    elapsed = time.monotonic() - start_time
+    finished = counts["done"] + counts["failed"]
+    rate = finished / elapsed * 60 if elapsed else 0.0
+    log(f"\n📊 Queue {queue_path}: {counts['done']} done, {counts['failed']} failed, "
+        f"{counts['queued'] + counts['leased']} pending in {elapsed:.0f}s ({rate:.1f} jobs/min)")
+    return counts["failed"] == 0 and counts["queued"] + counts["leased"] == 0